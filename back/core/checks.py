@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+from .db import replica_alias
+
+
+@register(Tags.caches, Tags.database, deploy=True)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """With a read replica, a client's next request may hit another worker, which must see its pin."""
+    if replica_alias() is None:
+        return []
+
+    alias = getattr(settings, 'REPLICA_PIN_CACHE', 'default')
+    if alias not in settings.CACHES:
+        return [Error(f"REPLICA_PIN_CACHE names an unknown cache alias '{alias}'.", id='core.E002')]
+
+    if isinstance(caches[alias], (LocMemCache, DummyCache)):
+        return [Error(
+            f"The '{alias}' cache is per-process, so a client's read-your-writes pin is only seen by "
+            "the worker that handled the write; other workers would read from the lagging replica.",
+            hint="Point REPLICA_PIN_CACHE at a shared cache such as Redis or Memcached.",
+            id='core.E001',
+        )]
+    return []
@@ -0,0 +1,218 @@
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+_write_lock = threading.RLock()
+
+
+@contextmanager
+def serialized_write(using=DEFAULT_DB_ALIAS):
+    """Run a batch of ingestion writes as one transaction, one writer per process at a time.
+
+    SQLite has a single writer per database file. Queueing this process's
+    ingestion writes on a lock keeps them from burning each other's
+    ``busy_timeout``, and a batch commits with a single fsync instead of one
+    per row. Other backends just get ``transaction.atomic``.
+    """
+    if connections[using].vendor != 'sqlite':
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    with _write_lock, transaction.atomic(using=using):
+        yield
+
+
+class PeriodicFlusher:
+    """Calls ``flush()`` every ``interval`` seconds on a daemon thread, and once more at exit.
+
+    Subclasses implement ``flush()`` (returning how many rows it wrote) and
+    call :meth:`start_flusher` whenever they buffer something; the thread is
+    started on first use in each process. ``interval=0`` leaves flushing to the caller.
+    """
+    interval = 0
+    flush_label = 'row(s)'
+    _flusher_pid = None
+
+    def start_flusher(self):
+        # started lazily, and again in a forked worker, which doesn't inherit threads
+        if not self.interval or self._flusher_pid == os.getpid():
+            return
+
+        with _flusher_lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+
+        threading.Thread(target=self._run_flusher, name=type(self).__name__, daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            try:
+                written = self.flush()
+                if written:
+                    print(f"Flushed {written} {self.flush_label}")
+            except Exception as e:
+                print(f"Flushing {self.flush_label} failed: {e}")
+
+
+_flusher_lock = threading.Lock()
+
+
+# Set by ReplicaRoutingMiddleware for the duration of a request; None outside requests,
+# so management commands, the shell and background work always use the primary.
+_request_state = ContextVar('db_request_state', default=None)
+_force_primary = ContextVar('db_force_primary', default=False)
+
+PIN_KEY = 'core:db_pin:{}'
+
+
+def replica_alias():
+    alias = getattr(settings, 'READ_REPLICA_ALIAS', 'replica')
+    return alias if alias in connections.databases else None
+
+
+def _pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+def _pin_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')]
+
+
+@contextmanager
+def use_primary():
+    """Send every read inside the block to the primary."""
+    token = _force_primary.set(True)
+    try:
+        yield
+    finally:
+        _force_primary.reset(token)
+
+
+def recently_written(written_at_ns):
+    """True while a write stamped ``written_at_ns`` may not have reached the replica yet."""
+    return time.time_ns() - written_at_ns < _pin_seconds() * 1_000_000_000
+
+
+def client_identity(request):
+    """Who to pin after a write: the JWT user id, else the session, else the client address.
+
+    Worked out from the request headers alone so the router never queries while routing.
+    """
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Bearer '):
+        try:
+            return f"user:{AccessToken(header[7:])[jwt_settings.USER_ID_CLAIM]}"
+        except (TokenError, KeyError):
+            pass
+
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session_key:
+        return f"session:{session_key}"
+
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class PrimaryReplicaRouter:
+    """Routes safe-method request reads to ``READ_REPLICA_ALIAS`` and everything else to the primary.
+
+    Reads stay on the primary inside a transaction, after the request has
+    written, and for ``REPLICA_PIN_SECONDS`` after the same client last wrote,
+    so a reader always sees their own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        replica = replica_alias()
+        if state is None or replica is None or _force_primary.get():
+            return DEFAULT_DB_ALIAS
+
+        if state['wrote'] or state['pinned'] or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        return replica
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if replica_alias() is None:
+            return self.get_response(request)
+
+        identity = client_identity(request)
+        safe = request.method in ('GET', 'HEAD', 'OPTIONS')
+        state = {
+            'wrote': not safe,
+            'pinned': safe and _pin_cache().get(PIN_KEY.format(identity)) is not None,
+        }
+
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        if state['wrote'] and response.status_code < 400:
+            _pin_cache().set(PIN_KEY.format(identity), 1, _pin_seconds())
+
+        return response
+
+    async def __acall__(self, request):
+        if replica_alias() is None:
+            return await self.get_response(request)
+
+        identity = client_identity(request)
+        safe = request.method in ('GET', 'HEAD', 'OPTIONS')
+        state = {
+            'wrote': not safe,
+            'pinned': safe and await _pin_cache().aget(PIN_KEY.format(identity)) is not None,
+        }
+
+        # sync_to_async copies the context, so ORM calls in worker threads see this state
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        if state['wrote'] and response.status_code < 400:
+            await _pin_cache().aset(PIN_KEY.format(identity), 1, _pin_seconds())
+
+        return response
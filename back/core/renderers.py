@@ -0,0 +1,52 @@
+import msgpack
+import orjson
+from django.utils.http import parse_header_parameters
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # orjson handles dict/list subclasses, datetimes and UUIDs natively; anything
+    # else (Decimal, lazy translation strings, querysets...) goes through DRF's encoder
+    return _fallback_encoder.default(obj)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(data, default=_default, option=option)
+
+    def get_indent(self, accepted_media_type, renderer_context):
+        # same switches as DRF's JSONRenderer; orjson only supports a 2-space indent
+        if accepted_media_type:
+            _, params = parse_header_parameters(accepted_media_type)
+            try:
+                return int(params['indent']) > 0
+            except (KeyError, ValueError, TypeError):
+                pass
+        return bool(renderer_context.get('indent'))
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return msgpack.packb(data, default=_default, use_bin_type=True)
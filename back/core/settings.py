@@ -58,12 +58,25 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.db.ReplicaRoutingMiddleware',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # orjson for JSON; MessagePack only when a client sends Accept: application/msgpack
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 CORS_ALLOW_ALL_ORIGINS: True
@@ -75,12 +88,37 @@ OLLAMA_URL = 'http://localhost:11434'
 # OLLAMA_MODEL = 'qwen2.5:0.5b'
 OLLAMA_MODEL = "qwen2.5:3b"
 # OLLAMA_MODEL = "gemma2:2b"
+OLLAMA_EMBED_MODEL = 'nomic-embed-text'
+
+# concurrent requests readers.ai_client.AsyncAIClient sends to each upstream
+OLLAMA_CONCURRENCY = 2
+POLLINATIONS_CONCURRENCY = 6
 
 BOOK_COVER_SIZE = (800, 1200)
 CHAPTER_IMAGE_SIZE = (800, 1200)
 
 GENERATE_BOOK_IMAGES = True
 MAX_CHAPTER_IMAGES = 10
+PREVIEW_CHAPTER_LIMIT = 2
+SUGGEST_INDEX_MAX_AGE = 300
+BOOK_FACETS_CACHE_TIMEOUT = 3600
+
+# "similar books": TF-IDF over descriptions, genres and chapter summaries, top-k precomputed per book
+SIMILAR_BOOKS_PATH = BASE_DIR / 'cache' / 'similar_books.npz'
+SIMILAR_BOOKS_K = 20
+SIMILAR_BOOKS_MAX_FEATURES = 4096
+SIMILAR_BOOKS_UPDATE_INTERVAL = 10
+
+# semantic search over description and chapter summary embeddings (readers.semantic);
+# 'hashing' embeds locally without a model server, for tests and development
+SEMANTIC_EMBEDDER = os.environ.get('SEMANTIC_EMBEDDER', 'ollama')
+SEMANTIC_INDEX_DIR = BASE_DIR / 'cache' / 'semantic'
+SEMANTIC_EMBED_BATCH_SIZE = 32
+SEMANTIC_IVF_THRESHOLD = 20000
+SEMANTIC_IVF_NPROBE = 8
+
+POLLINATIONS_CACHE_DIR = BASE_DIR / 'cache' / 'pollinations'
+POLLINATIONS_CACHE_MAX_BYTES = 512 * 1024 * 1024
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800
@@ -88,9 +126,19 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
 
 SIMPLE_JWT = {
-    "ACCESS_TOKEN_LIFETIME": timedelta(hours=5)
+    "ACCESS_TOKEN_LIFETIME": timedelta(hours=5),
+    "TOKEN_OBTAIN_SERIALIZER": "purchasers.authentication.TierTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "purchasers.authentication.TierTokenRefreshSerializer",
 }
 
+# How long the subscription tier claim inside an access token is trusted
+SUBSCRIPTION_TIER_CLAIM_LIFETIME = timedelta(minutes=30)
+# Cache alias where subscription changes revoke older tier claims. It has to be shared
+# between workers; `manage.py check --deploy` refuses a per-process one.
+SUBSCRIPTION_TIER_CACHE = 'default'
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_CACHE_TTL = 300
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -108,17 +156,92 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
+# Serve the book/chapter read endpoints from readers.async_views. Turn on when running
+# core.asgi under uvicorn; under WSGI every async view would need its own event loop.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', '').lower() in ('1', 'true', 'yes')
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Applied to every new SQLite connection. WAL lets readers keep going while an
+# ingestion write is in progress; busy_timeout (ms) makes writers wait for the lock.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': '; '.join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()),
+            # take the write lock when a transaction starts, not on its first write, so a
+            # transaction never has to upgrade a read lock and fail with "database is locked"
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+
+# Optional read replica. Point READ_REPLICA_DATABASE at a second SQLite file (refreshed
+# with `manage.py sync_replica`) or configure a Postgres standby under the same alias;
+# safe-method request reads then go there (see core.db.PrimaryReplicaRouter).
+READ_REPLICA_ALIAS = 'replica'
+# reads stay on the primary this long after a client writes, to cover replication lag
+REPLICA_PIN_SECONDS = 5
+# Cache alias holding those pins. It has to be shared between workers once a replica is
+# configured; `manage.py check --deploy` refuses a per-process one.
+REPLICA_PIN_CACHE = 'default'
+
+if os.environ.get('READ_REPLICA_DATABASE'):
+    DATABASES[READ_REPLICA_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': os.environ['READ_REPLICA_DATABASE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.db.PrimaryReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Per-process locmem by default; point this at a shared backend (e.g.
+# django.core.cache.backends.redis.RedisCache) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'readers',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+# How long a request waits for another one computing the same cold key before computing it too.
+RESPONSE_CACHE_LOCK_WAIT = 0.5
+
+# Reading progress pings are buffered per worker and upserted in batches this often
+# (seconds), or as soon as this many books are waiting.
+READING_PROGRESS_FLUSH_INTERVAL = 5
+READING_PROGRESS_MAX_PENDING = 1000
+
+# Chapter views are counted in memory and folded into per-day rows this often (seconds).
+# Book.popularity is recomputed from those rows at most every POPULARITY_REFRESH_INTERVAL:
+# views over the last POPULARITY_WINDOW_DAYS, halved in weight every POPULARITY_HALF_LIFE_DAYS.
+VIEW_COUNTS_FLUSH_INTERVAL = 30
+VIEW_COUNTER_SHARDS = 16
+POPULARITY_REFRESH_INTERVAL = 300
+POPULARITY_WINDOW_DAYS = 30
+POPULARITY_HALF_LIFE_DAYS = 7
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -158,6 +281,13 @@ STATIC_URL = 'static/'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_CAS_PREFIX = 'readers/cas'
+
+# Hand book downloads off to the web server in production: 'nginx' (X-Accel-Redirect)
+# or 'xsendfile' (Apache/lighttpd X-Sendfile). None streams through Django.
+BOOK_FILE_SENDFILE_BACKEND = None
+# nginx: location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+BOOK_FILE_ACCEL_PREFIX = '/protected-media/'
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.conf import settings
 from django.conf.urls.static import static
-from django.urls import path
+from django.urls import path, re_path
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -26,6 +26,14 @@ from rest_framework_simplejwt.views import (
 from readers.views import *
 from purchasers.views import *
 
+if settings.ASYNC_READ_VIEWS:
+    from readers.async_views import (
+        AsyncBookListView as BookListView,
+        AsyncBookDetailView as BookDetailView,
+        AsyncChapterDetailView as ChapterDetailView,
+        AsyncAllChaptersView as AllChaptersView,
+    )
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
@@ -39,15 +47,28 @@ urlpatterns = [
     
     path('api/profile/', UserProfileView.as_view(), name='user-profile'),
     path('api/user-profiles/', UserProfileListView.as_view(), name='user-profile-list-create'),
+    path('api/user-profiles/export/', UserProfileExportView.as_view(), name='user-profile-export'),
     path('api/user-profiles/<int:pk>/', UserProfileDetailView.as_view(), name='user-profile-detail'),
     
     
     # book and chapter views
     path('books/', BookListView.as_view()),
+    path('books/search/', BookSearchView.as_view(), name='book-search'),
+    path('books/semantic-search/', BookSemanticSearchView.as_view(), name='book-semantic-search'),
+    path('books/suggest/', BookSuggestView.as_view(), name='book-suggest'),
+    path('books/facets/', BookFacetsView.as_view(), name='book-facets'),
+    path('books/popular/', BookPopularView.as_view(), name='book-popular'),
     path('books/<int:pk>/', BookDetailView.as_view()),
+    path('books/<int:pk>/similar/', BookSimilarView.as_view(), name='book-similar'),
     
     path('api/book/<int:book_id>/chapter/<int:chapter_id>/', ChapterDetailView.as_view(), name='chapter-detail'),
     path('api/book/<int:book_id>/chapters/', AllChaptersView.as_view(), name='all-chapters'),
+    path('api/book/<int:book_id>/file/', BookFileDownloadView.as_view(), name='book-file-download'),
+    path('api/book/<int:book_id>/manifest/', BookManifestView.as_view(), name='book-manifest'),
+    
+    # reading progress
+    path('api/progress/', ReadingProgressView.as_view(), name='reading-progress'),
+    path('api/continue-reading/', ContinueReadingView.as_view(), name='continue-reading'),
     
     # subscription management
     path('api/subscribe/', SubscribeToPremiumView.as_view(), name='subscribe-to-premium'),
@@ -64,4 +85,7 @@ urlpatterns = [
     path('api/books/<int:book_id>/chapters/create/', ChapterCreateView.as_view(), name='chapter-create'),
     path('api/books/<int:book_id>/chapters/<int:chapter_number>/edit/', ChapterUpdateDeleteView.as_view(), name='chapter-update-delete'),
     
+    # book files must go through the download endpoint, never the public media route
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}readers/files/", protected_book_file),
+    
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -5,4 +5,5 @@ class PurchasersConfig(AppConfig):
     name = 'purchasers'
 
     def ready(self):
+        import purchasers.checks
         import purchasers.signals
\ No newline at end of file
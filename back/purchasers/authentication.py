@@ -0,0 +1,199 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import SubscriptionType, UserProfile
+
+TIER_CLAIM = 'tier'
+TIER_EXPIRY_CLAIM = 'tier_exp'
+TIER_CHANGED_KEY = 'purchasers:tier_changed:{}'
+
+
+def _tier_claim_lifetime():
+    return getattr(settings, 'SUBSCRIPTION_TIER_CLAIM_LIFETIME', timedelta(minutes=30))
+
+
+def tier_cache():
+    """Where tier changes are announced to every worker; must be shared between processes."""
+    return caches[getattr(settings, 'SUBSCRIPTION_TIER_CACHE', 'default')]
+
+
+def add_tier_claims(token, tier):
+    # None (no profile) is kept as is, so it resolves exactly like get_subscription_tier()
+    token[TIER_CLAIM] = tier
+    token[TIER_EXPIRY_CLAIM] = int(time.time() + _tier_claim_lifetime().total_seconds())
+    return token
+
+
+def lookup_tier(user_id):
+    return (
+        UserProfile.objects.filter(user_id=user_id)
+        .values_list('subscription_type__name', flat=True)
+        .first()
+    )
+
+
+class UserCache:
+    """Small thread-safe LRU of ``User`` objects keyed by id, with a TTL.
+
+    Callers get a shallow copy so per-request attributes never leak into
+    the shared entry.
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+
+            user, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[user_id]
+                return None
+
+            self._entries.move_to_end(user_id)
+
+        return copy.copy(user)
+
+    def set(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic())
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_cache = UserCache(
+    max_size=getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 300),
+)
+
+
+def invalidate_user_tier(user_id):
+    """Forget the cached user and distrust tier claims issued before now."""
+    user_cache.invalidate(user_id)
+    tier_cache().set(
+        TIER_CHANGED_KEY.format(user_id),
+        int(time.time()),
+        timeout=int(max(api_settings.ACCESS_TOKEN_LIFETIME, _tier_claim_lifetime()).total_seconds()),
+    )
+
+
+class TierTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        return add_tier_claims(token, lookup_tier(user.pk))
+
+
+class TierTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+
+        access = AccessToken(data['access'])
+        access.set_iat()
+        add_tier_claims(access, lookup_tier(access[api_settings.USER_ID_CLAIM]))
+        data['access'] = str(access)
+
+        return data
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWT authentication for read-only reading endpoints.
+
+    Users come from a per-process LRU instead of a query per request, and a
+    fresh ``tier`` claim is trusted so chapter access checks skip the
+    ``UserProfile`` lookup.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = get_user_model().objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except get_user_model().DoesNotExist:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+
+            user_cache.set(user_id, user)
+            user = copy.copy(user)
+
+        changed_at = tier_cache().get(TIER_CHANGED_KEY.format(user_id)) if self._has_live_tier_claim(validated_token) else None
+        return self._claim_tier(user, validated_token, changed_at)
+
+    async def aauthenticate(self, request):
+        """:meth:`authenticate` for async views, with the user loaded through the async ORM."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await get_user_model().objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except get_user_model().DoesNotExist:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+
+            user_cache.set(user_id, user)
+            user = copy.copy(user)
+
+        changed_at = await tier_cache().aget(TIER_CHANGED_KEY.format(user_id)) if self._has_live_tier_claim(validated_token) else None
+        return self._claim_tier(user, validated_token, changed_at)
+
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+    def _claim_tier(self, user, validated_token, changed_at):
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        if self._tier_claim_is_fresh(validated_token, changed_at):
+            user._subscription_tier = validated_token[TIER_CLAIM]
+
+        return user
+
+    def _has_live_tier_claim(self, validated_token):
+        return TIER_CLAIM in validated_token and validated_token.get(TIER_EXPIRY_CLAIM, 0) >= time.time()
+
+    def _tier_claim_is_fresh(self, validated_token, changed_at):
+        if not self._has_live_tier_claim(validated_token):
+            return False
+
+        return changed_at is None or validated_token.get('iat', 0) > changed_at
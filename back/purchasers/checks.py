@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches, deploy=True)
+def check_tier_cache(app_configs, **kwargs):
+    """Tier changes only revoke tier claims if every worker sees them (``manage.py check --deploy``)."""
+    alias = getattr(settings, 'SUBSCRIPTION_TIER_CACHE', 'default')
+    if alias not in settings.CACHES:
+        return [Error(f"SUBSCRIPTION_TIER_CACHE names an unknown cache alias '{alias}'.", id='purchasers.E002')]
+
+    if isinstance(caches[alias], (LocMemCache, DummyCache)):
+        return [Error(
+            f"The '{alias}' cache is per-process, so a subscription change would only revoke the old "
+            "tier claim in the worker that made it.",
+            hint="Point SUBSCRIPTION_TIER_CACHE at a shared cache such as Redis or Memcached.",
+            id='purchasers.E001',
+        )]
+    return []
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UserProfileCursorPagination(CursorPagination):
+    """Keyset pagination on the primary key, so deep pages cost the same as the first."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('id',)
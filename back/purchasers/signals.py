@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import UserProfile, SubscriptionType
+from .authentication import invalidate_user_tier, user_cache
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -15,4 +16,18 @@ def create_user_profile(sender, instance, created, **kwargs):
                 'is_active': True
             }
         )
-        UserProfile.objects.create(user=instance, subscription_type=free_sub)
\ No newline at end of file
+        UserProfile.objects.create(user=instance, subscription_type=free_sub)
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_cached_tier(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_tier(instance.user_id)
+
+@receiver(post_delete, sender=UserProfile)
+def invalidate_deleted_tier(sender, instance, **kwargs):
+    invalidate_user_tier(instance.user_id)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
\ No newline at end of file
@@ -1,3 +1,140 @@
-from django.test import TestCase
+import tempfile
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from readers.tests import TEST_PASSWORD, USERS_PER_TIER, CatalogTestCase, QueryBudgetTestCase
+from .authentication import TIER_CLAIM, TierTokenObtainPairSerializer
+from .checks import check_tier_cache
+from .models import SubscriptionType, UserProfile
 
-# Create your tests here.
+
+class AuthQueryBudgetTests(QueryBudgetTestCase):
+    def test_token_obtain(self):
+        response = self.assertBudget(
+            '/api/token/', 2, method='post',
+            data={'username': self.free_user.username, 'password': TEST_PASSWORD}, format='json'
+        )
+        self.assertIn('access', response.data)
+
+    def test_token_refresh(self):
+        refresh = str(TierTokenObtainPairSerializer.get_token(self.premium_user))
+        self.assertBudget('/api/token/refresh/', 2, method='post', data={'refresh': refresh}, format='json')
+
+    def test_token_verify(self):
+        access = str(RefreshToken.for_user(self.free_user).access_token)
+        self.assertBudget('/api/token/verify/', 0, method='post', data={'token': access}, format='json')
+
+    def test_register(self):
+        data = {'username': 'new_reader', 'password': TEST_PASSWORD, 'email': 'new@example.com'}
+        self.assertBudget('/api/register/', 6, method='post', status=201, data=data, format='json')
+        self.assertTrue(UserProfile.objects.filter(user__username='new_reader').exists())
+
+
+class ProfileQueryBudgetTests(QueryBudgetTestCase):
+    def test_profile(self):
+        self.assertBudget('/api/profile/', 2, client=self.client_for(self.premium_user))
+
+    def test_user_profile_list(self):
+        client = self.client_for(self.staff_user)
+        response = self.assertBudget('/api/user-profiles/?page_size=500', 2, client=client)
+        self.assertEqual(len(response.data['results']), 2 * USERS_PER_TIER + 1)
+        self.assertIsNone(response.data['next'])
+
+        # profiles are staff-only, like the export
+        self.assertBudget('/api/user-profiles/', 0, status=401)
+        self.assertBudget('/api/user-profiles/', 1, client=self.client_for(self.free_user), status=403)
+
+    def test_user_profile_list_pages(self):
+        seen = []
+        path = '/api/user-profiles/?page_size=10'
+        while path:
+            response = self.assertBudget(path, 2, client=self.client_for(self.staff_user))
+            seen += [profile['id'] for profile in response.data['results']]
+            path = response.data['next']
+        self.assertEqual(seen, list(UserProfile.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_user_profile_list_by_tier(self):
+        client = self.client_for(self.staff_user)
+        response = self.assertBudget('/api/user-profiles/?tier=premium', 2, client=client)
+        self.assertEqual(len(response.data['results']), USERS_PER_TIER)
+        self.assertEqual({profile['subscription_type'] for profile in response.data['results']}, {'Premium Account'})
+        self.assertBudget('/api/user-profiles/?tier=gold', 1, client=client, status=400)
+
+    def test_user_profile_export(self):
+        client = self.client_for(self.staff_user)
+        self.assertBudget('/api/user-profiles/export/', 2, client=client)
+        self.assertBudget('/api/user-profiles/export/?tier=free', 2, client=client)
+
+        def export_lines(path):
+            response = client.get(path)
+            self.assertEqual(response['Content-Type'], 'text/csv')
+            return b''.join(response.streaming_content).decode().splitlines()
+
+        lines = export_lines('/api/user-profiles/export/')
+        self.assertEqual(lines[0], 'id,username,subscription_type,img')
+        self.assertEqual(len(lines), 2 * USERS_PER_TIER + 2)
+        profile = self.client_for().get(f"/api/user-profiles/{self.premium_user.userprofile.pk}/").data
+        self.assertIn(f"{profile['id']},{profile['username']},{profile['subscription_type']},{profile['img']}", lines)
+        # header, the free readers and the staff user's free profile
+        self.assertEqual(len(export_lines('/api/user-profiles/export/?tier=free')), USERS_PER_TIER + 2)
+        self.assertBudget('/api/user-profiles/export/', 2, client=self.client_for(self.free_user), status=403)
+
+    def test_user_profile_detail(self):
+        profile = UserProfile.objects.get(user=self.premium_user)
+        response = self.assertBudget(f"/api/user-profiles/{profile.pk}/", 1)
+        self.assertEqual(response.data['subscription_type'], 'Premium Account')
+
+
+class SubscriptionQueryBudgetTests(QueryBudgetTestCase):
+    def test_subscribe_and_unsubscribe(self):
+        client = self.client_for(self.free_user)
+        self.assertBudget(
+            '/api/subscribe/', 6, method='put', client=client,
+            data={'card_number': '1234567890'}, format='json'
+        )
+        self.assertBudget('/api/unsubscribe/', 6, method='put', client=client)
+
+    def test_subscription_types(self):
+        self.assertBudget('/subscription-types/', 1)
+        premium = SubscriptionType.objects.get(name=SubscriptionType.PREMIUM)
+        self.assertBudget(f"/subscription-types/{premium.pk}/", 1)
+
+
+class TierClaimTests(CatalogTestCase):
+    def chapter_status(self, user, chapter_number):
+        path = f"/api/book/{self.premium_book.pk}/chapter/{chapter_number}/"
+        return self.client_for(user).get(path).status_code
+
+    def test_downgrade_revokes_the_tier_claim(self):
+        user = User.objects.create_user('downgraded', password=TEST_PASSWORD)
+        UserProfile.objects.filter(user=user).update(
+            subscription_type=SubscriptionType.objects.get(name=SubscriptionType.PREMIUM)
+        )
+        client = self.client_for(user)
+        path = f"/api/book/{self.premium_book.pk}/chapter/5/"
+        self.assertEqual(client.get(path).status_code, 200)
+
+        profile = UserProfile.objects.get(user=user)
+        profile.subscription_type = SubscriptionType.objects.get(name=SubscriptionType.FREE)
+        profile.save()
+        self.assertEqual(client.get(path).status_code, 403)
+
+    def test_missing_profile_claims_no_tier(self):
+        user = User.objects.create_user('no_profile', password=TEST_PASSWORD)
+        UserProfile.objects.filter(user=user).delete()
+
+        self.assertIsNone(TierTokenObtainPairSerializer.get_token(user).access_token[TIER_CLAIM])
+        # same as without a claim: previews are for free and premium readers only
+        self.assertEqual(self.chapter_status(user, 1), 403)
+        self.assertEqual(self.chapter_status(self.free_user, 1), 200)
+
+
+class TierCacheCheckTests(SimpleTestCase):
+    def test_tier_cache_must_be_shared(self):
+        self.assertEqual([error.id for error in check_tier_cache(None)], ['purchasers.E001'])
+
+        with tempfile.TemporaryDirectory() as location, override_settings(
+            CACHES={'tiers': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}},
+            SUBSCRIPTION_TIER_CACHE='tiers',
+        ):
+            self.assertEqual(check_tier_cache(None), [])
@@ -1,20 +1,85 @@
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
 from .models import UserProfile, SubscriptionType
-def can_access_chapter(user, chapter):
-    book = chapter.book
 
+
+def get_subscription_tier(user):
+    """Subscription name for ``user`` (None when anonymous or without a profile).
+
+    The result is memoized on the user object, so it costs at most one query per request.
+    """
     if not user.is_authenticated:
-        return book.accessibility == 'free'
+        return None
 
-    try:
-        profile = UserProfile.objects.select_related('subscription_type').get(user=user)
-    except UserProfile.DoesNotExist:
-        return book.accessibility == 'free'
+    if not hasattr(user, '_subscription_tier'):
+        user._subscription_tier = (
+            UserProfile.objects.filter(user=user)
+            .values_list('subscription_type__name', flat=True)
+            .first()
+        )
 
-    if profile.subscription_type.name == SubscriptionType.PREMIUM:
-        return True
+    return user._subscription_tier
+
+
+async def aget_subscription_tier(user):
+    """:func:`get_subscription_tier` through the async ORM."""
+    if not user.is_authenticated:
+        return None
+
+    if not hasattr(user, '_subscription_tier'):
+        user._subscription_tier = await (
+            UserProfile.objects.filter(user=user)
+            .values_list('subscription_type__name', flat=True)
+            .afirst()
+        )
+
+    return user._subscription_tier
+
+
+class ChapterAccessResolver:
+    """Evaluates chapter access for one user against whole querysets.
+
+    Non-premium readers get free books in full and the first
+    ``PREVIEW_CHAPTER_LIMIT`` chapters of premium books; anonymous readers
+    only get free books.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.tier = get_subscription_tier(user)
+        self.preview_limit = getattr(settings, 'PREVIEW_CHAPTER_LIMIT', 2)
+
+    @property
+    def is_premium(self):
+        return self.tier == SubscriptionType.PREMIUM
+
+    def locked_q(self):
+        if self.tier is None:
+            return ~Q(book__accessibility='free')
+
+        return ~Q(book__accessibility='free') & Q(chapter_number__gt=self.preview_limit)
+
+    def annotate(self, queryset):
+        if self.is_premium:
+            return queryset.annotate(is_locked=Value(False, output_field=BooleanField()))
+
+        return queryset.annotate(is_locked=ExpressionWrapper(self.locked_q(), output_field=BooleanField()))
+
+    def can_access(self, chapter):
+        if self.is_premium or chapter.book.accessibility == 'free':
+            return True
+
+        if self.tier is None:
+            return False
+
+        return chapter.chapter_number <= self.preview_limit
+
+
+def can_access_chapter(user, chapter):
+    return ChapterAccessResolver(user).can_access(chapter)
 
+def can_access_book_file(user, book):
     if book.accessibility == 'free':
         return True
 
-    first_two = book.chapters.order_by('chapter_number')[:2]
-    return chapter in first_two
\ No newline at end of file
+    return get_subscription_tier(user) == SubscriptionType.PREMIUM
@@ -8,7 +8,11 @@ from rest_framework.permissions import IsAuthenticated
 from .serializers import UserProfileSerializer
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.views import APIView
+from django.http import StreamingHttpResponse
+from .pagination import UserProfileCursorPagination
+import csv
 
 
 class SubscriptionTypeListView(generics.ListAPIView):
@@ -18,13 +22,81 @@ class SubscriptionTypeListView(generics.ListAPIView):
 class SubscriptionTypeDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = SubscriptionType.objects.all()
     serializer_class = SubscriptionTypeSerializer
-    
-class UserProfileListView(generics.ListAPIView):
-    queryset = UserProfile.objects.all()
+
+
+class TierFilterMixin:
+    """``?tier=free|premium`` narrows the profiles to one subscription tier."""
+
+    def invalid_tier(self, request):
+        tier = request.query_params.get('tier')
+        if tier and tier not in dict(SubscriptionType.SUBSCRIPTION_CHOICES):
+            return Response(
+                {'error': f"tier must be one of: {', '.join(dict(SubscriptionType.SUBSCRIPTION_CHOICES))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return None
+
+    def filter_tier(self, queryset):
+        tier = self.request.query_params.get('tier')
+        if tier:
+            queryset = queryset.filter(subscription_type__name=tier)
+        return queryset
+
+
+class UserProfileListView(TierFilterMixin, generics.ListAPIView):
     serializer_class = UserProfileSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = UserProfileCursorPagination
+
+    def get_queryset(self):
+        # only the columns UserProfileSerializer reads, not the whole auth_user row
+        queryset = UserProfile.objects.select_related('user', 'subscription_type').only(
+            'id', 'img', 'user__username', 'subscription_type__name'
+        )
+        return self.filter_tier(queryset)
+
+    def list(self, request, *args, **kwargs):
+        return self.invalid_tier(request) or super().list(request, *args, **kwargs)
+
+
+class Echo:
+    """File-like object for csv.writer that hands each row back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+class UserProfileExportView(TierFilterMixin, APIView):
+    """Every profile as CSV, streamed in chunks so large user bases never sit in memory."""
+    permission_classes = [IsAdminUser]
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        invalid = self.invalid_tier(request)
+        if invalid:
+            return invalid
+
+        rows = self.filter_tier(UserProfile.objects.order_by('id')).values_list(
+            'id', 'user__username', 'subscription_type__name', 'img'
+        )
+        response = StreamingHttpResponse(self.stream(request, rows), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="user-profiles.csv"'
+        return response
+
+    def stream(self, request, rows):
+        writer = csv.writer(Echo())
+        tiers = dict(SubscriptionType.SUBSCRIPTION_CHOICES)
+        storage = UserProfile._meta.get_field('img').storage
+
+        yield writer.writerow(['id', 'username', 'subscription_type', 'img'])
+        for profile_id, username, tier, img in rows.iterator(chunk_size=self.chunk_size):
+            yield writer.writerow([
+                profile_id, username, tiers.get(tier, tier), request.build_absolute_uri(storage.url(img)) if img else ''
+            ])
+
 
 class UserProfileDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = UserProfile.objects.all()
+    queryset = UserProfile.objects.select_related('user', 'subscription_type')
     serializer_class = UserProfileSerializer
 
 class UserProfileView(generics.RetrieveAPIView):
@@ -32,7 +104,7 @@ class UserProfileView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return UserProfile.objects.get(user=self.request.user)
+        return UserProfile.objects.select_related('user', 'subscription_type').get(user=self.request.user)
 
 class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
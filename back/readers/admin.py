@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.contrib import messages
 from django.utils.html import format_html
 from django.conf import settings
+from asgiref.sync import async_to_sync
+from core.db import serialized_write
 from .models import Book, Chapter
 from .ollama_extractor import OllamaExtractor
 from .pollinations_generator import PollinationsGenerator
@@ -86,7 +88,7 @@ class BookAdmin(admin.ModelAdmin):
         }),
     )
     
-    actions = ['regenerate_images', 'reprocess_metadata']
+    actions = ['regenerate_images', 'regenerate_images_new_seed', 'reprocess_metadata']
     
     def cover_preview_small(self, obj):
         if obj.cover_image:
@@ -150,18 +152,18 @@ class BookAdmin(admin.ModelAdmin):
                 obj.language = result['language']
                 obj.is_processed = True
                 obj.processing_error = None
-                obj.save()
-                
-                obj.chapters.all().delete()
                 
                 chapter_summaries = result.get('chapter_summaries', {})
-                for idx, chapter_title in enumerate(result['chapters'], start=1):
-                    Chapter.objects.create(
-                        book=obj,
-                        title=chapter_title,
-                        chapter_number=idx,
-                        summary=chapter_summaries.get(idx, '')
-                    )
+                with serialized_write():
+                    obj.save()
+                    obj.chapters.all().delete()
+                    for idx, chapter_title in enumerate(result['chapters'], start=1):
+                        Chapter.objects.create(
+                            book=obj,
+                            title=chapter_title,
+                            chapter_number=idx,
+                            summary=chapter_summaries.get(idx, '')
+                        )
                 
                 self.message_user(
                     request,
@@ -194,7 +196,7 @@ class BookAdmin(admin.ModelAdmin):
         else:
             super().save_model(request, obj, form, change)
     
-    def _generate_free_images(self, request, book_obj, metadata):
+    def _generate_free_images(self, request, book_obj, metadata, new_seed=False):
         
         try:
             self.message_user(
@@ -205,24 +207,41 @@ class BookAdmin(admin.ModelAdmin):
             
             image_gen = PollinationsGenerator()
             
-            self.message_user(request, "Generating book cover", level=messages.INFO)
+            max_images = getattr(settings, 'MAX_CHAPTER_IMAGES', 10)
+            chapters = list(book_obj.chapters.all()[:max_images])
+            
+            self.message_user(
+                request,
+                f"Generating book cover and {len(chapters)} chapter illustrations...",
+                level=messages.INFO
+            )
             
             cover_data = {
                 'title': metadata['title'],
                 'author': metadata['author'],
                 'genre': metadata['genre'],
-                'description': metadata['description']
+                'description': metadata['description'],
+                'cover_prompt': metadata.get('cover_prompt', '')
             }
             
-            cover_file, cover_prompt = image_gen.generate_book_cover(cover_data)
+            (cover, cover_prompt), illustrations = async_to_sync(image_gen.agenerate_images)(
+                cover_data,
+                [
+                    {'chapter_number': chapter.chapter_number, 'title': chapter.title, 'summary': chapter.summary}
+                    for chapter in chapters
+                ],
+                new_seed=new_seed
+            )
             
-            if cover_file:
+            if cover:
                 book_obj.cover_image.save(
                     f"cover_{book_obj.id}.jpg",
-                    cover_file,
+                    cover.file,
                     save=False
                 )
                 book_obj.cover_prompt = cover_prompt
+                book_obj.cover_lqip = cover.lqip
+                book_obj.cover_color = cover.color
                 self.message_user(
                     request,
                     "Book cover generated",
@@ -235,46 +254,25 @@ class BookAdmin(admin.ModelAdmin):
                     level=messages.WARNING
                 )
             
-            max_images = getattr(settings, 'MAX_CHAPTER_IMAGES', 10)
-            chapters = book_obj.chapters.all()[:max_images]
-            
-            if chapters:
-                self.message_user(
-                    request,
-                    f"Generating {len(chapters)} chapter illustrations...",
-                    level=messages.INFO
-                )
-            
-            book_context = {
-                'title': metadata['title'],
-                'genre': metadata['genre']
-            }
-            
-            generated_count = 0
-            for chapter in chapters:
-                chapter_data = {
-                    'chapter_number': chapter.chapter_number,
-                    'title': chapter.title,
-                    'summary': chapter.summary
-                }
-                
-                illustration_file, illustration_prompt = image_gen.generate_chapter_illustration(
-                    chapter_data,
-                    book_context
-                )
-                
-                if illustration_file:
+            generated = []
+            for chapter, (illustration, illustration_prompt) in zip(chapters, illustrations):
+                if illustration:
                     chapter.illustration.save(
                         f"chapter_{book_obj.id}_{chapter.chapter_number}.jpg",
-                        illustration_file,
+                        illustration.file,
                         save=False
                     )
                     chapter.illustration_prompt = illustration_prompt
-                    chapter.save()
-                    generated_count += 1
+                    chapter.illustration_lqip = illustration.lqip
+                    chapter.illustration_color = illustration.color
+                    generated.append(chapter)
             
-            book_obj.images_generated = True
-            book_obj.save()
+            with serialized_write():
+                for chapter in generated:
+                    chapter.save()
+                book_obj.images_generated = True
+                book_obj.save()
+            generated_count = len(generated)
             
             self.message_user(
                 request,
@@ -289,16 +287,17 @@ class BookAdmin(admin.ModelAdmin):
                 level=messages.WARNING
             )
     
-    def regenerate_images(self, request, queryset):
+    def regenerate_images(self, request, queryset, new_seed=False):
         for book in queryset:
             if book.is_processed:
                 metadata = {
                     'title': book.title,
                     'author': book.author,
                     'genre': book.genre,
-                    'description': book.description
+                    'description': book.description,
+                    'cover_prompt': '' if new_seed else book.cover_prompt
                 }
-                self._generate_free_images(request, book, metadata)
+                self._generate_free_images(request, book, metadata, new_seed=new_seed)
         
         self.message_user(
             request,
@@ -307,6 +306,10 @@ class BookAdmin(admin.ModelAdmin):
         )
     regenerate_images.short_description = "Regenerate AI images for selected books"
     
+    def regenerate_images_new_seed(self, request, queryset):
+        self.regenerate_images(request, queryset, new_seed=True)
+    regenerate_images_new_seed.short_description = "Regenerate AI images with a new seed (bypasses image cache)"
+    
     def reprocess_metadata(self, request, queryset):
         for book in queryset:
             try:
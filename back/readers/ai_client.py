@@ -0,0 +1,118 @@
+import asyncio
+import time
+import httpx
+from django.conf import settings
+
+
+class AsyncAIClient:
+    """Non-blocking HTTP client for Ollama and Pollinations.
+
+    One event loop can keep many slow generations in flight at once; the
+    semaphores cap how many each upstream sees concurrently (Ollama usually
+    serves one or two requests at a time, Pollinations many more).
+
+        async with AsyncAIClient() as client:
+            text = await client.ollama_generate(prompt)
+    """
+
+    def __init__(self, ollama_url: str = None, ollama_model: str = None,
+                 ollama_concurrency: int = None, image_concurrency: int = None, embed_model: str = None):
+        self.ollama_url = ollama_url or getattr(settings, 'OLLAMA_URL', 'http://localhost:11434')
+        self.ollama_model = ollama_model or getattr(settings, 'OLLAMA_MODEL', 'qwen2.5:3b')
+        self.embed_model = embed_model or getattr(settings, 'OLLAMA_EMBED_MODEL', 'nomic-embed-text')
+        self._ollama_slots = asyncio.Semaphore(ollama_concurrency or getattr(settings, 'OLLAMA_CONCURRENCY', 2))
+        self._image_slots = asyncio.Semaphore(image_concurrency or getattr(settings, 'POLLINATIONS_CONCURRENCY', 6))
+        self._client = None
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16),
+            follow_redirects=True,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._client.aclose()
+        self._client = None
+
+    async def ollama_generate(self, prompt: str, max_tokens: int = 200, temperature: float = 0.7,
+                              timeout: float = 60, retries: int = 1, num_ctx: int = None) -> str:
+        """Text from Ollama's ``/api/generate``; raises once every attempt has failed."""
+        options = {"num_predict": max_tokens, "temperature": temperature}
+        if num_ctx:
+            options["num_ctx"] = num_ctx
+
+        payload = {"model": self.ollama_model, "prompt": prompt, "stream": False, "options": options}
+        error = None
+
+        for attempt in range(retries):
+            try:
+                async with self._ollama_slots:
+                    start = time.perf_counter()
+                    response = await self._client.post(
+                        f"{self.ollama_url}/api/generate", json=payload, timeout=timeout * (attempt + 1)
+                    )
+                print(f"Ollama responded in {time.perf_counter() - start:.1f}s")
+
+                if response.status_code == 200:
+                    return response.json()["response"]
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except httpx.TimeoutException:
+                error = f"Ollama timed out after {timeout * (attempt + 1)}s"
+            except httpx.HTTPError as e:
+                error = f"Cannot connect to Ollama: {e}"
+
+            print(f"Ollama attempt {attempt + 1}/{retries} failed: {error}")
+            if attempt < retries - 1:
+                await asyncio.sleep(3 * (attempt + 1))
+
+        raise Exception(error or "Failed after all retries")
+
+    async def ollama_embed(self, texts, timeout: float = 60, retries: int = 2):
+        """One embedding per text from Ollama's ``/api/embed``; raises ``httpx.HTTPError`` once every attempt has failed."""
+        payload = {"model": self.embed_model, "input": list(texts)}
+        error = None
+
+        for attempt in range(retries):
+            try:
+                async with self._ollama_slots:
+                    response = await self._client.post(f"{self.ollama_url}/api/embed", json=payload, timeout=timeout)
+
+                if response.status_code == 200:
+                    return response.json()["embeddings"]
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+            except httpx.TimeoutException:
+                error = f"Ollama timed out after {timeout}s"
+            except httpx.HTTPError as e:
+                error = f"Cannot connect to Ollama: {e}"
+
+            print(f"Ollama embed attempt {attempt + 1}/{retries} failed: {error}")
+            if attempt < retries - 1:
+                await asyncio.sleep(2 * (attempt + 1))
+
+        # a transport error, so callers can tell Ollama being down from a bug
+        raise httpx.HTTPError(error or "Failed after all retries")
+
+    async def fetch_image(self, url: str, timeout: float = 30, retries: int = 2):
+        """Image bytes from ``url``, or None when every attempt failed or returned something else."""
+        for attempt in range(retries):
+            try:
+                async with self._image_slots:
+                    response = await self._client.get(url, timeout=timeout)
+
+                content_type = response.headers.get('content-type', '')
+                if response.status_code == 200 and 'image' in content_type:
+                    print(f"Image generated successfully ({len(response.content)} bytes)")
+                    return response.content
+
+                print(f"HTTP {response.status_code} ({content_type})")
+            except httpx.TimeoutException:
+                print(f"Request timed out (attempt {attempt + 1}/{retries})")
+            except httpx.HTTPError as e:
+                print(f"Error: {e}")
+
+            if attempt < retries - 1:
+                await asyncio.sleep((attempt + 1) * 2)
+
+        print("Failed to generate image after all retries")
+        return None
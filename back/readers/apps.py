@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ReadersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'readers'
+
+    def ready(self):
+        import core.checks
+        import readers.signals
@@ -0,0 +1,250 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from purchasers.authentication import ClaimsJWTAuthentication
+from purchasers.utils import aget_subscription_tier, can_access_chapter
+from .conditional import make_etag
+from .fieldsets import SparseFieldsMixin
+from .models import Book, Chapter
+from .permissions import CanAccessChapter
+from .popularity import view_counter
+from .response_cache import agenerations, aget_or_compute, cache_key, fresh_reads
+from .serializers import BookSerializer, ChapterSerializer
+from .views import AllChaptersView, BookDetailView, BookListView, ChapterDetailView
+
+# renderers the async path produces itself; anything else (the browsable API) goes to DRF
+ASYNC_MEDIA_TYPES = ('application/json', 'application/msgpack')
+
+
+class AsyncReadView(View):
+    """Async counterpart of a cached DRF read view, for ASGI deployments.
+
+    Serves the same cache entries, validators and payloads as ``sync_view``
+    without leaving the event loop. Anything the async path doesn't handle
+    (the browsable API, ``?expand=``, a cold list page) is handed to
+    ``sync_view`` in a worker thread, so responses never differ between the two.
+
+    Subclasses implement ``async def aretrieve(request, user, *args, **kwargs)``
+    returning ``(data, validators, last_modified)``, or None to defer to
+    ``sync_view``. ``data`` may be a coroutine function, awaited only when the
+    response isn't a 304.
+    """
+    sync_view = None
+    sync_handler = None
+    serializer_class = None
+    http_method_names = ['get', 'head', 'options']
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        sync_view = cls.sync_view.as_view(**initkwargs)
+
+        def sync_handler(request, *args, **kwargs):
+            # rendered in the worker thread too, so the serializer never runs on the event loop
+            return sync_view(request, *args, **kwargs).render()
+
+        # passed per view function, so each as_view() falls back to its own sync view
+        return super().as_view(sync_handler=sync_to_async(sync_handler), **initkwargs)
+
+    async def get(self, request, *args, **kwargs):
+        renderer, media_type = self.negotiate(request)
+        if renderer is None or request.GET.get('expand'):
+            return await self.fallback(request, *args, **kwargs)
+
+        try:
+            user = await self.authenticate(request)
+            result = await self.aretrieve(request, user, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.error_response(exc, renderer, media_type)
+
+        if result is None:
+            return await self.fallback(request, *args, **kwargs)
+
+        data, validators, last_modified = result
+        etag = make_etag(request.get_full_path(), media_type, *validators)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            if callable(data):
+                data = await data()
+            response = self.render(data, renderer, media_type)
+
+        response['ETag'] = etag
+        if timestamp:
+            response['Last-Modified'] = http_date(timestamp)
+        patch_vary_headers(response, ['Accept', 'Authorization'])
+        return response
+
+    async def acached(self, key, gens, aload):
+        """``aretrieve``'s result for an entry cached under ``key``, as in ``ConditionalGetMixin.cached_response``.
+
+        On a miss ``aload()`` returns ``(metadata, instance)``, and the
+        instance is only serialized (and cached) when the response isn't a 304.
+        """
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry, entry['data']
+
+        with fresh_reads(gens):
+            meta, instance = await aload()
+
+        async def serialize():
+            # in a worker thread like the fallback's, so a large payload never blocks the event loop
+            data = await sync_to_async(lambda: self.get_serializer(instance).data)()
+            return {**meta, 'data': data}
+
+        async def data():
+            return (await aget_or_compute(key, serialize, gens=gens))['data']
+
+        return meta, data
+
+    async def fallback(self, request, *args, **kwargs):
+        return await self.sync_handler(request, *args, **kwargs)
+
+    def negotiate(self, request):
+        renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+        try:
+            renderer, media_type = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS().select_renderer(
+                Request(request), renderers
+            )
+        except exceptions.NotAcceptable:
+            return None, None
+
+        if renderer.media_type not in ASYNC_MEDIA_TYPES:
+            return None, None
+        return renderer, media_type
+
+    async def authenticate(self, request):
+        result = await ClaimsJWTAuthentication().aauthenticate(request)
+        if result is None:
+            return AnonymousUser()
+        return result[0]
+
+    def get_serializer(self, *args, **kwargs):
+        return self.serializer_class(*args, context={'request': self.request, 'view': self}, **kwargs)
+
+    def render(self, data, renderer, media_type, status_code=status.HTTP_200_OK):
+        response = HttpResponse(
+            renderer.render(data, media_type, {'request': self.request, 'view': self}),
+            content_type=renderer.media_type,
+            status=status_code
+        )
+        response['Allow'] = ', '.join(method.upper() for method in self._allowed_methods())
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+    def error_response(self, exc, renderer, media_type):
+        # same shape as rest_framework.views.exception_handler
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        status_code = exc.status_code
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            status_code = status.HTTP_401_UNAUTHORIZED
+
+        response = self.render(data, renderer, media_type, status_code)
+        if status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = ClaimsJWTAuthentication().authenticate_header(self.request)
+        return response
+
+
+class AsyncBookListView(AsyncReadView):
+    """Cached pages are served async; building a page (filters, cursor, facets) stays in DRF."""
+    sync_view = BookListView
+    serializer_class = BookSerializer
+
+    async def aretrieve(self, request, user, *args, **kwargs):
+        gens = await agenerations('books')
+        entry = await cache.aget(cache_key('books', gens, request.get_full_path()))
+        if entry is None:
+            return None
+
+        return entry['data'], entry['validators'], None
+
+
+class AsyncBookDetailView(SparseFieldsMixin, AsyncReadView):
+    sync_view = BookDetailView
+    serializer_class = BookSerializer
+    required_columns = BookDetailView.required_columns
+
+    async def aretrieve(self, request, user, *args, **kwargs):
+        gens = await agenerations(f"book:{kwargs['pk']}")
+        key = cache_key('book', gens, request.get_full_path())
+        entry, data = await self.acached(key, gens, lambda: self._aload_validators(kwargs['pk']))
+
+        return data, entry['validators'], entry['last_modified']
+
+    async def _aload_validators(self, pk):
+        try:
+            book = await self.trim_queryset(Book.objects.all()).aget(pk=pk)
+        except Book.DoesNotExist:
+            raise exceptions.NotFound(f"No {Book._meta.object_name} matches the given query.")
+
+        return {'validators': (book.pk, book.updated_at), 'last_modified': book.updated_at}, book
+
+
+class AsyncChapterDetailView(SparseFieldsMixin, AsyncReadView):
+    sync_view = ChapterDetailView
+    serializer_class = ChapterSerializer
+    required_columns = ChapterDetailView.required_columns
+
+    async def aretrieve(self, request, user, *args, **kwargs):
+        book_id = kwargs['book_id']
+        gens = await agenerations(f"book:{book_id}", f"book:{book_id}:chapters")
+        key = cache_key('chapter', gens, request.get_full_path())
+        entry, data = await self.acached(key, gens, lambda: self._aload_validators(book_id, kwargs['chapter_id']))
+
+        # the payload is shared across tiers; access is still checked per request
+        await aget_subscription_tier(user)
+        chapter = Chapter(chapter_number=entry['chapter_number'], book=Book(accessibility=entry['book_accessibility']))
+        if not can_access_chapter(user, chapter):
+            if not user.is_authenticated:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied(CanAccessChapter.message)
+
+        async def counted():
+            # only called for a 200: a 304 revalidation isn't a view
+            view_counter.incr(int(book_id), entry['chapter_number'])
+            return await data() if callable(data) else data
+
+        return counted, entry['validators'], entry['last_modified']
+
+    async def _aload_validators(self, book_id, chapter_number):
+        try:
+            chapter = await self.trim_queryset(Chapter.objects.all()).aget(
+                chapter_number=chapter_number,
+                book_id=book_id
+            )
+        except Chapter.DoesNotExist:
+            raise exceptions.NotFound("Chapter not found in this book.")
+
+        return {
+            'chapter_number': chapter.chapter_number,
+            'book_accessibility': chapter.book.accessibility,
+            'validators': (chapter.pk, chapter.updated_at, chapter.book.updated_at),
+            'last_modified': max(chapter.updated_at, chapter.book.updated_at)
+        }, chapter
+
+
+class AsyncAllChaptersView(AsyncReadView):
+    """Cached chapter pages are served async; building one stays in DRF."""
+    sync_view = AllChaptersView
+    serializer_class = ChapterSerializer
+
+    async def aretrieve(self, request, user, *args, **kwargs):
+        if not user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+
+        book_id = kwargs['book_id']
+        tier = await aget_subscription_tier(user)
+        gens = await agenerations(f"book:{book_id}", f"book:{book_id}:chapters")
+        entry = await cache.aget(cache_key('chapters', gens, request.get_full_path(), tier))
+        if entry is None:
+            return None
+
+        return entry['data'], (*entry['validators'], tier), None
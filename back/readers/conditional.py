@@ -0,0 +1,85 @@
+import hashlib
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from .response_cache import fresh_reads, get_or_compute
+
+
+def make_etag(*parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return quote_etag(digest[:32])
+
+
+def queryset_fingerprint(queryset, timestamp_field='updated_at', **extra):
+    """``(max timestamp, max id, count)`` in one aggregate query; changes on insert, update and delete."""
+    return queryset.order_by().aggregate(
+        latest=Max(timestamp_field),
+        max_id=Max('id'),
+        count=Count('id'),
+        **extra
+    )
+
+
+class ConditionalGetMixin:
+    """Answers If-None-Match / If-Modified-Since before the serializer runs.
+
+    Views call :meth:`check_not_modified` once they know their validators;
+    a non-None return value is the 304 to send. The validators are attached
+    to the eventual 200 response in ``finalize_response``.
+    """
+
+    def check_not_modified(self, *parts, last_modified=None):
+        request = self.request
+        # the same resource renders differently per query string (cursor, filters, fields)
+        # and per negotiated format (JSON or MessagePack)
+        etag = make_etag(request.get_full_path(), getattr(request, 'accepted_media_type', ''), *parts)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        self._validators = (etag, timestamp)
+        return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+    def cached_response(self, key, gens, load, serialize, *parts, use_last_modified=True):
+        """The response for a payload cached under ``key``, or its 304.
+
+        An entry is the metadata ``load()`` returns (``validators``, optional
+        ``last_modified`` and whatever :meth:`entry_loaded` reads) plus the
+        ``data`` from ``serialize(instance)``. ``load()`` returns
+        ``(metadata, instance)`` from cheap queries, so on a cache miss a
+        client revalidating a current copy gets its 304 before anything is
+        serialized, and only a 200 fills the cache.
+        """
+        entry = cache.get(key)
+        if entry is None:
+            with fresh_reads(gens):
+                meta, instance = load()
+        else:
+            meta, instance = entry, None
+
+        self.entry_loaded(meta)
+        last_modified = meta.get('last_modified') if use_last_modified else None
+        not_modified = self.check_not_modified(*meta['validators'], *parts, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        if entry is None:
+            entry = get_or_compute(key, lambda: {**meta, 'data': serialize(instance)}, gens=gens)
+        return Response(entry['data'])
+
+    def entry_loaded(self, entry):
+        """Per-request checks on an entry's metadata, cached or not, before any 304 is sent."""
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        validators = getattr(self, '_validators', None)
+        if validators and (200 <= response.status_code < 300 or response.status_code == 304):
+            etag, timestamp = validators
+            if not response.has_header('ETag'):
+                response['ETag'] = etag
+            if timestamp and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(timestamp)
+            patch_vary_headers(response, ['Accept', 'Authorization'])
+
+        return response
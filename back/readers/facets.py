@@ -0,0 +1,93 @@
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.db.models import Count
+from .models import Book
+from .response_cache import bump, cache_key, generations
+
+FACET_FIELDS = ('genre', 'language', 'accessibility')
+
+
+def selected_filters(query_params):
+    """``?genre=fantasy,mystery&language=English`` -> ``{'genre': {...}, 'language': {...}}``"""
+    filters = {}
+    for field in FACET_FIELDS:
+        raw = query_params.get(field, '')
+        values = {value.strip() for value in raw.split(',') if value.strip()}
+        if values:
+            filters[field] = values
+    return filters
+
+
+def facet_rows(queryset=None, search=''):
+    """Book counts grouped by every (genre, language, accessibility) combination.
+
+    One grouped query, cached until the next Book write. The result is tiny
+    (choices x languages x tiers), so any filter combination can be answered
+    from it in Python. ``queryset`` holds the books matching ``search`` (the
+    ``?search=`` terms), which key the cached rows.
+    """
+    key = cache_key('facets', generations('facets'), search)
+    rows = cache.get(key)
+    if rows is None:
+        queryset = Book.objects.all() if queryset is None else queryset
+        # read from the primary: the rows are cached until the next write, so a
+        # lagging replica would keep serving pre-write counts
+        rows = list(
+            queryset.using(router.db_for_write(Book)).order_by()
+            .values(*FACET_FIELDS)
+            .annotate(count=Count('id'))
+            .values_list(*FACET_FIELDS, 'count')
+        )
+        cache.set(key, rows, getattr(settings, 'BOOK_FACETS_CACHE_TIMEOUT', 3600))
+    return rows
+
+
+def invalidate_facets():
+    bump('facets')
+
+
+def compute_facets(filters, queryset=None, search=''):
+    """Disjunctive facet counts: each facet is counted under every filter except its own,
+    so picking one genre still shows how many books the other genres have."""
+    rows = facet_rows(queryset, search)
+    counters = {field: Counter() for field in FACET_FIELDS}
+    total = 0
+
+    for row in rows:
+        values = dict(zip(FACET_FIELDS, row[:-1]))
+        count = row[-1]
+        failing = [field for field, allowed in filters.items() if values[field] not in allowed]
+
+        if not failing:
+            total += count
+            for field in FACET_FIELDS:
+                counters[field][values[field]] += count
+        elif len(failing) == 1:
+            counters[failing[0]][values[failing[0]]] += count
+
+    labels = {
+        'genre': dict(Book.GENRE_CHOICES),
+        'accessibility': dict(Book.ACCESSIBILITY_CHOICES),
+    }
+
+    facets = {'total': total}
+    for field in FACET_FIELDS:
+        choice_labels = labels.get(field)
+        if choice_labels is not None:
+            values = list(choice_labels)
+        else:
+            values = sorted(value for value in counters[field] if value)
+
+        facets[field] = [
+            {
+                'value': value,
+                'label': choice_labels.get(value, value) if choice_labels else value,
+                'count': counters[field][value],
+                'selected': value in filters.get(field, ()),
+            }
+            for value in values
+        ]
+
+    return facets
@@ -0,0 +1,54 @@
+from django.db.models import Prefetch
+from purchasers.utils import ChapterAccessResolver
+from .models import Chapter
+from .response_cache import generations
+
+
+class SparseFieldsMixin:
+    """Passes ``?fields=`` / ``?expand=`` to the serializer and trims the queryset to match.
+
+    ``required_columns`` are columns the view itself reads (pagination
+    ordering, conditional-GET validators) on top of what the serializer needs.
+    """
+    required_columns = ()
+
+    def requested(self, param):
+        if not self.request:
+            return []
+        # DRF requests have query_params; the async views get a plain HttpRequest
+        raw = getattr(self.request, 'query_params', self.request.GET).get(param, '')
+        return [value.strip() for value in raw.split(',') if value.strip()]
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested('fields') or None)
+        kwargs.setdefault('expand', self.requested('expand') or None)
+        return super().get_serializer(*args, **kwargs)
+
+    def expansion_parts(self, book_id=None):
+        """Cache key and validator parts for what ``?expand=chapters`` adds to a book.
+
+        Expanded chapters carry ``is_locked``, which depends on the caller's
+        tier, and change with chapter edits that the book's own generation
+        doesn't follow: ``book:<id>:chapters`` for one book, ``chapters`` for a list.
+        """
+        if 'chapters' not in self.requested('expand'):
+            return ()
+
+        gens = generations(f"book:{book_id}:chapters" if book_id is not None else 'chapters')
+        return (*gens, ChapterAccessResolver(self.request.user).tier)
+
+    def trim_queryset(self, queryset):
+        serializer = self.get_serializer()
+        columns = serializer.only_columns() | set(self.required_columns)
+
+        relations = {column.split('__', 1)[0] for column in columns if '__' in column}
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+
+        if 'chapters' in serializer.expanded:
+            chapters = Chapter.objects.only('id', 'book_id', 'chapter_number', 'title', 'illustration')
+            chapters = ChapterAccessResolver(self.request.user).annotate(chapters)
+            queryset = queryset.prefetch_related(Prefetch('chapters', queryset=chapters))
+
+        return queryset.only(*columns, *relations)
@@ -0,0 +1,132 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_etags, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def file_validators(path: str):
+    stat = os.stat(path)
+    etag = f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+    return etag, int(stat.st_mtime), stat.st_size
+
+
+def parse_range(header: str, size: int):
+    """Return ``(start, end)`` for a single satisfiable byte range, ``None`` to send the
+    whole file, or ``False`` when the range cannot be satisfied."""
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Malformed or multi-range requests fall back to a full response
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+
+    return start, min(end, size - 1)
+
+
+def _range_applies(request, etag, last_modified) -> bool:
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+
+    if if_range.startswith(('"', 'W/')):
+        return etag in parse_etags(if_range)
+
+    since = parse_http_date_safe(if_range)
+    return since is not None and last_modified <= since
+
+
+def _iter_range(path: str, start: int, length: int):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _offload_response(name: str, path: str):
+    backend = getattr(settings, 'BOOK_FILE_SENDFILE_BACKEND', None)
+
+    if backend == 'nginx':
+        response = HttpResponse()
+        prefix = getattr(settings, 'BOOK_FILE_ACCEL_PREFIX', '/protected-media/')
+        # nginx decodes the URI, so names with spaces, '?' or '#' reach the right file
+        response['X-Accel-Redirect'] = quote(f"{prefix.rstrip('/')}/{name}")
+        return response
+
+    if backend == 'xsendfile':
+        response = HttpResponse()
+        # mod_xsendfile unescapes the path (XSendFileUnescape, on by default)
+        response['X-Sendfile'] = quote(path)
+        return response
+
+    return None
+
+
+def serve_book_file(request, book):
+    """Send ``book.file`` with validators, Range support and optional web-server offload."""
+    name = book.file.name
+    path = book.file.path
+    etag, last_modified, size = file_validators(path)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    filename = os.path.basename(name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    response = _offload_response(name, path)
+    if response is not None:
+        # The web server handles Range itself once it has the internal redirect
+        response['Content-Type'] = content_type
+    else:
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if range_header and _range_applies(request, etag, last_modified):
+            byte_range = parse_range(range_header, size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{size}"
+            return response
+
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(_iter_range(path, start, length), status=206, content_type=content_type)
+            response['Content-Range'] = f"bytes {start}-{end}/{size}"
+            response['Content-Length'] = str(length)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+
+    return response
@@ -0,0 +1,22 @@
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+from .facets import compute_facets, selected_filters
+from .models import Book
+
+
+class BookFacetFilter(BaseFilterBackend):
+    """Filters books by ``?genre=``, ``?language=`` and ``?accessibility=`` (comma-separated)."""
+
+    def filter_queryset(self, request, queryset, view):
+        for field, values in selected_filters(request.query_params).items():
+            queryset = queryset.filter(**{f'{field}__in': values})
+        return queryset
+
+
+def request_facets(request, view):
+    """Facet counts for the request's filters, over the books its ``?search=`` matches."""
+    search = SearchFilter()
+    return compute_facets(
+        selected_filters(request.query_params),
+        search.filter_queryset(request, Book.objects.all(), view),
+        ' '.join(search.get_search_terms(request)),
+    )
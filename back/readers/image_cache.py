@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ImageCache:
+    """Content-addressed on-disk cache for raw Pollinations image bytes.
+
+    Entries are keyed by (prompt, model, size, seed) and evicted least
+    recently used first once the directory grows past ``max_bytes``. The
+    directory is scanned on the first write only; later writes add to a running
+    total, and the next scan happens when that total passes ``max_bytes``.
+    Eviction goes down to ``low_water`` of the limit, so a full cache isn't
+    rescanned on every write.
+    """
+    low_water = 0.9
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        self.cache_dir = Path(cache_dir or getattr(
+            settings, 'POLLINATIONS_CACHE_DIR', Path(settings.BASE_DIR) / 'cache' / 'pollinations'
+        ))
+        self.max_bytes = max_bytes or getattr(settings, 'POLLINATIONS_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+        self._total = None
+
+    @staticmethod
+    def make_key(prompt: str, model: str, width: int, height: int, seed: int) -> str:
+        raw = f"{model}|{width}x{height}|{seed}|{prompt}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.img"
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+
+        try:
+            os.utime(path)  # bump mtime so LRU eviction keeps hot entries
+        except OSError:
+            pass
+
+        return data
+
+    def set(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write image cache entry %s: %s", key, e)
+            return
+
+        if self._total is None:
+            self.evict()
+        else:
+            self._total += len(data) - replaced
+            if self._total > self.max_bytes:
+                self.evict()
+
+    def evict(self) -> int:
+        """Drop least recently used entries once the cache outgrows ``max_bytes``, down to ``low_water`` of it."""
+        if not self.cache_dir.exists():
+            self._total = 0
+            return 0
+
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob('*/*.img'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            self._total = total
+            return 0
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * self.low_water:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        self._total = total
+        return removed
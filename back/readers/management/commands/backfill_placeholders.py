@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from readers.models import Book, Chapter
+from readers.placeholders import compute_placeholder_from_file
+
+
+class Command(BaseCommand):
+    help = "Compute LQIP placeholders and dominant colors for existing covers and chapter illustrations"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Recompute even when a placeholder is already stored")
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        targets = [
+            (Book, 'cover_image', 'cover_lqip', 'cover_color'),
+            (Chapter, 'illustration', 'illustration_lqip', 'illustration_color'),
+        ]
+
+        for model, image_field, lqip_field, color_field in targets:
+            queryset = model.objects.exclude(Q(**{image_field: ''}) | Q(**{f"{image_field}__isnull": True}))
+            if not options['force']:
+                queryset = queryset.filter(**{lqip_field: ''})
+
+            updated, failed = self._backfill(
+                queryset.only('id', image_field), image_field, lqip_field, color_field, options['batch_size']
+            )
+
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: {updated} placeholder(s) computed, {failed} failed"
+            ))
+
+    def _backfill(self, queryset, image_field, lqip_field, color_field, batch_size):
+        model = queryset.model
+        batch = []
+        updated = 0
+        failed = 0
+
+        for obj in queryset.iterator(chunk_size=batch_size):
+            image = getattr(obj, image_field)
+            try:
+                with image.open('rb') as fh:
+                    lqip, color = compute_placeholder_from_file(fh)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"{model.__name__} {obj.id}: {e}"))
+                failed += 1
+                continue
+
+            setattr(obj, lqip_field, lqip)
+            setattr(obj, color_field, color)
+            batch.append(obj)
+
+            if len(batch) >= batch_size:
+                model.objects.bulk_update(batch, [lqip_field, color_field])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            model.objects.bulk_update(batch, [lqip_field, color_field])
+            updated += len(batch)
+
+        return updated, failed
@@ -0,0 +1,211 @@
+import asyncio
+import io
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from purchasers.authentication import TierTokenObtainPairSerializer
+from purchasers.models import UserProfile
+from readers.ai_client import AsyncAIClient
+from readers.benchmarks import percentile
+from readers.models import Book
+
+SERVERS = {
+    'wsgi': (
+        [sys.executable, '-m', 'gunicorn', 'core.wsgi:application', '--log-level', 'warning', '-w', '{workers}',
+         '-b', '127.0.0.1:{port}'],
+        {},
+    ),
+    'asgi': (
+        [sys.executable, '-m', 'uvicorn', 'core.asgi:application', '--log-level', 'warning', '--no-access-log',
+         '--workers', '{workers}', '--port', '{port}'],
+        {'ASYNC_READ_VIEWS': '1'},
+    ),
+}
+
+
+def _stub_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 96), (52, 37, 30)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare gunicorn sync workers (WSGI) with uvicorn workers serving readers.async_views (ASGI) "
+        "at the same worker count on the book/chapter read endpoints, and blocking vs AsyncAIClient "
+        "calls against a slow stub upstream. Seed a catalog first (manage.py seed_catalog)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=32, help="Concurrent client connections")
+        parser.add_argument('--duration', type=float, default=10, help="Seconds of load per server")
+        parser.add_argument('--port', type=int, default=8790)
+        parser.add_argument('--username', help="Reader to issue a token for (default: the first premium reader)")
+        parser.add_argument('--sample-books', type=int, default=50)
+        parser.add_argument('--upstream-delay', type=float, default=0.5, help="Seconds the stub AI upstream takes")
+        parser.add_argument('--calls', type=int, default=12, help="Outbound calls per outbound run")
+        parser.add_argument('--skip-servers', action='store_true')
+        parser.add_argument('--skip-outbound', action='store_true')
+
+    def handle(self, *args, **options):
+        if not options['skip_outbound']:
+            self._bench_outbound(options)
+        if not options['skip_servers']:
+            self._bench_servers(options)
+
+    # outbound AI calls
+
+    def _bench_outbound(self, options):
+        delay = options['upstream_delay']
+        image = _stub_image()
+
+        class SlowUpstream(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(delay)
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(image)))
+                self.end_headers()
+                self.wfile.write(image)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SlowUpstream)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls = [f"http://127.0.0.1:{server.server_port}/prompt/{n}" for n in range(options['calls'])]
+
+        try:
+            start = time.perf_counter()
+            for url in urls:
+                requests.get(url, timeout=30)
+            blocking = time.perf_counter() - start
+
+            async def fetch_all():
+                async with AsyncAIClient() as client:
+                    return await asyncio.gather(*[client.fetch_image(url) for url in urls])
+
+            start = time.perf_counter()
+            asyncio.run(fetch_all())
+            concurrent = time.perf_counter() - start
+        finally:
+            server.shutdown()
+
+        self.stdout.write(
+            f"\nOutbound: {options['calls']} image calls, {delay * 1000:.0f} ms upstream latency, "
+            f"POLLINATIONS_CONCURRENCY={getattr(settings, 'POLLINATIONS_CONCURRENCY', 6)}"
+        )
+        self.stdout.write(f"  blocking requests, one after another  {blocking:6.2f}s")
+        self.stdout.write(f"  AsyncAIClient on one event loop       {concurrent:6.2f}s  ({blocking / concurrent:.1f}x)\n")
+
+    # read endpoints under WSGI and ASGI
+
+    def _bench_servers(self, options):
+        paths = self._paths(options)
+        headers = {'Authorization': f"Bearer {self._token(options['username'])}"}
+
+        header = f"{'server':<6} {'workers':>7} {'reqs':>7} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}"
+        self.stdout.write(
+            f"\nRead endpoints: {options['concurrency']} connections, {options['duration']:.0f}s per server, "
+            f"{len(paths)} paths"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for name, (command, env) in SERVERS.items():
+            port = options['port']
+            process = subprocess.Popen(
+                [part.format(workers=options['workers'], port=port) for part in command],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, **env},
+            )
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                self._wait_until_up(base_url, process)
+                # one warm-up pass so both servers are measured with the response cache filled
+                asyncio.run(self._load(base_url, paths, headers, options['concurrency'], min(options['duration'], 3)))
+                result = asyncio.run(self._load(base_url, paths, headers, options['concurrency'], options['duration']))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+            latencies = result['latencies'] or [0.0]
+            self.stdout.write(
+                f"{name:<6} {options['workers']:>7} {len(result['latencies']):>7} "
+                f"{len(result['latencies']) / options['duration']:>8.0f} {percentile(latencies, 50):>8.1f} "
+                f"{percentile(latencies, 99):>8.1f} {max(latencies):>8.1f} {result['errors']:>7}"
+            )
+
+    def _paths(self, options):
+        books = list(
+            Book.objects.order_by('?').values_list('id', flat=True)[:options['sample_books']]
+        )
+        if not books:
+            raise CommandError("No books to read; run `manage.py seed_catalog` first")
+
+        paths = ['/books/', '/books/?genre=fiction']
+        for book_id in books:
+            paths += [
+                f"/books/{book_id}/",
+                f"/api/book/{book_id}/chapter/1/",
+                f"/api/book/{book_id}/chapter/2/",
+                f"/api/book/{book_id}/chapters/",
+            ]
+        return paths
+
+    def _token(self, username):
+        profiles = UserProfile.objects.select_related('user')
+        if username:
+            profile = profiles.filter(user__username=username).first()
+        else:
+            profile = profiles.filter(subscription_type__name='premium').order_by('id').first()
+
+        if profile is None:
+            raise CommandError("No reader to authenticate as; run `manage.py seed_catalog` or pass --username")
+        return str(TierTokenObtainPairSerializer.get_token(profile.user).access_token)
+
+    def _wait_until_up(self, base_url, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"Server exited with status {process.returncode}")
+            try:
+                requests.get(f"{base_url}/books/", timeout=2)
+                return
+            except requests.ConnectionError:
+                time.sleep(0.2)
+        raise CommandError(f"Server at {base_url} did not come up within {timeout}s")
+
+    async def _load(self, base_url, paths, headers, concurrency, duration):
+        result = {'latencies': [], 'errors': 0}
+        deadline = time.monotonic() + duration
+
+        async def worker(seed):
+            rng = random.Random(seed)
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(rng.choice(paths))
+                    if response.status_code >= 500:
+                        result['errors'] += 1
+                        continue
+                except httpx.HTTPError:
+                    result['errors'] += 1
+                    continue
+                result['latencies'].append((time.perf_counter() - start) * 1000)
+
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=30) as client:
+            await asyncio.gather(*[worker(n) for n in range(concurrency)])
+
+        return result
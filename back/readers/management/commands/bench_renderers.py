@@ -0,0 +1,81 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+from readers.models import Book, Chapter
+from readers.serializers import BookSerializer, ChapterSerializer
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark the stdlib JSON, orjson and MessagePack renderers on book and chapter payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        renderers = [
+            ('json (stdlib)', JSONRenderer()),
+            ('orjson', ORJSONRenderer()),
+            ('msgpack', MessagePackRenderer()),
+        ]
+
+        for size in options['sizes']:
+            payloads = {
+                'BookSerializer': BookSerializer(self._books(size), many=True).data,
+                'ChapterSerializer': ChapterSerializer(self._chapters(size), many=True).data,
+            }
+
+            for payload_name, data in payloads.items():
+                self.stdout.write(f"\n{payload_name} x {size}")
+                baseline = None
+                for name, renderer in renderers:
+                    timings = []
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        body = renderer.render(data)
+                        timings.append(time.perf_counter() - start)
+
+                    median = statistics.median(timings)
+                    baseline = baseline or median
+                    self.stdout.write(
+                        f"  {name:<14} {median * 1000:8.2f} ms  {len(body) / 1024:9.1f} KiB  "
+                        f"{baseline / median:5.1f}x"
+                    )
+
+    def _books(self, count):
+        now = timezone.now()
+        return [
+            Book(
+                id=i,
+                title=f"Book title {i}",
+                author=f"Author {i % 97}",
+                genre=Book.GENRE_CHOICES[i % len(Book.GENRE_CHOICES)][0],
+                description="A sweeping story about memory, loss and the sea. " * 6,
+                cover_image=f"readers/cas/00/00/{i:064x}.jpg",
+                cover_lqip="data:image/jpeg;base64," + "A" * 400,
+                cover_color="#34251e",
+                accessibility='premium' if i % 3 else 'free',
+                created_at=now,
+                updated_at=now,
+            )
+            for i in range(1, count + 1)
+        ]
+
+    def _chapters(self, count):
+        book = Book(id=1, title="Benchmark Book", accessibility='premium')
+        return [
+            Chapter(
+                id=i,
+                book=book,
+                chapter_number=i,
+                title=f"Chapter {i}",
+                summary="The narrator returns to the house by the water and finds it changed. " * 8,
+                illustration=f"readers/cas/00/00/{i:064x}.jpg",
+                illustration_lqip="data:image/jpeg;base64," + "A" * 400,
+                illustration_color="#589071",
+            )
+            for i in range(1, count + 1)
+        ]
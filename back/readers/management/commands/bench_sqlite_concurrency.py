@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from readers.benchmarks import percentile
+
+SCHEMA = [
+    """CREATE TABLE book (
+        id INTEGER PRIMARY KEY, title TEXT, author TEXT, description TEXT, created_at REAL
+    )""",
+    "CREATE INDEX book_created_id_idx ON book (created_at DESC, id DESC)",
+    """CREATE TABLE chapter (
+        id INTEGER PRIMARY KEY, book_id INTEGER REFERENCES book (id), chapter_number INTEGER,
+        title TEXT, summary TEXT, UNIQUE (book_id, chapter_number)
+    )""",
+]
+
+PAGE_SQL = "SELECT id, title, author, created_at FROM book ORDER BY created_at DESC, id DESC LIMIT 20"
+CHAPTER_SQL = "SELECT id, title, summary FROM chapter WHERE book_id = ? AND chapter_number = ?"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure read throughput while an ingestion writer is running, with SQLite's default "
+        "rollback journal and with the WAL/PRAGMA settings from SQLITE_PRAGMAS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=5, help="Seconds per mode")
+        parser.add_argument('--books', type=int, default=2000, help="Books in the starting catalog")
+        parser.add_argument('--chapters', type=int, default=30, help="Chapters per ingested book")
+
+    def handle(self, *args, **options):
+        pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+        busy_timeout = int(pragmas.get('busy_timeout', 5000))
+
+        modes = [
+            ('default journal', {'busy_timeout': busy_timeout}, 'BEGIN'),
+            ('WAL + pragmas', pragmas, 'BEGIN IMMEDIATE'),
+        ]
+
+        header = f"{'mode':<16} {'reads/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'locked':>7} {'books/s':>8}"
+        self.stdout.write(
+            f"{options['readers']} reader thread(s), 1 ingestion writer, {options['duration']:.0f}s per mode\n"
+        )
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for name, mode_pragmas, begin in modes:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'bench.sqlite3')
+                self._prepare(path, mode_pragmas, options['books'], options['chapters'])
+                result = self._run(path, mode_pragmas, begin, options)
+
+            self.stdout.write(
+                f"{name:<16} {result['reads'] / options['duration']:>9.0f} "
+                f"{percentile(result['latencies'], 50):>8.2f} {percentile(result['latencies'], 99):>8.2f} "
+                f"{max(result['latencies']):>8.2f} {result['locked']:>7} "
+                f"{result['writes'] / options['duration']:>8.1f}"
+            )
+
+    def _connect(self, path, pragmas):
+        conn = sqlite3.connect(path, isolation_level=None, timeout=int(pragmas.get('busy_timeout', 5000)) / 1000)
+        for pragma, value in pragmas.items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+        return conn
+
+    def _prepare(self, path, pragmas, books, chapters):
+        conn = self._connect(path, pragmas)
+        for sql in SCHEMA:
+            conn.execute(sql)
+
+        conn.execute('BEGIN')
+        now = time.time()
+        for book_id in range(1, books + 1):
+            self._insert_book(conn, book_id, now - book_id, chapters)
+        conn.execute('COMMIT')
+        conn.close()
+
+    @staticmethod
+    def _insert_book(conn, book_id, created_at, chapters):
+        conn.execute(
+            "INSERT INTO book (id, title, author, description, created_at) VALUES (?, ?, ?, ?, ?)",
+            [book_id, f"Book {book_id}", f"Author {book_id % 97}", "A long description. " * 40, created_at],
+        )
+        conn.executemany(
+            "INSERT INTO chapter (book_id, chapter_number, title, summary) VALUES (?, ?, ?, ?)",
+            [(book_id, n, f"Chapter {n}", "Summary sentence for the chapter. " * 60) for n in range(1, chapters + 1)],
+        )
+
+    def _run(self, path, pragmas, begin, options):
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'reads': 0, 'latencies': [], 'locked': 0, 'writes': 0}
+        seeded = options['books']
+
+        def writer():
+            conn = self._connect(path, pragmas)
+            book_id = seeded
+            while not stop.is_set():
+                book_id += 1
+                try:
+                    conn.execute(begin)
+                    self._insert_book(conn, book_id, time.time(), options['chapters'])
+                    conn.execute('COMMIT')
+                    result['writes'] += 1
+                except sqlite3.OperationalError:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    with lock:
+                        result['locked'] += 1
+            conn.close()
+
+        def reader(seed):
+            conn = self._connect(path, pragmas)
+            latencies = []
+            reads = locked = 0
+            i = seed
+            while not stop.is_set():
+                i += 1
+                start = time.perf_counter()
+                try:
+                    conn.execute(PAGE_SQL).fetchall()
+                    conn.execute(CHAPTER_SQL, [i % seeded + 1, i % options['chapters'] + 1]).fetchall()
+                except sqlite3.OperationalError:
+                    locked += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+                reads += 1
+            conn.close()
+
+            with lock:
+                result['reads'] += reads
+                result['locked'] += locked
+                result['latencies'].extend(latencies)
+
+        threads = [threading.Thread(target=writer)] + [
+            threading.Thread(target=reader, args=(n * 7919,)) for n in range(options['readers'])
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        result['latencies'] = result['latencies'] or [0.0]
+        return result
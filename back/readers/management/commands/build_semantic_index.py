@@ -0,0 +1,30 @@
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from readers.semantic import EMBEDDERS, get_embedder, semantic_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Embed book descriptions and chapter summaries for /books/semantic-search/. Only texts that "
+        "changed since the last build are sent to the embedder, so this is cheap to run after ingestion or from cron"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--embedder', choices=sorted(EMBEDDERS), help="Overrides SEMANTIC_EMBEDDER")
+
+    def handle(self, *args, **options):
+        embedder = EMBEDDERS[options['embedder']]() if options['embedder'] else get_embedder()
+
+        def progress(done, total):
+            self.stdout.write(f"  embedded {done}/{total}")
+
+        try:
+            rows, embedded = semantic_index.build(embedder, progress=progress)
+        except httpx.HTTPError as e:
+            raise CommandError(f"Embedding with {embedder.name} failed: {e}")
+
+        build = semantic_index.load()
+        layout = f"IVF, {len(build['centroids'])} clusters" if len(build['centroids']) else "brute force"
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {rows} text(s) with {embedder.name} ({embedded} embedded, {rows - embedded} reused; {layout})"
+        ))
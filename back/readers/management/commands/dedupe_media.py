@@ -0,0 +1,95 @@
+import os
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from readers.models import Book, Chapter
+from readers.storage import media_storage
+
+
+class Command(BaseCommand):
+    help = "Move covers and chapter illustrations into content-addressed storage, folding duplicates together"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without touching files")
+        parser.add_argument(
+            '--prune-orphans',
+            action='store_true',
+            help="Also delete files under readers/covers and readers/chapters that no row references"
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        migrated = {}
+        bytes_before = 0
+        bytes_after = 0
+
+        targets = [
+            (Book, 'cover_image'),
+            (Chapter, 'illustration'),
+        ]
+
+        for model, field in targets:
+            names = (
+                model.objects.exclude(Q(**{field: ''}) | Q(**{f"{field}__isnull": True}))
+                .exclude(**{f"{field}__startswith": f"{media_storage.prefix}/"})
+                .values_list(field, flat=True)
+                .distinct()
+            )
+
+            for name in names:
+                if name in migrated:
+                    new_name = migrated[name]
+                elif not media_storage.exists(name):
+                    self.stdout.write(self.style.WARNING(f"Missing file, skipped: {name}"))
+                    continue
+                else:
+                    size = media_storage.size(name)
+                    bytes_before += size
+
+                    with media_storage.open(name, 'rb') as fh:
+                        digest = media_storage.hash_content(File(fh))
+                        new_name = media_storage.cas_name(digest, os.path.splitext(name)[1] or '.bin')
+
+                        if new_name not in migrated.values() and not media_storage.exists(new_name):
+                            bytes_after += size
+                            if not dry_run:
+                                new_name = media_storage.save(new_name, File(fh))
+
+                    migrated[name] = new_name
+
+                if not dry_run:
+                    # queryset.update() skips the per-row signals; the old file is removed below
+                    model.objects.filter(**{field: name}).update(**{field: new_name})
+
+        if not dry_run:
+            for old_name in migrated:
+                media_storage.release(old_name)
+
+        orphans = self._find_orphans() if options['prune_orphans'] else []
+        orphan_bytes = 0
+        for name in orphans:
+            orphan_bytes += media_storage.size(name)
+            if not dry_run:
+                media_storage.delete(name)
+
+        prefix = "[dry run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Migrated {len(migrated)} file(s) into {len(set(migrated.values()))} unique blob(s); "
+            f"{(bytes_before - bytes_after) / 1024:.1f} KiB reclaimed by dedup"
+        ))
+        if options['prune_orphans']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{prefix}Pruned {len(orphans)} unreferenced file(s), {orphan_bytes / 1024:.1f} KiB"
+            ))
+
+    def _find_orphans(self):
+        orphans = []
+        for directory in ('readers/covers', 'readers/chapters'):
+            if not media_storage.exists(directory):
+                continue
+            _, files = media_storage.listdir(directory)
+            for filename in files:
+                name = f"{directory}/{filename}"
+                if media_storage.reference_count(name) == 0:
+                    orphans.append(name)
+        return orphans
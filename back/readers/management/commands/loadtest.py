@@ -0,0 +1,184 @@
+import random
+import threading
+import time
+from collections import defaultdict
+import requests
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from readers.benchmarks import percentile
+from readers.models import Book
+from readers.seeding import WORDS
+
+# scenario name -> relative weight
+SCENARIOS = {
+    'browse': 35,
+    'search': 15,
+    'read': 40,
+    'refresh': 10,
+}
+
+
+class Worker(threading.Thread):
+    """One virtual reader: logs in once, then runs weighted scenarios until the deadline."""
+
+    def __init__(self, command, username, deadline, seed):
+        super().__init__(daemon=True)
+        self.command = command
+        self.username = username
+        self.deadline = deadline
+        self.random = random.Random(seed)
+        self.session = requests.Session()
+        self.session.headers['Accept'] = 'application/json'
+        self.access = None
+        self.refresh = None
+
+    def run(self):
+        response = self.request('post', '/api/token/', 'POST /api/token/', json={
+            'username': self.username,
+            'password': self.command.password,
+        })
+        if response is None or response.status_code != 200:
+            return
+
+        self.access = response.json()['access']
+        self.refresh = response.json()['refresh']
+
+        names = list(SCENARIOS)
+        weights = [SCENARIOS[name] for name in names]
+        while time.monotonic() < self.deadline:
+            getattr(self, f"scenario_{self.random.choices(names, weights)[0]}")()
+
+    def request(self, method, path, label, auth=False, **kwargs):
+        headers = {'Authorization': f"Bearer {self.access}"} if auth else {}
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.command.base_url + path, headers=headers, timeout=self.command.timeout, **kwargs
+            )
+            response.content
+        except requests.RequestException:
+            self.command.record(label, time.perf_counter() - start, None)
+            return None
+
+        self.command.record(label, time.perf_counter() - start, response.status_code)
+        return response
+
+    def scenario_browse(self):
+        response = self.request('get', '/books/', 'GET /books/')
+        if response is not None and response.ok and response.json().get('next') and self.random.random() < 0.5:
+            next_url = response.json()['next'].split('/books/', 1)[1]
+            self.request('get', f"/books/{next_url}", 'GET /books/?cursor=')
+
+        if self.random.random() < 0.2:
+            genre = self.random.choice([value for value, _ in Book.GENRE_CHOICES])
+            self.request('get', f"/books/?facets=1&genre={genre}", 'GET /books/?facets=1&genre=')
+
+        book_id, _ = self.random.choice(self.command.books)
+        self.request('get', f"/books/{book_id}/", 'GET /books/{id}/')
+
+    def scenario_search(self):
+        word = self.random.choice(WORDS)
+        self.request('get', f"/books/suggest/?q={word[:self.random.randint(2, 4)]}", 'GET /books/suggest/')
+        self.request('get', f"/books/search/?q={word}", 'GET /books/search/')
+
+    def scenario_read(self):
+        book_id, chapters = self.random.choice(self.command.books)
+        self.request('get', f"/api/book/{book_id}/chapters/", 'GET /api/book/{id}/chapters/', auth=True)
+        if chapters:
+            number = self.random.randint(1, chapters)
+            self.request(
+                'get', f"/api/book/{book_id}/chapter/{number}/", 'GET /api/book/{id}/chapter/{n}/', auth=True
+            )
+
+    def scenario_refresh(self):
+        response = self.request('post', '/api/token/refresh/', 'POST /api/token/refresh/', json={
+            'refresh': self.refresh,
+        })
+        if response is not None and response.ok:
+            self.access = response.json()['access']
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a mixed browse/search/chapter-read/token-refresh workload against a running server "
+        "(runserver or gunicorn) and report RPS and latency percentiles per endpoint. "
+        "Seed data first with seed_catalog; book ids and users are read from this project's database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run")
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent virtual readers")
+        parser.add_argument('--password', default='loadtest-pass', help="Password of the seeded users")
+        parser.add_argument('--timeout', type=float, default=10)
+        parser.add_argument('--sample-books', type=int, default=2000, help="Books to spread requests over")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.password = options['password']
+        self.timeout = options['timeout']
+        self._samples = defaultdict(list)
+        self._statuses = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+        self.books = list(
+            Book.objects.order_by('?')
+            .annotate(chapter_count=Count('chapters'))
+            .values_list('id', 'chapter_count')[:options['sample_books']]
+        )
+        usernames = list(
+            User.objects.filter(username__regex=r'^(free|premium)_reader_[0-9]+$')
+            .order_by('?')
+            .values_list('username', flat=True)[:options['concurrency']]
+        )
+        if not self.books or not usernames:
+            raise CommandError("No seeded books or readers found; run `manage.py seed_catalog` first")
+
+        self.stdout.write(
+            f"Running {options['concurrency']} reader(s) against {self.base_url} for {options['duration']:.0f}s "
+            f"({len(self.books)} books sampled)"
+        )
+
+        deadline = time.monotonic() + options['duration']
+        workers = [
+            Worker(self, usernames[i % len(usernames)], deadline, options['seed'] + i)
+            for i in range(options['concurrency'])
+        ]
+
+        start = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - start
+
+        self.report(elapsed)
+
+    def record(self, label, seconds, status):
+        with self._lock:
+            self._samples[label].append(seconds * 1000)
+            self._statuses[label]['error' if status is None or status >= 500 else f"{status // 100}xx"] += 1
+
+    def report(self, elapsed):
+        header = f"{'endpoint':<36} {'reqs':>7} {'rps':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  4xx  err"
+        self.stdout.write('\n' + header)
+        self.stdout.write('-' * len(header))
+
+        total = 0
+        for label in sorted(self._samples):
+            samples = self._samples[label]
+            statuses = self._statuses[label]
+            total += len(samples)
+            self.stdout.write(
+                f"{label:<36} {len(samples):>7} {len(samples) / elapsed:>8.1f} "
+                f"{percentile(samples, 50):>8.1f} {percentile(samples, 90):>8.1f} "
+                f"{percentile(samples, 99):>8.1f} {max(samples):>8.1f}  "
+                f"{statuses['4xx']:>3}  {statuses['error']:>3}"
+            )
+
+        self.stdout.write('-' * len(header))
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} request(s) in {elapsed:.1f}s: {total / elapsed:.1f} req/s (latencies in ms)"
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from readers import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for books and chapter summaries"
+
+    def handle(self, *args, **options):
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} book(s)"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from readers.similar import similar_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the TF-IDF vectors and precomputed similar-book lists from scratch. Edits are "
+        "folded in incrementally; rebuild after large imports so new words get a vocabulary slot"
+    )
+
+    def handle(self, *args, **options):
+        count = similar_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} book(s) over {len(similar_index.terms)} term(s) into {similar_index.path}"
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from readers.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Book.popularity from the daily chapter view rows. Workers refresh it "
+        "after folding views in; run this from cron so scores keep decaying on quiet days"
+    )
+
+    def handle(self, *args, **options):
+        scored = refresh_popularity()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed popularity for {scored} book(s)"))
@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from readers.seeding import seed_catalog
+
+
+class Command(BaseCommand):
+    help = "Bulk-insert a synthetic catalog (books, chapters, users, profiles and stub images) for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000)
+        parser.add_argument('--chapters', type=int, default=20, help="Chapters per book")
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--premium-ratio', type=float, default=0.5, help="Share of users on the premium tier")
+        parser.add_argument('--password', default='loadtest-pass', help="Password for every seeded user")
+        parser.add_argument('--no-media', action='store_true', help="Skip writing stub cover images and book files")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if min(options['books'], options['chapters'], options['users']) < 0:
+            raise CommandError("--books, --chapters and --users must not be negative")
+        if not 0 <= options['premium_ratio'] <= 1:
+            raise CommandError("--premium-ratio must be between 0 and 1")
+
+        start = time.perf_counter()
+
+        def progress(books, chapters):
+            self.stdout.write(f"  {books} book(s), {chapters} chapter(s)")
+
+        created = seed_catalog(
+            options['books'],
+            options['chapters'],
+            options['users'],
+            premium_ratio=options['premium_ratio'],
+            media=not options['no_media'],
+            password=options['password'],
+            batch_size=options['batch_size'],
+            progress=progress
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {created['books']} book(s), {created['chapters']} chapter(s) and "
+            f"{created['users']} user(s) in {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,43 @@
+import sqlite3
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from core.db import replica_alias
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database into the READ_REPLICA_DATABASE file with SQLite's "
+        "online backup API, once or every --interval seconds, to exercise replica routing locally"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0, help="Keep syncing every N seconds")
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError("No replica configured; set READ_REPLICA_DATABASE to a second SQLite file")
+
+        primary = connections.databases[DEFAULT_DB_ALIAS]
+        replica = connections.databases[alias]
+        if 'sqlite3' not in primary['ENGINE'] or 'sqlite3' not in replica['ENGINE']:
+            raise CommandError("sync_replica only copies SQLite files; use the database's own replication otherwise")
+
+        while True:
+            start = time.perf_counter()
+            source = sqlite3.connect(str(primary['NAME']))
+            target = sqlite3.connect(str(replica['NAME']))
+            try:
+                source.backup(target, pages=1024)
+            finally:
+                target.close()
+                source.close()
+
+            self.stdout.write(self.style.SUCCESS(
+                f"Synced {primary['NAME']} -> {replica['NAME']} in {(time.perf_counter() - start) * 1000:.0f} ms"
+            ))
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:43
+
+import readers.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('readers', '0012_delete_chapterillustration'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='cover_image',
+            field=models.ImageField(blank=True, db_index=True, help_text='AI-generated book cover', null=True, storage=readers.storage.get_media_storage, upload_to='readers/covers/'),
+        ),
+        migrations.AlterField(
+            model_name='chapter',
+            name='illustration',
+            field=models.ImageField(blank=True, db_index=True, help_text='AI-generated chapter illustration', null=True, storage=readers.storage.get_media_storage, upload_to='readers/chapters/'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('readers', '0013_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_color',
+            field=models.CharField(blank=True, help_text='Dominant cover color (#rrggbb)', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='cover_lqip',
+            field=models.TextField(blank=True, help_text='Base64 low-quality placeholder for the cover'),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='illustration_color',
+            field=models.CharField(blank=True, help_text='Dominant illustration color (#rrggbb)', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='illustration_lqip',
+            field=models.TextField(blank=True, help_text='Base64 low-quality placeholder for the illustration'),
+        ),
+    ]
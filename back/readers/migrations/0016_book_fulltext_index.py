@@ -0,0 +1,81 @@
+# Generated by Django 5.2.7 on 2026-10-19 02:48
+
+from django.db import migrations
+
+# raw SQL tables that readers/search.py reads and writes; the schema lives here only
+FTS_TABLE = 'readers_book_fts'
+PG_TABLE = 'readers_book_search'
+
+SCHEMA = {
+    'sqlite': [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            title, author, description, chapters,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )""",
+    ],
+    'postgresql': [
+        f"""CREATE TABLE IF NOT EXISTS {PG_TABLE} (
+            book_id bigint PRIMARY KEY REFERENCES readers_book(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+            document tsvector NOT NULL
+        )""",
+        f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_idx ON {PG_TABLE} USING GIN (document)",
+    ],
+}
+DROP = {
+    'sqlite': [f"DROP TABLE IF EXISTS {FTS_TABLE}"],
+    'postgresql': [f"DROP TABLE IF EXISTS {PG_TABLE}"],
+}
+
+
+def create_index(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor not in SCHEMA:
+        return
+
+    with conn.cursor() as cursor:
+        for sql in SCHEMA[conn.vendor]:
+            cursor.execute(sql)
+
+    Book = apps.get_model('readers', 'Book')
+    Chapter = apps.get_model('readers', 'Chapter')
+
+    with conn.cursor() as cursor:
+        for book in Book.objects.only('id', 'title', 'author', 'description').iterator():
+            chapters = '\n'.join(
+                f"{title} {summary}"
+                for title, summary in Chapter.objects.filter(book_id=book.id).values_list('title', 'summary')
+            )
+            if conn.vendor == 'sqlite':
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, author, description, chapters) VALUES (%s, %s, %s, %s, %s)",
+                    [book.id, book.title, book.author, book.description, chapters],
+                )
+            else:
+                cursor.execute(
+                    f"""INSERT INTO {PG_TABLE} (book_id, document) VALUES (
+                            %s,
+                            setweight(to_tsvector('simple', coalesce(%s, '')), 'A') ||
+                            setweight(to_tsvector('simple', coalesce(%s, '')), 'A') ||
+                            setweight(to_tsvector('english', coalesce(%s, '')), 'B') ||
+                            setweight(to_tsvector('english', coalesce(%s, '')), 'C')
+                        )""",
+                    [book.id, book.title, book.author, book.description, chapters],
+                )
+
+
+def drop_index(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        for sql in DROP.get(conn.vendor, []):
+            cursor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('readers', '0015_book_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
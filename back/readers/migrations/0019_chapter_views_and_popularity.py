@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-19 03:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('readers', '0018_reading_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chapter_number', models.PositiveIntegerField()),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='popularity',
+            field=models.FloatField(default=0, help_text='Recent chapter views with older days decayed (readers.popularity)'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['-popularity', 'id'], name='book_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['genre', '-popularity', 'id'], name='book_genre_popularity_idx'),
+        ),
+        migrations.AddField(
+            model_name='chapterviewdaily',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='readers.book'),
+        ),
+        migrations.AddIndex(
+            model_name='chapterviewdaily',
+            index=models.Index(fields=['day', 'book'], name='chapter_views_day_book_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='chapterviewdaily',
+            unique_together={('book', 'chapter_number', 'day')},
+        ),
+    ]
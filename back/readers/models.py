@@ -1,5 +1,7 @@
 from django.db import models
+from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
+from .storage import get_media_storage
 
 # Create your models here.
 class Book(models.Model):
@@ -40,11 +42,17 @@ class Book(models.Model):
     
     cover_image = models.ImageField(
         upload_to='readers/covers/',
+        storage=get_media_storage,
         blank=True,
         null=True,
+        db_index=True,
         help_text="AI-generated book cover"
     )
     cover_prompt = models.TextField(blank=True)
+    cover_lqip = models.TextField(blank=True, help_text="Base64 low-quality placeholder for the cover")
+    cover_color = models.CharField(max_length=7, blank=True, help_text="Dominant cover color (#rrggbb)")
+    
+    popularity = models.FloatField(default=0, help_text="Recent chapter views with older days decayed (readers.popularity)")
     
     is_processed = models.BooleanField(default=False)
     images_generated = models.BooleanField(default=False)
@@ -57,7 +65,12 @@ class Book(models.Model):
         return self.title or f"Book {self.id}"
     
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='book_created_id_idx'),
+            models.Index(fields=['-popularity', 'id'], name='book_popularity_idx'),
+            models.Index(fields=['genre', '-popularity', 'id'], name='book_genre_popularity_idx'),
+        ]
     
 class Chapter(models.Model):
     book = models.ForeignKey(
@@ -71,13 +84,68 @@ class Chapter(models.Model):
     summary = models.TextField(blank=True)
     
     illustration = models.ImageField(
-        upload_to='readers/chapters/', blank=True, null=True, help_text="AI-generated chapter illustration"
+        upload_to='readers/chapters/', storage=get_media_storage, blank=True, null=True, db_index=True,
+        help_text="AI-generated chapter illustration"
     )
     illustration_prompt = models.TextField(blank=True)
+    illustration_lqip = models.TextField(blank=True, help_text="Base64 low-quality placeholder for the illustration")
+    illustration_color = models.CharField(max_length=7, blank=True, help_text="Dominant illustration color (#rrggbb)")
+    
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['chapter_number']
         unique_together = ['book', 'chapter_number']
     
     def __str__(self):
-        return f"Ch. {self.chapter_number}: {self.title}"
\ No newline at end of file
+        return f"Ch. {self.chapter_number}: {self.title}"
+
+class ReadingProgress(models.Model):
+    """Where a reader left off in a book. Written in batches by readers.progress."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='reading_progress'
+    )
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='reading_progress'
+    )
+    
+    chapter_number = models.PositiveIntegerField()
+    position = models.FloatField(default=0, help_text="Fraction of the chapter read (0-1)")
+    
+    # set from the time the update was received, not the time its batch was flushed
+    updated_at = models.DateTimeField()
+    
+    class Meta:
+        unique_together = ['user', 'book']
+        indexes = [
+            models.Index(fields=['user', '-updated_at'], name='progress_user_recent_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} @ {self.book_id} ch. {self.chapter_number}"
+
+
+
+class ChapterViewDaily(models.Model):
+    """Chapter views per day, folded in from the in-memory counters in readers.popularity."""
+    book = models.ForeignKey(
+        Book,
+        on_delete=models.CASCADE,
+        related_name='daily_views'
+    )
+    chapter_number = models.PositiveIntegerField()
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['book', 'chapter_number', 'day']
+        indexes = [
+            models.Index(fields=['day', 'book'], name='chapter_views_day_book_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.book_id} ch. {self.chapter_number} on {self.day}: {self.views}"
@@ -9,6 +9,9 @@ import requests
 from django.conf import settings
 import logging
 import time
+import asyncio
+from asgiref.sync import async_to_sync
+from .ai_client import AsyncAIClient
 
 class OllamaExtractor:
             
@@ -278,21 +281,8 @@ class OllamaExtractor:
                 'language': 'English'
             }
           
-    def extract_chapter_summaries(self, full_text: str, chapters: List[str]) -> Dict[int, str]:
-        if not chapters:
-            return {}
-
-        summaries = {}
-        chapters = chapters[:30]  # first 30 chapters lang
-
-        book_context = full_text[:10000] # first 10k chars lang
-
-        print(f"\nGenerating {len(chapters)} chapter summaries\n")
-
-        for idx, chapter_title in enumerate(chapters, 1): # progress bar 
-            print(f"Chapter {idx:2d}/{len(chapters)} → {chapter_title[:65]}")
-
-            prompt = f'''Continue the book in its own voice.
+    def _summary_prompt(self, book_context: str, chapter_title: str) -> str:
+        return f'''Continue the book in its own voice.
 
     Book so far:
     \"\"\"{book_context}\"\"\"
@@ -306,43 +296,67 @@ class OllamaExtractor:
 
     Start writing now:'''
 
-            try:
-                response = self._call_ollama(
-                    prompt=prompt,
-                    max_tokens=400,
-                    temperature=0.88
-                )
+    def _clean_summary(self, response: str, chapter_title: str) -> str:
+        text = response.strip().strip('"\'„“”')
 
-                text = response.strip().strip('"\'„“”')
+        lines = [line.strip() for line in text.split('\n') if line.strip()] # for cleaning
+        clean_lines = []
+        for line in lines:
+            if any(bad in line.lower() for bad in ["could you", "context", "summary", "here is", "chapter", "retell"]):
+                continue
+            if len(line) > 30 and line[0].isalpha():
+                clean_lines.append(line)
 
-                lines = [line.strip() for line in text.split('\n') if line.strip()] # for cleaning
-                clean_lines = []
-                for line in lines:
-                    if any(bad in line.lower() for bad in ["could you", "context", "summary", "here is", "chapter", "retell"]):
-                        continue
-                    if len(line) > 30 and line[0].isalpha():
-                        clean_lines.append(line)
+        final_text = ' '.join(clean_lines) or text.split('\n', 1)[0]
 
-                final_text = ' '.join(clean_lines) or text.split('\n', 1)[0]
+        word_count = len(final_text.split())
 
-                word_count = len(final_text.split())
+        if word_count >= 60:
+            print(f"   Success: {word_count} words")
+            return final_text
 
-                if word_count >= 60:
-                    summaries[idx] = final_text
-                    print(f"   Success: {word_count} words")
-                else:
-                    summaries[idx] = f"The events of {chapter_title.lower()} unfolded with quiet inevitability."
-                    print(f"Fallback used ({word_count}w)")
+        print(f"Fallback used ({word_count}w)")
+        return f"The events of {chapter_title.lower()} unfolded with quiet inevitability."
 
+    async def aextract_chapter_summaries(self, full_text: str, chapters: List[str]) -> Dict[int, str]:
+        """Chapter summaries requested concurrently; OLLAMA_CONCURRENCY caps how many Ollama sees at once."""
+        if not chapters:
+            return {}
+
+        chapters = chapters[:30]  # first 30 chapters lang
+
+        book_context = full_text[:10000] # first 10k chars lang
+
+        print(f"\nGenerating {len(chapters)} chapter summaries\n")
+
+        async def summarize(client, idx, chapter_title):
+            try:
+                response = await client.ollama_generate(
+                    self._summary_prompt(book_context, chapter_title),
+                    max_tokens=400,
+                    temperature=0.88,
+                    retries=3,
+                    num_ctx=2048
+                )
+                print(f"Chapter {idx:2d}/{len(chapters)} → {chapter_title[:65]}")
+                return self._clean_summary(response, chapter_title)
             except Exception as e:
                 print(f"   Error: {e}")
-                summaries[idx] = f"And then, in {chapter_title.lower()}, everything changed."
+                return f"And then, in {chapter_title.lower()}, everything changed."
 
-            time.sleep(0.8)  # gentle but fast enough
+        async with AsyncAIClient(ollama_url=self.base_url, ollama_model=self.model) as client:
+            results = await asyncio.gather(*[
+                summarize(client, idx, chapter_title) for idx, chapter_title in enumerate(chapters, 1)
+            ])
+
+        summaries = dict(enumerate(results, 1))
 
         print(f"\nAll {len(summaries)} summaries generated perfectly\n")
         return summaries
 
+    def extract_chapter_summaries(self, full_text: str, chapters: List[str]) -> Dict[int, str]:
+        return async_to_sync(self.aextract_chapter_summaries)(full_text, chapters)
+
     def process_book(self, file_path: str, extract_summaries: bool = True) -> Dict:
         print(f"Processing book")
         
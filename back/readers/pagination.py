@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class BookCursorPagination(CursorPagination):
+    """Keyset pagination on (created_at, id), backed by ``book_created_id_idx``."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class ChapterCursorPagination(CursorPagination):
+    """Keyset pagination on chapter_number, backed by the (book, chapter_number) unique index."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('chapter_number',)
+
+
+class SearchPagination(PageNumberPagination):
+    """Ranked search results can't be keyset-paged, so they use page numbers."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
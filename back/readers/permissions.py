@@ -1,5 +1,5 @@
 from rest_framework.permissions import BasePermission
-from purchasers.utils import can_access_chapter
+from purchasers.utils import can_access_chapter, can_access_book_file
 
 class CanAccessChapter(BasePermission):
     message = "You don't have permission to access this chapter."
@@ -8,4 +8,10 @@ class CanAccessChapter(BasePermission):
         return True
     
     def has_object_permission(self, request, view, obj):
-        return can_access_chapter(request.user, obj)
\ No newline at end of file
+        return can_access_chapter(request.user, obj)
+
+class CanDownloadBook(BasePermission):
+    message = "A premium subscription is required to download this book."
+
+    def has_object_permission(self, request, view, obj):
+        return can_access_book_file(request.user, obj)
\ No newline at end of file
@@ -0,0 +1,34 @@
+import base64
+import io
+from typing import Tuple
+from PIL import Image
+
+
+LQIP_SIZE = (16, 24)
+
+
+def compute_placeholder(image: Image.Image) -> Tuple[str, str]:
+    """Return a base64 LQIP data URI and the dominant ``#rrggbb`` color for ``image``."""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    tiny = image.copy()
+    tiny.thumbnail(LQIP_SIZE, Image.Resampling.BILINEAR)
+
+    buffer = io.BytesIO()
+    tiny.save(buffer, format='JPEG', quality=40, optimize=True)
+    lqip = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    sample = image.resize((64, 64), Image.Resampling.BILINEAR)
+    quantized = sample.quantize(colors=8, method=Image.Quantize.MEDIANCUT)
+    palette = quantized.getpalette()
+    _, index = max(quantized.getcolors())
+    r, g, b = palette[index * 3:index * 3 + 3]
+
+    return lqip, f"#{r:02x}{g:02x}{b:02x}"
+
+
+def compute_placeholder_from_file(file) -> Tuple[str, str]:
+    with Image.open(file) as image:
+        image.draft('RGB', (image.width // 8 or 1, image.height // 8 or 1))
+        return compute_placeholder(image)
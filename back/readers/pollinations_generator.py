@@ -1,11 +1,23 @@
 import requests
 import io
 from PIL import Image
-from typing import Dict, Optional, Tuple
+from typing import Dict, NamedTuple, Optional, Tuple
 from django.conf import settings
 from django.core.files.base import ContentFile
 import urllib.parse
+import hashlib
+import random
+import asyncio
 import time
+from .ai_client import AsyncAIClient
+from .image_cache import ImageCache
+from .placeholders import compute_placeholder
+
+
+class ProcessedImage(NamedTuple):
+    file: ContentFile
+    lqip: str
+    color: str
 
 
 class PollinationsGenerator:
@@ -16,6 +28,7 @@ class PollinationsGenerator:
         self.ollama_api = f"{self.ollama_url}/api/generate"
         
         self.pollinations_url = "https://image.pollinations.ai/prompt/"
+        self.image_cache = ImageCache()
         
         print("\nImage Generator initialized")
     
@@ -48,7 +61,33 @@ class PollinationsGenerator:
     def generate_cover_prompt(self, book_metadata: Dict) -> str:
         print(f"Creating cover prompt for '{book_metadata.get('title')}'")
         
-        ollama_prompt = f"""Create a visual description for an AI image generator to make a book cover.
+        try:
+            ai_prompt = self._clean_cover_prompt(
+                self._call_ollama(self._cover_request_prompt(book_metadata), max_tokens=200)
+            )
+            if ai_prompt:
+                return ai_prompt
+        except Exception as e:
+            print(f"Ollama failed: {e}")
+        
+        return self._fallback_cover_prompt(book_metadata)
+
+    async def agenerate_cover_prompt(self, client: AsyncAIClient, book_metadata: Dict) -> str:
+        print(f"Creating cover prompt for '{book_metadata.get('title')}'")
+        
+        try:
+            ai_prompt = self._clean_cover_prompt(
+                await client.ollama_generate(self._cover_request_prompt(book_metadata), max_tokens=200, temperature=0.8)
+            )
+            if ai_prompt:
+                return ai_prompt
+        except Exception as e:
+            print(f"Ollama failed: {e}")
+        
+        return self._fallback_cover_prompt(book_metadata)
+
+    def _cover_request_prompt(self, book_metadata: Dict) -> str:
+        return f"""Create a visual description for an AI image generator to make a book cover.
 
     Book: {book_metadata.get('title', 'Unknown')}
     Author: {book_metadata.get('author', 'Unknown')}
@@ -67,46 +106,43 @@ class PollinationsGenerator:
 
     Your visual description:"""
 
-        try:
-            ai_prompt = self._call_ollama(ollama_prompt, max_tokens=200)
-            
-            ai_prompt = ai_prompt.strip()
-            
-            if ai_prompt.startswith('['):
-                start = ai_prompt.find(']')
-                if start != -1:
-                    ai_prompt = ai_prompt[start+1:].strip()
-            
-            unwanted_phrases = [
-                "I hope this prompts meet your requirements",
-                "I hope this meets your requirements",
-                "Here is the prompt:",
-                "Here's the description:",
-                "The book title",
-                "is prominently displayed",
-                "Insert ",
-                "Create ",
-                "[",
-                "]"
-            ]
-            
-            for phrase in unwanted_phrases:
-                ai_prompt = ai_prompt.replace(phrase, "")
-            
-            ai_prompt = ai_prompt.replace('"', '').replace("'", "")
-            
-            ai_prompt = ' '.join(ai_prompt.split())
-            
-            if 20 < len(ai_prompt) < 1000:
-                final_prompt = f"{ai_prompt}"
-                print(f"AI prompt (cleaned): {final_prompt[:100]}")
-                return final_prompt
-            else:
-                print(f"AI prompt too short/long ({len(ai_prompt)} chars), using fallback")
-                
-        except Exception as e:
-            print(f"Ollama failed: {e}")
-        
+    def _clean_cover_prompt(self, ai_prompt: str) -> Optional[str]:
+        ai_prompt = ai_prompt.strip()
+        
+        if ai_prompt.startswith('['):
+            start = ai_prompt.find(']')
+            if start != -1:
+                ai_prompt = ai_prompt[start+1:].strip()
+        
+        unwanted_phrases = [
+            "I hope this prompts meet your requirements",
+            "I hope this meets your requirements",
+            "Here is the prompt:",
+            "Here's the description:",
+            "The book title",
+            "is prominently displayed",
+            "Insert ",
+            "Create ",
+            "[",
+            "]"
+        ]
+        
+        for phrase in unwanted_phrases:
+            ai_prompt = ai_prompt.replace(phrase, "")
+        
+        ai_prompt = ai_prompt.replace('"', '').replace("'", "")
+        
+        ai_prompt = ' '.join(ai_prompt.split())
+        
+        if 20 < len(ai_prompt) < 1000:
+            final_prompt = f"{ai_prompt}"
+            print(f"AI prompt (cleaned): {final_prompt[:100]}")
+            return final_prompt
+        
+        print(f"AI prompt too short/long ({len(ai_prompt)} chars), using fallback")
+        return None
+
+    def _fallback_cover_prompt(self, book_metadata: Dict) -> str:
         genre = book_metadata.get('genre', 'Fiction')
         title = book_metadata.get('title', 'Book')
         description = book_metadata.get('description', '')[:150]
@@ -235,14 +271,16 @@ class PollinationsGenerator:
         print(f"Using title-based prompt")
         return fallback_prompt
     
-    def generate_image_pollinations( self,  prompt: str,  width: int = 512,  height: int = 768, model: str = "flux", retries: int = 2) -> Optional[bytes]:
+    def derive_seed(self, prompt: str, book_key: str = '') -> int:
+        """Stable seed for a (book, prompt) pair so re-renders hit the image cache"""
+        digest = hashlib.sha256(f"{book_key}|{prompt}".encode('utf-8')).hexdigest()
+        return int(digest[:8], 16) % 2**31
 
-        encoded_prompt = urllib.parse.quote(prompt)
-        
-        image_url = (
-            f"{self.pollinations_url}{encoded_prompt}"
-            f"?width={width}&height={height}&model={model}&nologo=true&enhance=true"
-        )
+    def generate_image_pollinations( self,  prompt: str,  width: int = 512,  height: int = 768, model: str = "flux", retries: int = 2, seed: int = None, book_key: str = '', new_seed: bool = False) -> Optional[bytes]:
+
+        cache_key, image_url, cached = self._image_request(prompt, width, height, model, seed, book_key, new_seed)
+        if cached:
+            return cached
         
         print("\nGenerating image with Pollinations.ai")
         
@@ -255,6 +293,7 @@ class PollinationsGenerator:
                     
                     if 'image' in content_type:
                         print(f"Image generated successfully ({len(response.content)} bytes)")
+                        self.image_cache.set(cache_key, response.content)
                         return response.content
                     else:
                         print(f"Response was not an image: {content_type}")
@@ -278,7 +317,43 @@ class PollinationsGenerator:
         print("Failed to generate image after all retries")
         return None
     
-    def process_and_save_image(self, image_bytes: bytes, target_size: Tuple[int, int]) -> ContentFile:
+    async def agenerate_image_pollinations(self, client: AsyncAIClient, prompt: str, width: int = 512, height: int = 768, model: str = "flux", retries: int = 2, seed: int = None, book_key: str = '', new_seed: bool = False) -> Optional[bytes]:
+        cache_key, image_url, cached = self._image_request(prompt, width, height, model, seed, book_key, new_seed)
+        if cached:
+            return cached
+        
+        print("\nGenerating image with Pollinations.ai")
+        
+        image_bytes = await client.fetch_image(image_url, timeout=30, retries=retries)
+        if image_bytes:
+            self.image_cache.set(cache_key, image_bytes)
+        return image_bytes
+    
+    def _image_request(self, prompt, width, height, model, seed, book_key, new_seed):
+        """``(cache key, Pollinations URL, cached bytes or None)`` for one image."""
+        if new_seed:
+            seed = random.randrange(2**31)
+        elif seed is None:
+            seed = self.derive_seed(prompt, book_key)
+        
+        cache_key = self.image_cache.make_key(prompt, model, width, height, seed)
+        cached = self.image_cache.get(cache_key)
+        if cached:
+            print(f"Image cache hit ({len(cached)} bytes, seed {seed})")
+        
+        encoded_prompt = urllib.parse.quote(prompt)
+        
+        image_url = (
+            f"{self.pollinations_url}{encoded_prompt}"
+            f"?width={width}&height={height}&model={model}&seed={seed}&nologo=true&enhance=true"
+        )
+        
+        return cache_key, image_url, cached
+    
+    def _book_key(self, book_metadata: Dict) -> str:
+        return f"{book_metadata.get('title', '')}|{book_metadata.get('author', '')}"
+    
+    def process_and_save_image(self, image_bytes: bytes, target_size: Tuple[int, int]) -> ProcessedImage:
         print(f"\nProcessing image to size {target_size}\n")
         
         try:
@@ -310,15 +385,18 @@ class PollinationsGenerator:
             file_size = len(buffer.getvalue())
             print(f"Image processed: {file_size} bytes")
             
-            return ContentFile(buffer.read())
+            lqip, color = compute_placeholder(image)
+            
+            return ProcessedImage(ContentFile(buffer.read()), lqip, color)
             
         except Exception as e:
             raise Exception(f"Error processing image: {str(e)}")
     
-    def generate_book_cover(self, book_metadata: Dict) -> Tuple[Optional[ContentFile], str]:
+    def generate_book_cover(self, book_metadata: Dict, new_seed: bool = False) -> Tuple[Optional[ProcessedImage], str]:
         print("\nGENERATING BOOK COVER\n")
         
-        prompt = self.generate_cover_prompt(book_metadata)
+        # Reuse a previously rendered prompt so regeneration maps to the same cache entry
+        prompt = book_metadata.get('cover_prompt') or self.generate_cover_prompt(book_metadata)
         
         if not prompt:
             return None, "Failed to generate prompt"
@@ -327,7 +405,9 @@ class PollinationsGenerator:
             prompt,
             width=512,
             height=768,
-            model="flux"
+            model="flux",
+            book_key=self._book_key(book_metadata),
+            new_seed=new_seed
         )
         
         if not image_bytes:
@@ -345,7 +425,7 @@ class PollinationsGenerator:
             print(f"Error processing cover: {e}")
             return None, prompt
     
-    def generate_chapter_illustration(self, chapter_data: Dict, book_context: Dict) -> Tuple[Optional[ContentFile], str]:
+    def generate_chapter_illustration(self, chapter_data: Dict, book_context: Dict, new_seed: bool = False) -> Tuple[Optional[ProcessedImage], str]:
         
         chapter_num = chapter_data.get('chapter_number', '?')
 
@@ -360,7 +440,9 @@ class PollinationsGenerator:
             prompt,
             width=512,
             height=768,
-            model="turbo"
+            model="turbo",
+            book_key=self._book_key(book_context),
+            new_seed=new_seed
         )
         
         if not image_bytes:
@@ -378,6 +460,79 @@ class PollinationsGenerator:
             print(f"Error processing chapter image: {e}")
             return None, prompt
 
+    async def agenerate_book_cover(self, client: AsyncAIClient, book_metadata: Dict, new_seed: bool = False) -> Tuple[Optional[ProcessedImage], str]:
+        prompt = book_metadata.get('cover_prompt') or await self.agenerate_cover_prompt(client, book_metadata)
+        
+        if not prompt:
+            return None, "Failed to generate prompt"
+        
+        image_bytes = await self.agenerate_image_pollinations(
+            client,
+            prompt,
+            width=512,
+            height=768,
+            model="flux",
+            book_key=self._book_key(book_metadata),
+            new_seed=new_seed
+        )
+        
+        if not image_bytes:
+            return None, prompt
+        
+        try:
+            cover_size = getattr(settings, 'BOOK_COVER_SIZE', (800, 1200))
+            # resizing and placeholder extraction are CPU work; keep them off the event loop
+            return await asyncio.to_thread(self.process_and_save_image, image_bytes, cover_size), prompt
+        except Exception as e:
+            print(f"Error processing cover: {e}")
+            return None, prompt
+    
+    async def agenerate_chapter_illustration(self, client: AsyncAIClient, chapter_data: Dict, book_context: Dict, new_seed: bool = False) -> Tuple[Optional[ProcessedImage], str]:
+        prompt = self.generate_chapter_prompt(chapter_data, book_context)
+        
+        image_bytes = await self.agenerate_image_pollinations(
+            client,
+            prompt,
+            width=512,
+            height=768,
+            model="turbo",
+            book_key=self._book_key(book_context),
+            new_seed=new_seed
+        )
+        
+        if not image_bytes:
+            return None, prompt
+        
+        try:
+            chapter_size = getattr(settings, 'CHAPTER_IMAGE_SIZE', (800, 1200))
+            return await asyncio.to_thread(self.process_and_save_image, image_bytes, chapter_size), prompt
+        except Exception as e:
+            print(f"Error processing chapter image: {e}")
+            return None, prompt
+    
+    async def agenerate_images(self, book_metadata: Dict, chapters: list, new_seed: bool = False) -> Tuple[Tuple[Optional[ProcessedImage], str], list]:
+        """Cover and chapter illustrations generated concurrently.
+
+        ``chapters`` holds dicts with chapter_number, title and summary; returns
+        ``((cover, cover_prompt), [(illustration, prompt), ...])`` in chapter order.
+        """
+        book_context = {
+            'title': book_metadata.get('title'),
+            'author': book_metadata.get('author'),
+            'genre': book_metadata.get('genre')
+        }
+        
+        async with AsyncAIClient(ollama_url=self.ollama_url, ollama_model=self.ollama_model) as client:
+            cover, *illustrations = await asyncio.gather(
+                self.agenerate_book_cover(client, book_metadata, new_seed=new_seed),
+                *[
+                    self.agenerate_chapter_illustration(client, chapter, book_context, new_seed=new_seed)
+                    for chapter in chapters
+                ]
+            )
+        
+        return cover, illustrations
+
     def generate_all_images(self, book_metadata: Dict, chapters: list,max_chapters: int = 20) -> Dict:
         print("\nBATCH IMAGE GENERATION\n")
         
@@ -399,6 +554,7 @@ class PollinationsGenerator:
                 chapter,
                 {
                     'title': book_metadata.get('title'),
+                    'author': book_metadata.get('author'),
                     'genre': book_metadata.get('genre')
                 }
             )
@@ -0,0 +1,171 @@
+import itertools
+import threading
+from collections import Counter, defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+from core.db import PeriodicFlusher, serialized_write
+from .models import Book, ChapterViewDaily
+from .response_cache import bump
+from .suggest import suggest_index
+
+# window name -> days of daily aggregates it covers; 'trending' ranks by Book.popularity
+POPULARITY_WINDOWS = {'day': 1, 'week': 7, 'month': 30}
+TRENDING = 'trending'
+REFRESH_KEY = 'readers:popularity:refresh'
+
+
+class ViewCounter(PeriodicFlusher):
+    """In-memory chapter view counts, folded into ``ChapterViewDaily`` rows in batches.
+
+    Counting a view is a dict increment under one of ``shards`` locks, picked
+    per thread, so concurrent readers don't queue on a single lock and never
+    touch the database. Every ``interval`` seconds the shards are drained
+    and added to today's rows in one transaction.
+    """
+    flush_label = 'chapter view count(s)'
+
+    def __init__(self, shards=16, interval=30):
+        self.interval = interval
+        self._shards = [(threading.Lock(), Counter()) for _ in range(shards)]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+
+    def incr(self, book_id, chapter_number, views=1):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = next(self._next_shard) % len(self._shards)
+
+        lock, counts = self._shards[shard]
+        with lock:
+            counts[(book_id, chapter_number)] += views
+        self.start_flusher()
+
+    def drain(self):
+        total = Counter()
+        for lock, counts in self._shards:
+            with lock:
+                total.update(counts)
+                counts.clear()
+        return total
+
+    def flush(self):
+        counts = self.drain()
+        if not counts:
+            return 0
+
+        try:
+            written = fold_views(counts, timezone.now().date())
+        except Exception:
+            for (book_id, chapter_number), views in counts.items():
+                self.incr(book_id, chapter_number, views)
+            raise
+
+        refresh_popularity_if_due()
+        return written
+
+
+def fold_views(counts, day):
+    """Add ``{(book_id, chapter_number): views}`` to the rows for ``day``; returns rows touched."""
+    book_ids = {book_id for book_id, _ in counts}
+
+    with serialized_write():
+        live_books = set(Book.objects.filter(pk__in=book_ids).values_list('pk', flat=True))
+        existing = {
+            (row.book_id, row.chapter_number): row
+            for row in ChapterViewDaily.objects.select_for_update().filter(day=day, book_id__in=book_ids)
+        }
+
+        updated = []
+        created = []
+        for (book_id, chapter_number), views in counts.items():
+            if book_id not in live_books:
+                continue
+            row = existing.get((book_id, chapter_number))
+            if row is not None:
+                row.views += views
+                updated.append(row)
+            else:
+                created.append(ChapterViewDaily(book_id=book_id, chapter_number=chapter_number, day=day, views=views))
+
+        ChapterViewDaily.objects.bulk_update(updated, ['views'], batch_size=500)
+        ChapterViewDaily.objects.bulk_create(created, batch_size=500)
+
+    return len(updated) + len(created)
+
+
+def refresh_popularity_if_due():
+    """Refresh at most once per ``POPULARITY_REFRESH_INTERVAL`` (per cache, so once across
+    workers when the cache is shared)."""
+    if cache.add(REFRESH_KEY, 1, getattr(settings, 'POPULARITY_REFRESH_INTERVAL', 300)):
+        refresh_popularity()
+
+
+def refresh_popularity(today=None):
+    """Recompute ``Book.popularity`` from the daily rows and invalidate cached rankings.
+
+    A book's score is its views over the last ``POPULARITY_WINDOW_DAYS``, each
+    day weighted down by half every ``POPULARITY_HALF_LIFE_DAYS``.
+    """
+    today = today or timezone.now().date()
+    window_days = getattr(settings, 'POPULARITY_WINDOW_DAYS', 30)
+    half_life = getattr(settings, 'POPULARITY_HALF_LIFE_DAYS', 7)
+
+    scores = defaultdict(float)
+    daily = (
+        ChapterViewDaily.objects.filter(day__gt=today - timedelta(days=window_days))
+        .values_list('book_id', 'day')
+        .annotate(total=Sum('views'))
+        .order_by()
+    )
+    for book_id, day, views in daily:
+        scores[book_id] += views * 0.5 ** ((today - day).days / half_life)
+
+    with serialized_write():
+        # update() and bulk_update() skip signals and auto_now, so cached book payloads stay valid
+        previous = set(Book.objects.filter(popularity__gt=0).values_list('pk', flat=True))
+        Book.objects.filter(pk__in=previous - set(scores)).update(popularity=0)
+        Book.objects.bulk_update(
+            [Book(pk=book_id, popularity=round(score, 4)) for book_id, score in scores.items()],
+            ['popularity'],
+            batch_size=500
+        )
+
+    bump('popularity')
+    for book_id in previous - set(scores):
+        suggest_index.set_score(book_id, 0)
+    for book_id, score in scores.items():
+        suggest_index.set_score(book_id, score)
+
+    return len(scores)
+
+
+def ranked_books(window, genre=None, limit=20):
+    """``[(book_id, score), ...]`` for a window, best first.
+
+    ``trending`` reads the precomputed ``Book.popularity``; the fixed windows
+    sum the daily rows.
+    """
+    if window == TRENDING:
+        books = Book.objects.filter(popularity__gt=0)
+        if genre:
+            books = books.filter(genre=genre)
+        return list(books.order_by('-popularity', 'id').values_list('id', 'popularity')[:limit])
+
+    since = timezone.now().date() - timedelta(days=POPULARITY_WINDOWS[window] - 1)
+    views = ChapterViewDaily.objects.filter(day__gte=since)
+    if genre:
+        views = views.filter(book__genre=genre)
+    return list(
+        views.values_list('book_id')
+        .annotate(total=Sum('views'))
+        .order_by('-total', 'book_id')[:limit]
+    )
+
+
+view_counter = ViewCounter(
+    shards=getattr(settings, 'VIEW_COUNTER_SHARDS', 16),
+    interval=getattr(settings, 'VIEW_COUNTS_FLUSH_INTERVAL', 30),
+)
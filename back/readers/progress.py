@@ -0,0 +1,132 @@
+import threading
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Count
+from django.utils import timezone
+from core.db import PeriodicFlusher, serialized_write
+from .models import Book, ReadingProgress
+from .response_cache import cache_key, generations, get_or_compute
+
+
+class ProgressBuffer(PeriodicFlusher):
+    """Write-behind buffer for reading progress.
+
+    Readers report their position every few seconds; only the latest update
+    per (user, book) is kept in memory and written in one batched upsert every
+    ``interval`` seconds by a background thread, or as soon as ``max_pending``
+    books are waiting. ``interval=0`` disables the thread and leaves flushing
+    to the caller.
+
+    Each worker process has its own buffer. A flush skips rows that already
+    hold a newer update, so workers flushing out of order can't move a reader back.
+    """
+
+    flush_label = 'reading progress update(s)'
+
+    def __init__(self, interval=5, max_pending=1000):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, user_id, book_id, chapter_number, position):
+        updated_at = timezone.now()
+        with self._lock:
+            books = self._pending.setdefault(user_id, {})
+            if book_id not in books:
+                self._count += 1
+            books[book_id] = (chapter_number, position, updated_at)
+            full = self._count >= self.max_pending
+
+        self.start_flusher()
+        if full:
+            self.flush()
+        return updated_at
+
+    def pending_for(self, user_id):
+        """``{book_id: (chapter_number, position, updated_at)}`` not yet written for this user."""
+        with self._lock:
+            return dict(self._pending.get(user_id, {}))
+
+    def flush(self):
+        """Upsert everything buffered; returns the number of rows written."""
+        with self._lock:
+            pending, self._pending, self._count = self._pending, {}, 0
+        if not pending:
+            return 0
+
+        try:
+            return self._write(pending)
+        except Exception:
+            # keep the updates for the next flush unless newer ones arrived meanwhile
+            with self._lock:
+                for user_id, books in pending.items():
+                    current = self._pending.setdefault(user_id, {})
+                    for book_id, entry in books.items():
+                        if book_id not in current:
+                            current[book_id] = entry
+                            self._count += 1
+            raise
+
+    def _write(self, pending):
+        user_ids = set(pending)
+        book_ids = {book_id for books in pending.values() for book_id in books}
+
+        with serialized_write():
+            live_users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+            live_books = set(Book.objects.filter(pk__in=book_ids).values_list('pk', flat=True))
+            stored = {
+                (user_id, book_id): updated_at
+                for user_id, book_id, updated_at in ReadingProgress.objects.filter(
+                    user_id__in=user_ids, book_id__in=book_ids
+                ).values_list('user_id', 'book_id', 'updated_at')
+            }
+
+            oldest = datetime.min.replace(tzinfo=dt_timezone.utc)
+            rows = [
+                ReadingProgress(
+                    user_id=user_id,
+                    book_id=book_id,
+                    chapter_number=chapter_number,
+                    position=position,
+                    updated_at=updated_at
+                )
+                for user_id, books in pending.items() if user_id in live_users
+                for book_id, (chapter_number, position, updated_at) in books.items()
+                if book_id in live_books and updated_at > stored.get((user_id, book_id), oldest)
+            ]
+
+            ReadingProgress.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['user', 'book'],
+                update_fields=['chapter_number', 'position', 'updated_at'],
+                batch_size=500
+            )
+
+        return len(rows)
+
+
+progress_buffer = ProgressBuffer(
+    interval=getattr(settings, 'READING_PROGRESS_FLUSH_INTERVAL', 5),
+    max_pending=getattr(settings, 'READING_PROGRESS_MAX_PENDING', 1000),
+)
+
+
+def chapter_count(book_id):
+    """Number of chapters in a book, or None when it doesn't exist.
+
+    Cached until the book or its chapters change, so progress pings don't query.
+    """
+    gens = generations(f"book:{book_id}", f"book:{book_id}:chapters")
+    entry = get_or_compute(
+        cache_key('chapter_count', gens, book_id),
+        lambda: {
+            'count': Book.objects.filter(pk=book_id).annotate(chapter_count=Count('chapters'))
+            .values_list('chapter_count', flat=True).first()
+        },
+        gens=gens
+    )
+    return entry['count']
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import time
+from contextlib import nullcontext
+from django.conf import settings
+from django.core.cache import cache
+from core.db import recently_written, use_primary
+
+KEY_PREFIX = 'readers:resp'
+LOCK_POLL_INTERVAL = 0.02
+
+
+def _timeout():
+    return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+
+
+def _lock_timeout():
+    return getattr(settings, 'RESPONSE_CACHE_LOCK_TIMEOUT', 10)
+
+
+def _lock_wait():
+    return getattr(settings, 'RESPONSE_CACHE_LOCK_WAIT', 0.5)
+
+
+def _gen_key(name):
+    return f"{KEY_PREFIX}:gen:{name}"
+
+
+def generations(*names):
+    """Current generation token for each name, in one cache round trip.
+
+    Generations are nanosecond timestamps rather than counters, so a generation
+    evicted from the cache is re-seeded with a value no old entry can carry.
+    """
+    keys = [_gen_key(name) for name in names]
+    found = cache.get_many(keys)
+
+    result = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            cache.add(key, time.time_ns(), None)
+            value = cache.get(key)
+        result.append(value)
+    return tuple(result)
+
+
+def bump(*names):
+    """Invalidate every cached payload that was keyed on these generations."""
+    now = time.time_ns()
+    cache.set_many({_gen_key(name): now for name in names}, None)
+
+
+def cache_key(kind, gens, *parts):
+    digest = hashlib.sha1('|'.join(str(part) for part in (*gens, *parts)).encode('utf-8')).hexdigest()
+    return f"{KEY_PREFIX}:{kind}:{digest}"
+
+
+def fresh_reads(gens):
+    """Context for reads whose result is cached under ``gens``.
+
+    While the newest of ``gens`` is younger than the replica pin window it
+    sends them to the primary, so a lagging replica can't get its stale rows
+    cached under the new generation.
+    """
+    return use_primary() if gens and recently_written(max(gens)) else nullcontext()
+
+
+def get_or_compute(key, compute, timeout=None, gens=()):
+    """Return the cached value for ``key`` or compute it, letting only one caller
+    compute a cold key at a time (``cache.add`` is the cross-process lock).
+
+    Other callers wait up to ``RESPONSE_CACHE_LOCK_WAIT`` seconds for that
+    result, then compute it themselves rather than queue behind a slow one.
+    The value is computed under :func:`fresh_reads`.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    fresh_compute = compute
+
+    def compute():
+        with fresh_reads(gens):
+            return fresh_compute()
+
+    lock_key = f"{key}:lock"
+    lock_timeout = _lock_timeout()
+    deadline = time.monotonic() + _lock_wait()
+
+    while True:
+        if cache.add(lock_key, 1, lock_timeout):
+            try:
+                value = compute()
+                cache.set(key, value, _timeout() if timeout is None else timeout)
+                return value
+            finally:
+                cache.delete(lock_key)
+
+        # someone else is computing this key; wait for their result
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        if time.monotonic() > deadline:
+            return compute()
+
+
+async def agenerations(*names):
+    """:func:`generations` for async views."""
+    keys = [_gen_key(name) for name in names]
+    found = await cache.aget_many(keys)
+
+    result = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            await cache.aadd(key, time.time_ns(), None)
+            value = await cache.aget(key)
+        result.append(value)
+    return tuple(result)
+
+
+async def aget_or_compute(key, compute, timeout=None, gens=()):
+    """:func:`get_or_compute` for async views; ``compute`` is a coroutine function."""
+    value = await cache.aget(key)
+    if value is not None:
+        return value
+
+    fresh_compute = compute
+
+    async def compute():
+        with fresh_reads(gens):
+            return await fresh_compute()
+
+    lock_key = f"{key}:lock"
+    lock_timeout = _lock_timeout()
+    deadline = time.monotonic() + _lock_wait()
+
+    while True:
+        if await cache.aadd(lock_key, 1, lock_timeout):
+            try:
+                value = await compute()
+                await cache.aset(key, value, _timeout() if timeout is None else timeout)
+                return value
+            finally:
+                await cache.adelete(lock_key)
+
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        value = await cache.aget(key)
+        if value is not None:
+            return value
+
+        if time.monotonic() > deadline:
+            return await compute()
@@ -0,0 +1,215 @@
+import functools
+import re
+import threading
+from django.db import connection, transaction
+from django.utils.html import escape
+from .models import Book, Chapter
+
+FTS_TABLE = 'readers_book_fts'
+PG_TABLE = 'readers_book_search'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# the index returns raw text, so matches are marked with control characters and
+# only turned into <mark> tags once the text around them has been escaped
+MARK_START, MARK_STOP = '\x02', '\x03'
+
+
+def is_supported(conn=None):
+    return (conn or connection).vendor in ('sqlite', 'postgresql')
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix."""
+    tokens = TOKEN_RE.findall(text or '')
+    if not tokens:
+        return ''
+
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _chapter_text(book_id):
+    summaries = Chapter.objects.filter(book_id=book_id).values_list('title', 'summary')
+    return '\n'.join(f"{title} {summary}" for title, summary in summaries)
+
+
+def index_book(book_id):
+    """(Re)index one book together with its chapter titles and summaries."""
+    if not is_supported():
+        return
+
+    row = Book.objects.filter(pk=book_id).values('title', 'author', 'description').first()
+    if row is None:
+        remove_book(book_id)
+        return
+
+    chapters = _chapter_text(book_id)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [book_id])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, author, description, chapters) VALUES (%s, %s, %s, %s, %s)",
+                [book_id, row['title'], row['author'], row['description'], chapters],
+            )
+        else:
+            cursor.execute(
+                f"""INSERT INTO {PG_TABLE} (book_id, document) VALUES (
+                        %s,
+                        setweight(to_tsvector('simple', coalesce(%s, '')), 'A') ||
+                        setweight(to_tsvector('simple', coalesce(%s, '')), 'A') ||
+                        setweight(to_tsvector('english', coalesce(%s, '')), 'B') ||
+                        setweight(to_tsvector('english', coalesce(%s, '')), 'C')
+                    )
+                    ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document""",
+                [book_id, row['title'], row['author'], row['description'], chapters],
+            )
+
+
+_pending = threading.local()
+
+
+def _pending_book_ids():
+    if not hasattr(_pending, 'book_ids'):
+        _pending.book_ids = set()
+    return _pending.book_ids
+
+
+def _reindex_pending(book_id):
+    # the first hook of a committed transaction reindexes the book, the rest find it done
+    pending = _pending_book_ids()
+    if book_id in pending:
+        pending.discard(book_id)
+        index_book(book_id)
+
+
+def index_book_on_commit(book_id):
+    """Reindex a book after the current transaction commits.
+
+    Saving N chapters of a book in one transaction reindexes it once, not N times.
+    Every save registers its own hook, so one dropped by a rolled back savepoint
+    never takes the reindex of a committed save with it.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        index_book(book_id)
+        return
+
+    _pending_book_ids().add(book_id)
+    transaction.on_commit(functools.partial(_reindex_pending, book_id))
+
+
+def highlight(raw):
+    """HTML for a snippet: the indexed text escaped, matches wrapped in ``<mark>``."""
+    return escape(raw or '').replace(MARK_START, '<mark>').replace(MARK_STOP, '</mark>')
+
+
+def remove_book(book_id):
+    if not is_supported():
+        return
+
+    table, column = (FTS_TABLE, 'rowid') if connection.vendor == 'sqlite' else (PG_TABLE, 'book_id')
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} = %s", [book_id])
+
+
+def rebuild_index():
+    if not is_supported():
+        return 0
+
+    table = FTS_TABLE if connection.vendor == 'sqlite' else PG_TABLE
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+
+    count = 0
+    for book_id in Book.objects.values_list('id', flat=True).iterator():
+        index_book(book_id)
+        count += 1
+    return count
+
+
+class SearchResults:
+    """Lazy, sliceable ranked result set so DRF paginators can page through it.
+
+    Each slice runs one ranked query against the index plus one ``Book``
+    fetch; the Book objects get ``search_rank`` and ``search_highlight``.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.match = fts_query(text) if connection.vendor == 'sqlite' else ' '.join(TOKEN_RE.findall(text or ''))
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            if not self.match or not is_supported():
+                self._count = 0
+            elif connection.vendor == 'sqlite':
+                self._count = self._scalar(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [self.match])
+            else:
+                self._count = self._scalar(
+                    f"SELECT count(*) FROM {PG_TABLE} WHERE document @@ websearch_to_tsquery('english', %s)",
+                    [self.match],
+                )
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+
+        offset = index.start or 0
+        limit = (index.stop if index.stop is not None else self.count()) - offset
+        if limit <= 0 or not self.match or not is_supported():
+            return []
+
+        hits = self._hits(limit, offset)
+        books = Book.objects.in_bulk([book_id for book_id, _, _ in hits])
+
+        results = []
+        for book_id, rank, snippet in hits:
+            book = books.get(book_id)
+            if book is None:
+                continue
+            book.search_rank = rank
+            book.search_highlight = highlight(snippet)
+            results.append(book)
+        return results
+
+    def _hits(self, limit, offset):
+        if connection.vendor == 'sqlite':
+            # bm25 weights: title, author, description, chapter text
+            sql = f"""
+                SELECT rowid, bm25({FTS_TABLE}, 10.0, 6.0, 2.0, 1.0) AS rank,
+                       snippet({FTS_TABLE}, -1, %s, %s, '…', 16)
+                FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH %s
+                ORDER BY rank
+                LIMIT %s OFFSET %s
+            """
+            params = [MARK_START, MARK_STOP, self.match, limit, offset]
+        else:
+            sql = f"""
+                SELECT s.book_id, ts_rank(s.document, q) AS rank,
+                       ts_headline('english', coalesce(b.description, ''), q, %s)
+                FROM {PG_TABLE} s
+                JOIN readers_book b ON b.id = s.book_id,
+                     websearch_to_tsquery('english', %s) q
+                WHERE s.document @@ q
+                ORDER BY rank DESC
+                LIMIT %s OFFSET %s
+            """
+            params = [f"StartSel={MARK_START}, StopSel={MARK_STOP}, MaxWords=24, MinWords=8", self.match, limit, offset]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    @staticmethod
+    def _scalar(sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
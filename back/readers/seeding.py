@@ -0,0 +1,140 @@
+import io
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+from core.db import serialized_write
+from purchasers.models import SubscriptionType, UserProfile
+from . import search
+from .facets import invalidate_facets
+from .models import Book, Chapter
+from .placeholders import compute_placeholder
+from .response_cache import bump
+from .storage import media_storage
+from .suggest import suggest_index
+
+WORDS = (
+    'river shadow garden winter glass empire letters ocean silent crown orchard '
+    'harbor lantern machine northern daughter memory storm paper violet'
+).split()
+
+STUB_BOOK_FILE = 'readers/files/seed_stub.pdf'
+STUB_COLORS = ['#34251e', '#589071', '#2b4c7e', '#a23e48', '#d9a441', '#5d4e6d', '#1f6f78', '#8c5e3c']
+
+
+def phrase(i, length):
+    return ' '.join(WORDS[(i * 7 + n * 3) % len(WORDS)] for n in range(length))
+
+
+def stub_images(size=(160, 240)):
+    """Save one small gradient JPEG per stub color through the content-addressed
+    storage and return ``(name, lqip, color)`` for each."""
+    images = []
+    for color in STUB_COLORS:
+        rgb = tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+        image = Image.new('RGB', size, rgb)
+        image.paste(tuple(min(255, c + 40) for c in rgb), (0, size[1] * 2 // 3, size[0], size[1]))
+
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=80)
+        name = media_storage.save('stub.jpg', ContentFile(buffer.getvalue()))
+        lqip, dominant = compute_placeholder(image)
+        images.append((name, lqip, dominant))
+    return images
+
+
+def stub_book_file():
+    if not default_storage.exists(STUB_BOOK_FILE):
+        default_storage.save(STUB_BOOK_FILE, ContentFile(b'%PDF-1.4\n% seed_catalog stub\n' + b'0' * 4096))
+    return STUB_BOOK_FILE
+
+
+def seed_catalog(books, chapters_per_book, users, premium_ratio=0.5, media=True, password='loadtest-pass',
+                 batch_size=500, progress=None):
+    """Bulk-insert a synthetic catalog of books, chapters, users and profiles.
+
+    Rows go in through ``bulk_create``, so no per-row signals fire. The search
+    index, facet counts, response cache and suggest index are refreshed once at the end.
+    With ``media=False`` no stub files are written and books point at a file that may not exist.
+    """
+    free, _ = SubscriptionType.objects.get_or_create(name=SubscriptionType.FREE)
+    premium, _ = SubscriptionType.objects.get_or_create(
+        name=SubscriptionType.PREMIUM,
+        defaults={'duration_days': 30, 'price': 9.99}
+    )
+
+    images = stub_images() if media else []
+    book_file = stub_book_file() if media else STUB_BOOK_FILE
+    genres = [value for value, _ in Book.GENRE_CHOICES]
+    offset = Book.objects.count()
+
+    created_books = 0
+    created_chapters = 0
+    for start in range(0, books, batch_size):
+        batch = []
+        for i in range(offset + start, offset + min(start + batch_size, books)):
+            cover = images[i % len(images)] if images else ('', '', '')
+            batch.append(Book(
+                title=f"The {phrase(i, 3).title()} {i}",
+                author=f"{WORDS[i % len(WORDS)].title()} {WORDS[(i // 7) % len(WORDS)].title()}son",
+                genre=genres[i % len(genres)],
+                description=phrase(i, 40),
+                language='English' if i % 5 else 'French',
+                accessibility='free' if i % 4 == 0 else 'premium',
+                file=book_file,
+                cover_image=cover[0] or None,
+                cover_lqip=cover[1],
+                cover_color=cover[2],
+                is_processed=True,
+                images_generated=bool(images)
+            ))
+
+        # one transaction (and one commit) per batch of books and their chapters
+        with serialized_write():
+            batch = Book.objects.bulk_create(batch)
+
+            chapters = []
+            for book in batch:
+                for number in range(1, chapters_per_book + 1):
+                    illustration = images[(book.pk + number) % len(images)] if images and number <= 3 else ('', '', '')
+                    chapters.append(Chapter(
+                        book=book,
+                        chapter_number=number,
+                        title=f"Chapter {number}: {phrase(book.pk + number, 2)}",
+                        summary=phrase(book.pk * number, 30),
+                        illustration=illustration[0] or None,
+                        illustration_lqip=illustration[1],
+                        illustration_color=illustration[2]
+                    ))
+            Chapter.objects.bulk_create(chapters, batch_size=1000)
+
+        created_books += len(batch)
+        created_chapters += len(chapters)
+        if progress:
+            progress(created_books, created_chapters)
+
+    hashed = make_password(password)
+    premium_count = int(round(users * premium_ratio))
+    new_users = []
+    for tier, count in ((SubscriptionType.PREMIUM, premium_count), (SubscriptionType.FREE, users - premium_count)):
+        existing = User.objects.filter(username__startswith=f"{tier}_reader_").count()
+        new_users.extend(
+            User(username=f"{tier}_reader_{i}", email=f"{tier}_reader_{i}@example.com", password=hashed)
+            for i in range(existing, existing + count)
+        )
+    new_users = User.objects.bulk_create(new_users, batch_size=batch_size)
+    UserProfile.objects.bulk_create([
+        UserProfile(
+            user=user,
+            subscription_type=premium if user.username.startswith(f"{SubscriptionType.PREMIUM}_") else free
+        )
+        for user in new_users
+    ], batch_size=batch_size)
+
+    search.rebuild_index()
+    invalidate_facets()
+    bump('books')
+    suggest_index.built_at = None
+
+    return {'books': created_books, 'chapters': created_chapters, 'users': len(new_users)}
@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import math
+import os
+import threading
+import uuid
+from pathlib import Path
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from .ai_client import AsyncAIClient
+from .response_cache import bump
+from .similar import tokenize
+
+
+class SemanticSearchUnavailable(Exception):
+    pass
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class OllamaEmbedder:
+    """Embeddings from Ollama's ``/api/embed``, ``batch_size`` texts per request.
+
+    Batches are sent concurrently through one ``AsyncAIClient``, whose
+    ``OLLAMA_CONCURRENCY`` semaphore caps how many Ollama sees at once.
+    """
+
+    def __init__(self, model: str = None, batch_size: int = None):
+        self.model = model or getattr(settings, 'OLLAMA_EMBED_MODEL', 'nomic-embed-text')
+        self.batch_size = batch_size or getattr(settings, 'SEMANTIC_EMBED_BATCH_SIZE', 32)
+        self.name = f"ollama:{self.model}"
+
+    def embed(self, texts):
+        return async_to_sync(self.aembed)(texts)
+
+    async def aembed(self, texts):
+        texts = list(texts)
+        async with AsyncAIClient(embed_model=self.model) as client:
+            batches = await asyncio.gather(*[
+                client.ollama_embed(texts[start:start + self.batch_size])
+                for start in range(0, len(texts), self.batch_size)
+            ])
+        return normalize_rows([vector for batch in batches for vector in batch])
+
+
+class HashingEmbedder:
+    """Signed feature hashing of a text's words.
+
+    A local stand-in for Ollama in tests and development: deterministic and
+    instant, but it only knows that texts share words, not what they mean.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+                vectors[row, digest % self.dim] += 1 if digest >> 63 else -1
+        return normalize_rows(vectors)
+
+
+EMBEDDERS = {
+    'ollama': OllamaEmbedder,
+    'hashing': HashingEmbedder,
+}
+
+
+def get_embedder():
+    name = getattr(settings, 'SEMANTIC_EMBEDDER', 'ollama')
+    if name not in EMBEDDERS:
+        raise ImproperlyConfigured(f"SEMANTIC_EMBEDDER must be one of: {', '.join(EMBEDDERS)}")
+    return EMBEDDERS[name]()
+
+
+def semantic_documents():
+    """``(book_id, chapter_number, text)`` for every description (chapter 0) and chapter summary."""
+    from .models import Book, Chapter
+
+    books = Book.objects.exclude(description='').order_by('id').values_list('id', 'title', 'description')
+    for book_id, title, description in books.iterator():
+        yield book_id, 0, f"{title}. {description}" if title else description
+
+    chapters = Chapter.objects.exclude(summary='').order_by('book_id', 'chapter_number')
+    yield from chapters.values_list('book_id', 'chapter_number', 'summary').iterator()
+
+
+def text_digest(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def spherical_kmeans(vectors, clusters, iterations=10, sample_per_cluster=64, seed=0):
+    """Unit-length centroids for ``clusters`` groups of (unit-length) rows, fitted on a sample."""
+    rng = np.random.default_rng(seed)
+    size = min(len(vectors), clusters * sample_per_cluster)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), size, replace=False))])
+    centroids = sample[rng.choice(len(sample), clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=clusters) == 0
+        sums[empty] = centroids[empty]
+        centroids = normalize_rows(sums)
+
+    return centroids
+
+
+class SemanticIndex:
+    """Embeddings of every description and chapter summary, searched with NumPy dot products.
+
+    ``vectors-<build>.npy`` holds one unit-length float32 row per text and is
+    memory-mapped read-only, so worker processes share its pages through the
+    OS cache. ``index.npz`` maps rows to ``(book_id, chapter_number)`` (0 for
+    the description), names the embedder and the vectors file, and is
+    replaced last, so a new build is swapped in atomically.
+
+    Below ``SEMANTIC_IVF_THRESHOLD`` rows a query scores every row. Above it
+    the build clusters the rows with spherical k-means and stores them
+    grouped by cluster (an IVF index), and a query only scores the
+    ``SEMANTIC_IVF_NPROBE`` clusters whose centroids are nearest to it.
+    """
+    chunk_size = 8192
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build = None
+
+    @property
+    def directory(self):
+        return Path(getattr(settings, 'SEMANTIC_INDEX_DIR', Path(settings.BASE_DIR) / 'cache' / 'semantic'))
+
+    def load(self):
+        """The current build (reloaded when another process replaced it), or None before the first one."""
+        path = self.directory / 'index.npz'
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+        with self._lock:
+            if self._build is None or self._build['mtime'] != mtime or self._build['path'] != path:
+                try:
+                    self._build = self._read(path, mtime)
+                except FileNotFoundError:
+                    # two builds landed while reading: the vectors named by the index read are gone
+                    self._build = self._read(path, path.stat().st_mtime_ns)
+            return self._build
+
+    def _read(self, path, mtime):
+        with np.load(path) as stored:
+            build = {name: stored[name] for name in stored.files}
+        build['model'] = str(build['model'])
+        build['vectors'] = np.load(self.directory / str(build['vectors_file']), mmap_mode='r')
+        build['mtime'] = mtime
+        build['path'] = path
+        return build
+
+    # searching
+
+    def search(self, text, limit=10, embedder=None):
+        """``[(book_id, score, chapter_number or None), ...]`` best first, one entry per book."""
+        embedder = embedder or get_embedder()
+        build = self.load()
+        if build is None:
+            raise SemanticSearchUnavailable("The semantic index has not been built yet")
+        if build['model'] != embedder.name:
+            raise SemanticSearchUnavailable(
+                f"The semantic index was built with {build['model']}, not {embedder.name}; rebuild it"
+            )
+        if not len(build['keys']):
+            return []
+
+        query = embedder.embed([text])[0]
+        rows, scores = self._score(build, query)
+        related = scores > 0
+        rows, scores = rows[related], scores[related]
+
+        # best row per book: first occurrence of each book in score order
+        order = np.argsort(-scores, kind='stable')
+        _, first = np.unique(build['keys'][rows[order], 0], return_index=True)
+        best = order[np.sort(first)[:limit]]
+
+        return [
+            (int(book_id), float(score), int(chapter_number) or None)
+            for (book_id, chapter_number), score in zip(build['keys'][rows[best]], scores[best])
+        ]
+
+    def _score(self, build, query):
+        vectors = build['vectors']
+        if not len(build['centroids']):
+            return np.arange(len(vectors)), np.asarray(vectors @ query)
+
+        nprobe = getattr(settings, 'SEMANTIC_IVF_NPROBE', 8)
+        offsets = build['offsets']
+        probe = np.argsort(-(build['centroids'] @ query))[:nprobe]
+        rows = [np.arange(offsets[cluster], offsets[cluster + 1]) for cluster in probe]
+        scores = [np.asarray(vectors[offsets[cluster]:offsets[cluster + 1]] @ query) for cluster in probe]
+        return np.concatenate(rows), np.concatenate(scores)
+
+    # building
+
+    def build(self, embedder=None, progress=None):
+        """Embed every text and swap the new build in; returns ``(rows, embedded)``.
+
+        Texts unchanged since the previous build with the same embedder keep
+        their vectors, so only new and edited ones are sent to the embedder.
+        """
+        embedder = embedder or get_embedder()
+        documents = list(semantic_documents())
+        keys = np.array([(book_id, chapter) for book_id, chapter, _ in documents], dtype=np.int64).reshape(-1, 2)
+        digests = np.array([text_digest(text) for _, _, text in documents], dtype=np.int64)
+
+        previous = self.load()
+        reusable = {}
+        if previous is not None and previous['model'] == embedder.name:
+            reusable = {
+                (book_id, chapter, digest): row
+                for row, ((book_id, chapter), digest) in enumerate(zip(previous['keys'].tolist(), previous['digests'].tolist()))
+            }
+        sources = [reusable.get((book_id, chapter, digest)) for (book_id, chapter), digest in zip(keys.tolist(), digests.tolist())]
+        missing = [row for row, source in enumerate(sources) if source is None]
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        vectors_file = f"vectors-{uuid.uuid4().hex}.npy"
+        vectors = None
+        embedded = 0
+        if previous is not None and reusable:
+            vectors = self._allocate(vectors_file, len(documents), previous['vectors'].shape[1])
+            for row, source in enumerate(sources):
+                if source is not None:
+                    vectors[row] = previous['vectors'][source]
+
+        for start in range(0, len(missing), self.chunk_size):
+            chunk = missing[start:start + self.chunk_size]
+            embeddings = embedder.embed([documents[row][2] for row in chunk])
+            if vectors is None:
+                vectors = self._allocate(vectors_file, len(documents), embeddings.shape[1])
+            vectors[chunk] = embeddings
+            embedded += len(chunk)
+            if progress:
+                progress(embedded, len(missing))
+
+        if vectors is None:
+            vectors = self._allocate(vectors_file, 0, 0)
+
+        centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        offsets = np.zeros(1, dtype=np.int64)
+        if len(documents) >= getattr(settings, 'SEMANTIC_IVF_THRESHOLD', 20000):
+            vectors_file, vectors, keys, digests, centroids, offsets = self._cluster(vectors_file, vectors, keys, digests)
+
+        vectors.flush()
+        del vectors
+        tmp_path = self.directory / 'index.tmp.npz'
+        np.savez(
+            tmp_path,
+            keys=keys,
+            digests=digests,
+            centroids=centroids,
+            offsets=offsets,
+            model=np.array(embedder.name),
+            vectors_file=np.array(vectors_file),
+        )
+        os.replace(tmp_path, self.directory / 'index.npz')
+
+        # the previous vectors stay until the next build: a worker that read the old index.npz
+        # just before the swap can still open them, and mapped files stay readable once unlinked
+        keep = {vectors_file, str(previous['vectors_file']) if previous is not None else None}
+        for stale in self.directory.glob('vectors-*.npy'):
+            if stale.name not in keep:
+                stale.unlink(missing_ok=True)
+        bump('semantic')
+
+        return len(documents), embedded
+
+    def _allocate(self, name, rows, dim):
+        return np.lib.format.open_memmap(self.directory / name, mode='w+', dtype=np.float32, shape=(rows, dim))
+
+    def _cluster(self, vectors_file, vectors, keys, digests):
+        """Rewrite the rows grouped by nearest centroid, about sqrt(rows) clusters."""
+        clusters = max(1, int(math.sqrt(len(vectors))))
+        centroids = spherical_kmeans(vectors, clusters)
+
+        assignment = np.concatenate([
+            np.argmax(np.asarray(vectors[start:start + self.chunk_size]) @ centroids.T, axis=1)
+            for start in range(0, len(vectors), self.chunk_size)
+        ])
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(clusters + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=clusters), out=offsets[1:])
+
+        clustered_file = f"vectors-{uuid.uuid4().hex}.npy"
+        clustered = self._allocate(clustered_file, len(vectors), vectors.shape[1])
+        for start in range(0, len(order), self.chunk_size):
+            clustered[start:start + self.chunk_size] = vectors[order[start:start + self.chunk_size]]
+
+        del vectors
+        (self.directory / vectors_file).unlink()
+        return clustered_file, clustered, keys[order], digests[order], centroids, offsets
+
+
+semantic_index = SemanticIndex()
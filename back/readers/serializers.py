@@ -1,7 +1,48 @@
 from rest_framework import serializers
-from .models import Book, Chapter
+from .models import Book, Chapter, ReadingProgress
+from .progress import chapter_count
 
-class BookSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """Sparse fieldsets and optional nested data for a ModelSerializer.
+
+    ``fields=[...]`` keeps only the named fields and ``expand=[...]`` adds the
+    fields returned by ``get_expandable_fields()``. ``only_columns()`` lists
+    the model columns the remaining fields read, for ``QuerySet.only()``.
+    """
+    # SerializerMethodFields read these columns
+    method_field_sources = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        expandable = self.get_expandable_fields()
+        self.expanded = [name for name in expand or () if name in expandable]
+        for name in self.expanded:
+            self.fields[name] = expandable[name]
+
+        if fields:
+            allowed = set(fields) | set(self.expanded)
+            for name in list(self.fields):
+                if name not in allowed:
+                    self.fields.pop(name)
+
+    def get_expandable_fields(self):
+        return {}
+
+    def only_columns(self):
+        columns = {'id'}
+        for name, field in self.fields.items():
+            if name in self.method_field_sources:
+                columns.update(self.method_field_sources[name])
+            elif isinstance(field, DynamicFieldsMixin):
+                columns.update(f"{field.source}__{column}" for column in field.only_columns())
+            elif isinstance(field, serializers.BaseSerializer) or field.source == '*':
+                continue
+            else:
+                columns.add(field.source.replace('.', '__'))
+        return columns
+
+class BookSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Book
@@ -12,13 +53,19 @@ class BookSerializer(serializers.ModelSerializer):
             'genre',
             'description',
             'cover_image',
+            'cover_lqip',
+            'cover_color',
             'accessibility',
             'language'
         ]
+
+    def get_expandable_fields(self):
+        return {'chapters': ChapterIndexSerializer(many=True, read_only=True)}
         
-class ChapterSerializer(serializers.ModelSerializer):
+class ChapterSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     book_id = serializers.IntegerField(source='book.id', read_only=True)
     book_title = serializers.CharField(source='book.title', read_only=True)
+    is_locked = serializers.SerializerMethodField()
 
     class Meta:
         model = Chapter
@@ -29,5 +76,74 @@ class ChapterSerializer(serializers.ModelSerializer):
             'chapter_number',
             'title',
             'summary',
-            'illustration'
-        ]
\ No newline at end of file
+            'illustration',
+            'illustration_lqip',
+            'illustration_color',
+            'is_locked'
+        ]
+
+    def get_expandable_fields(self):
+        return {'book': BookSerializer(read_only=True)}
+
+    def get_is_locked(self, obj):
+        return getattr(obj, 'is_locked', False)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if getattr(instance, 'is_locked', False) and 'summary' in data:
+            # locked chapters stay in the index but don't leak premium content
+            data['summary'] = ''
+        return data
+
+class BookSearchResultSerializer(BookSerializer):
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+    highlight = serializers.CharField(source='search_highlight', read_only=True)
+
+    class Meta(BookSerializer.Meta):
+        fields = BookSerializer.Meta.fields + ['rank', 'highlight']
+
+class ChapterIndexSerializer(serializers.ModelSerializer):
+    has_illustration = serializers.SerializerMethodField()
+    is_locked = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Chapter
+        fields = ['chapter_number', 'title', 'has_illustration', 'is_locked']
+
+    def get_has_illustration(self, obj):
+        return bool(obj.illustration)
+
+    def get_is_locked(self, obj):
+        return getattr(obj, 'is_locked', False)
+
+class BookManifestSerializer(BookSerializer):
+    chapters = ChapterIndexSerializer(many=True, read_only=True)
+
+    def get_expandable_fields(self):
+        return {}
+
+    class Meta(BookSerializer.Meta):
+        fields = BookSerializer.Meta.fields + ['chapters']
+
+class ReadingProgressUpdateSerializer(serializers.Serializer):
+    book = serializers.IntegerField(min_value=1)
+    chapter_number = serializers.IntegerField(min_value=1)
+    position = serializers.FloatField(min_value=0, max_value=1, default=0)
+
+    def validate(self, attrs):
+        chapters = chapter_count(attrs['book'])
+        if chapters is None:
+            raise serializers.ValidationError({'book': "Book not found."})
+        if attrs['chapter_number'] > max(chapters, 1):
+            raise serializers.ValidationError({'chapter_number': f"This book has {chapters} chapter(s)."})
+        return attrs
+
+class ReadingProgressSerializer(serializers.ModelSerializer):
+    book = BookSerializer(
+        read_only=True,
+        fields=['id', 'title', 'author', 'cover_image', 'cover_lqip', 'cover_color', 'accessibility']
+    )
+
+    class Meta:
+        model = ReadingProgress
+        fields = ['book', 'chapter_number', 'position', 'updated_at']
@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import Book, Chapter
+from .storage import media_storage
+from . import search
+from .suggest import suggest_index
+from .similar import similar_index
+from .facets import invalidate_facets
+from . import response_cache
+
+IMAGE_FIELDS = {
+    Book: 'cover_image',
+    Chapter: 'illustration',
+}
+
+
+def _release_later(name):
+    if name and media_storage.is_content_addressed(name):
+        transaction.on_commit(lambda: media_storage.release(name))
+
+
+@receiver(post_init, sender=Book)
+@receiver(post_init, sender=Chapter)
+def remember_image_name(sender, instance, **kwargs):
+    value = instance.__dict__.get(IMAGE_FIELDS[sender])
+    instance._original_image_name = getattr(value, 'name', value)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Chapter)
+def release_replaced_image(sender, instance, **kwargs):
+    field = IMAGE_FIELDS[sender]
+    old_name = getattr(instance, '_original_image_name', None)
+    new_name = getattr(instance, field).name
+
+    if old_name and old_name != new_name:
+        _release_later(old_name)
+
+    instance._original_image_name = new_name
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Chapter)
+def release_deleted_image(sender, instance, **kwargs):
+    _release_later(getattr(instance, IMAGE_FIELDS[sender]).name)
+
+
+@receiver(post_save, sender=Book)
+def index_saved_book(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_book_on_commit(instance.pk)
+        transaction.on_commit(
+            lambda: _update_suggestions(instance.pk, instance.title, instance.author, instance.popularity)
+        )
+        transaction.on_commit(invalidate_facets)
+
+
+@receiver(post_delete, sender=Book)
+def unindex_deleted_book(sender, instance, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: search.remove_book(book_id))
+    transaction.on_commit(lambda: suggest_index.remove(book_id))
+    transaction.on_commit(invalidate_facets)
+
+
+def _update_suggestions(book_id, title, author, popularity):
+    if suggest_index.built_at is None:
+        return  # built lazily from the database on first use
+    if title:
+        suggest_index.upsert(book_id, title, author, popularity)
+    else:
+        suggest_index.remove(book_id)
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def reindex_chapter_book(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_book_on_commit(instance.book_id)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def update_similar_books(sender, instance, raw=False, **kwargs):
+    if not raw:
+        book_id = instance.pk if sender is Book else instance.book_id
+        transaction.on_commit(lambda: similar_index.mark_dirty(book_id))
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_responses(sender, instance, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: response_cache.bump('books', f"book:{book_id}"))
+
+
+@receiver(post_save, sender=Chapter)
+@receiver(post_delete, sender=Chapter)
+def invalidate_chapter_responses(sender, instance, **kwargs):
+    book_id = instance.book_id
+    # 'chapters' covers book lists with ?expand=chapters, which span many books
+    transaction.on_commit(lambda: response_cache.bump(f"book:{book_id}:chapters", 'chapters'))
@@ -0,0 +1,410 @@
+import math
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from core.db import PeriodicFlusher
+from .response_cache import bump
+from .suggest import normalize
+
+STOP_WORDS = frozenset("""
+    a about after again against all also an and any are as at be because been before being between both but by
+    can could did do does doing down during each few for from further had has have having he her here hers him
+    his how i if in into is it its itself just me more most my no nor not now of off on once only or other our
+    out over own same she should so some such than that the their them then there these they this those through
+    to too under until up very was we were what when where which while who whom why will with would you your
+""".split())
+
+
+def tokenize(text):
+    return [
+        token for token in normalize(text).split()
+        if len(token) > 2 and not token.isdigit() and token not in STOP_WORDS
+    ]
+
+
+def book_documents(book_ids=None):
+    """``{book_id: tokens}`` from the description, genre and chapter summaries of each book."""
+    from .models import Book, Chapter
+
+    books = Book.objects.order_by('id')
+    chapters = Chapter.objects.exclude(summary='').order_by('book_id', 'chapter_number')
+    if book_ids is not None:
+        books = books.filter(pk__in=book_ids)
+        chapters = chapters.filter(book_id__in=book_ids)
+
+    documents = {}
+    for book_id, description, genre in books.values_list('id', 'description', 'genre').iterator():
+        # the genre is its own term, so it only ever matches the same genre
+        documents[book_id] = tokenize(description) + ([f"genre{genre}"] if genre else [])
+    for book_id, summary in chapters.values_list('book_id', 'summary').iterator():
+        if book_id in documents:
+            documents[book_id] += tokenize(summary)
+    return documents
+
+
+class SimilarBooksUnavailable(Exception):
+    pass
+
+
+class CSRMatrix:
+    """Rows of float32 values in compressed sparse row form (``indptr``, ``indices``, ``data``).
+
+    Just what the similar-book index needs without SciPy: row selection and
+    stacking, dense copies of a few rows, and products with a dense matrix
+    computed over chunks of nonzeros so memory stays bounded.
+    """
+    max_chunk = 1 << 22  # products held in memory at once
+
+    def __init__(self, indptr, indices, data, n_cols):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.data = np.asarray(data, dtype=np.float32)
+        self.n_cols = n_cols
+
+    @classmethod
+    def empty(cls, n_rows=0, n_cols=0):
+        return cls(np.zeros(n_rows + 1), np.zeros(0), np.zeros(0), n_cols)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def _positions(self, rows):
+        starts, counts = self.indptr[rows], np.diff(self.indptr)[rows]
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return offsets + np.arange(counts.sum()), counts
+
+    def take(self, rows):
+        """A new matrix of the given rows, in that order."""
+        positions, counts = self._positions(np.asarray(rows, dtype=np.int64))
+        indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return CSRMatrix(indptr, self.indices[positions], self.data[positions], self.n_cols)
+
+    def vstack(self, other):
+        indptr = np.concatenate([self.indptr, other.indptr[1:] + self.indptr[-1]])
+        return CSRMatrix(
+            indptr, np.concatenate([self.indices, other.indices]), np.concatenate([self.data, other.data]), self.n_cols
+        )
+
+    def dense(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        positions, counts = self._positions(rows)
+        out = np.zeros((len(rows), self.n_cols), dtype=np.float32)
+        out[np.repeat(np.arange(len(rows)), counts), self.indices[positions]] = self.data[positions]
+        return out
+
+    def dot(self, other):
+        """``self @ other`` for a dense ``(n_cols, k)`` array."""
+        out = np.zeros((len(self), other.shape[1]), dtype=np.float32)
+        step = max(1, self.max_chunk // max(1, other.shape[1]))
+        row = 0
+        while row < len(self):
+            # as many rows as fit in one chunk of nonzeros, at least one
+            end = max(row + 1, int(np.searchsorted(self.indptr, self.indptr[row] + step, side='right')) - 1)
+            end = min(end, len(self))
+            start, stop = self.indptr[row], self.indptr[end]
+            if stop > start:
+                products = self.data[start:stop, None] * other[self.indices[start:stop]]
+                counts = np.diff(self.indptr[row:end + 1])
+                nonempty = counts > 0
+                out[row:end][nonempty] = np.add.reduceat(products, self.indptr[row:end][nonempty] - start, axis=0)
+            row = end
+        return out
+
+
+class SimilarBooksIndex(PeriodicFlusher):
+    """TF-IDF vectors for every book and its precomputed top-k most similar books.
+
+    Rows are L2-normalized, so cosine similarity is a dot product. The
+    vectors stay sparse (:class:`CSRMatrix`), in memory and in the ``.npz``
+    at ``SIMILAR_BOOKS_PATH`` next to the neighbour lists; the neighbours of
+    a block of books come from one sparse-dense product plus an
+    ``argpartition``, and a lookup is a dict access once the file is loaded.
+
+    Edited books are marked dirty and re-vectorized in batches every
+    ``interval`` seconds against the vocabulary and IDF weights of the last
+    full build: their own lists are recomputed, and every other list is
+    merged with their new scores. New words count once ``rebuild()`` runs
+    (``manage.py rebuild_similar_books``). A process that finds no index
+    builds one on a background thread and answers
+    :class:`SimilarBooksUnavailable` until it is ready.
+    """
+    flush_label = 'similar book update(s)'
+
+    def __init__(self, k=20, max_features=4096, min_df=2, max_df=0.8, interval=10, block_size=512):
+        self.k = k
+        self.max_features = max_features
+        self.min_df = min_df
+        self.max_df = max_df
+        self.interval = interval
+        self.block_size = block_size
+        self._lock = threading.RLock()
+        self._building = threading.Lock()
+        self._dirty_lock = threading.Lock()
+        self._dirty = set()
+        self._reset()
+
+    def _reset(self):
+        self.book_ids = np.zeros(0, dtype=np.int64)
+        self.terms = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.matrix = CSRMatrix.empty()
+        self.neighbors = np.zeros((0, self.k), dtype=np.int64)
+        self.scores = np.zeros((0, self.k), dtype=np.float32)
+        self._rows = {}
+        self._mtime = None
+
+    @property
+    def path(self):
+        return Path(getattr(settings, 'SIMILAR_BOOKS_PATH', Path(settings.BASE_DIR) / 'cache' / 'similar_books.npz'))
+
+    # lookups
+
+    def similar(self, book_id, limit=10):
+        """``[(book_id, score), ...]`` most similar first, or None when the book isn't indexed."""
+        with self._lock:
+            if not self._ensure_loaded():
+                self.start_build()
+                raise SimilarBooksUnavailable("Similar books are still being computed")
+            row = self._rows.get(book_id)
+            if row is None:
+                return None
+            return [
+                (int(other), float(score))
+                for other, score in zip(self.neighbors[row], self.scores[row])
+                if other >= 0
+            ][:limit]
+
+    def _ensure_loaded(self):
+        """Pick up an index written by another process; False while there is none to use."""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            return self._mtime is not None
+
+        if mtime != self._mtime:
+            # another worker (or the rebuild command) wrote a newer index
+            return self._load()
+        return True
+
+    # building
+
+    def start_build(self):
+        """Rebuild on a background thread unless one is already running; True if it started one."""
+        if not self._building.acquire(blocking=False):
+            return False
+        threading.Thread(target=self._build_in_background, name='SimilarBooksBuild', daemon=True).start()
+        return True
+
+    def _build_in_background(self):
+        try:
+            count = self.rebuild()
+            print(f"Built similar books for {count} book(s)")
+        except Exception as e:
+            print(f"Building similar books failed: {e}")
+        finally:
+            connections.close_all()
+            self._building.release()
+
+    def rebuild(self):
+        """Vectorize every book with a fresh vocabulary and recompute all neighbour lists."""
+        documents = book_documents()
+        counts = {book_id: Counter(tokens) for book_id, tokens in documents.items()}
+
+        df = Counter()
+        for terms in counts.values():
+            df.update(terms.keys())
+        max_count = max(self.min_df, self.max_df * len(counts))
+        kept = sorted(
+            (term for term, n in df.items() if self.min_df <= n <= max_count),
+            key=lambda term: (-df[term], term)
+        )[:self.max_features]
+
+        terms = {term: col for col, term in enumerate(sorted(kept))}
+        idf = np.array([math.log((1 + len(counts)) / (1 + df[term])) + 1 for term in sorted(kept)], dtype=np.float32)
+        book_ids = np.array(sorted(counts), dtype=np.int64)
+        matrix = self._vectorize([counts[book_id] for book_id in book_ids.tolist()], terms, idf)
+        # scored outside the lock, so lookups keep being served from the previous build
+        neighbors, scores = self._top_k(matrix, book_ids, np.arange(len(book_ids)))
+
+        with self._lock:
+            self.terms, self.idf, self.book_ids, self.matrix = terms, idf, book_ids, matrix
+            self.neighbors, self.scores = neighbors, scores
+            self._rows = {book_id: row for row, book_id in enumerate(book_ids.tolist())}
+            self._save()
+
+        return len(self.book_ids)
+
+    def _vectorize(self, term_counts, terms=None, idf=None):
+        terms = self.terms if terms is None else terms
+        idf = self.idf if idf is None else idf
+
+        indptr = np.zeros(len(term_counts) + 1, dtype=np.int64)
+        indices, data = [], []
+        for row, counts in enumerate(term_counts):
+            cols = np.array([terms[term] for term in counts if term in terms], dtype=np.int32)
+            # sublinear tf damps chapter summaries that repeat the same names
+            tf = np.array([1 + math.log(counts[term]) for term in counts if term in terms], dtype=np.float32)
+            weights = tf * idf[cols]
+            norm = np.linalg.norm(weights)
+            order = np.argsort(cols)
+            indices.append(cols[order])
+            data.append(weights[order] / norm if norm > 0 else weights[order])
+            indptr[row + 1] = indptr[row] + len(cols)
+
+        return CSRMatrix(
+            indptr,
+            np.concatenate(indices) if indices else np.zeros(0),
+            np.concatenate(data) if data else np.zeros(0),
+            len(terms)
+        )
+
+    def _top_k(self, matrix, book_ids, rows):
+        """Neighbour ids and scores for the given matrix rows, scored against every book."""
+        neighbors = np.full((len(rows), self.k), -1, dtype=np.int64)
+        scores = np.zeros((len(rows), self.k), dtype=np.float32)
+        if len(book_ids) < 2:
+            return neighbors, scores
+
+        k = min(self.k, len(book_ids) - 1)
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start:start + self.block_size]
+            sims = matrix.dot(matrix.dense(block).T).T
+            sims[np.arange(len(block)), block] = -1  # never similar to itself
+
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            ids = book_ids[top]
+            ids[top_scores <= 0] = -1
+            neighbors[start:start + len(block), :k] = ids
+            scores[start:start + len(block), :k] = np.maximum(top_scores, 0)
+
+        return neighbors, scores
+
+    # incremental updates
+
+    def mark_dirty(self, book_id):
+        with self._dirty_lock:
+            self._dirty.add(book_id)
+        self.start_flusher()
+
+    def flush(self):
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        if not dirty:
+            return 0
+
+        try:
+            with self._lock:
+                loaded = self._ensure_loaded()
+                if loaded:
+                    self._apply(dirty)
+            # a first build reads every book, dirty ones included, unless one was already running
+            if not loaded and not self.start_build():
+                with self._dirty_lock:
+                    self._dirty |= dirty
+                return 0
+        except Exception:
+            with self._dirty_lock:
+                self._dirty |= dirty
+            raise
+        return len(dirty)
+
+    def _apply(self, dirty):
+        documents = book_documents(dirty)
+        removed = dirty - set(documents)
+
+        keep = np.flatnonzero([book_id not in removed for book_id in self.book_ids.tolist()])
+        added = sorted(set(documents) - set(self.book_ids.tolist()))
+        book_ids = np.concatenate([self.book_ids[keep], np.array(added, dtype=np.int64)])
+        rows = {book_id: row for row, book_id in enumerate(book_ids.tolist())}
+        changed = np.array([rows[book_id] for book_id in sorted(documents)], dtype=np.int64)
+
+        # kept rows come from the old matrix, changed and added ones from their new vectors
+        vectors = self._vectorize([Counter(documents[book_id]) for book_id in sorted(documents)])
+        source = np.concatenate([keep, np.zeros(len(added), dtype=np.int64)])
+        source[changed] = len(self.book_ids) + np.arange(len(changed))
+        self.matrix = self.matrix.vstack(vectors).take(source)
+
+        self.book_ids, self._rows = book_ids, rows
+        self.neighbors = np.vstack([self.neighbors[keep], np.full((len(added), self.k), -1, dtype=np.int64)])
+        self.scores = np.vstack([self.scores[keep], np.zeros((len(added), self.k), dtype=np.float32)])
+
+        # lists that held a changed or removed book lost a neighbour: recompute them in full,
+        # along with the changed books themselves; every other list only merges in the new scores
+        stale = np.isin(self.neighbors, np.array(sorted(dirty), dtype=np.int64)).any(axis=1)
+        stale[changed] = True
+        recompute = np.flatnonzero(stale)
+        merge = np.flatnonzero(~stale)
+
+        if len(merge) and len(changed):
+            sims = self.matrix.take(merge).dot(vectors.dense(np.arange(len(changed))).T)
+            candidates = np.hstack([self.neighbors[merge], np.broadcast_to(self.book_ids[changed], sims.shape)])
+            candidate_scores = np.hstack([self.scores[merge], sims])
+            candidate_scores[candidates < 0] = 0
+
+            order = np.argsort(-candidate_scores, axis=1, kind='stable')[:, :self.k]
+            self.neighbors[merge] = np.take_along_axis(candidates, order, axis=1)
+            self.scores[merge] = np.take_along_axis(candidate_scores, order, axis=1)
+            self.neighbors[merge] = np.where(self.scores[merge] > 0, self.neighbors[merge], -1)
+
+        if len(recompute):
+            self.neighbors[recompute], self.scores[recompute] = self._top_k(self.matrix, self.book_ids, recompute)
+
+        self._save()
+
+    # storage
+
+    def _save(self):
+        path = self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp.npz')
+        np.savez(
+            tmp_path,
+            book_ids=self.book_ids,
+            terms=np.array(sorted(self.terms, key=self.terms.get), dtype=str),
+            idf=self.idf,
+            indptr=self.matrix.indptr,
+            indices=self.matrix.indices,
+            data=self.matrix.data,
+            neighbors=self.neighbors,
+            scores=self.scores,
+        )
+        os.replace(tmp_path, path)
+        self._mtime = path.stat().st_mtime_ns
+        bump('similar')
+
+    def _load(self):
+        """Load the index on disk; False (and nothing loaded) when it was built with another ``k``."""
+        path = self.path
+        mtime = path.stat().st_mtime_ns
+        with np.load(path) as stored:
+            if stored['neighbors'].shape[1] != self.k:
+                return False
+            terms = stored['terms'].tolist()
+            self.book_ids = stored['book_ids']
+            self.terms = {term: col for col, term in enumerate(terms)}
+            self.idf = stored['idf']
+            self.matrix = CSRMatrix(stored['indptr'], stored['indices'], stored['data'], len(terms))
+            self.neighbors = stored['neighbors']
+            self.scores = stored['scores']
+
+        self._rows = {book_id: row for row, book_id in enumerate(self.book_ids.tolist())}
+        self._mtime = mtime
+        bump('similar')
+        return True
+
+
+similar_index = SimilarBooksIndex(
+    k=getattr(settings, 'SIMILAR_BOOKS_K', 20),
+    max_features=getattr(settings, 'SIMILAR_BOOKS_MAX_FEATURES', 4096),
+    interval=getattr(settings, 'SIMILAR_BOOKS_UPDATE_INTERVAL', 10),
+)
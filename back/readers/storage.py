@@ -0,0 +1,73 @@
+import hashlib
+import os
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores generated images by SHA-256 of their content.
+
+    Files live under ``<prefix>/ab/cd/<digest><ext>`` so identical images
+    share one file and no directory grows unbounded. A file is removed from
+    disk only when no ``Book.cover_image`` or ``Chapter.illustration`` row
+    references it any more (see :meth:`release`).
+    """
+
+    def __init__(self, prefix: str = None, **kwargs):
+        super().__init__(**kwargs)
+        self.prefix = (prefix or getattr(settings, 'MEDIA_CAS_PREFIX', 'readers/cas')).strip('/')
+
+    def deconstruct(self):
+        path, args, kwargs = super().deconstruct()
+        if self.prefix != 'readers/cas':
+            kwargs['prefix'] = self.prefix
+        return path, args, kwargs
+
+    def is_content_addressed(self, name: str) -> bool:
+        return bool(name) and name.startswith(f"{self.prefix}/")
+
+    def cas_name(self, digest: str, ext: str) -> str:
+        return f"{self.prefix}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+    @staticmethod
+    def hash_content(content) -> str:
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return digest.hexdigest()
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1] or '.bin'
+        cas_name = self.cas_name(self.hash_content(content), ext)
+
+        if self.exists(cas_name):
+            return cas_name
+
+        return super()._save(cas_name, content)
+
+    def reference_count(self, name: str) -> int:
+        from .models import Book, Chapter
+
+        return (
+            Book.objects.filter(cover_image=name).count()
+            + Chapter.objects.filter(illustration=name).count()
+        )
+
+    def release(self, name: str) -> bool:
+        """Delete ``name`` from disk once nothing references it. Returns True if deleted."""
+        if not name or self.reference_count(name) > 0:
+            return False
+
+        self.delete(name)
+        return True
+
+
+def get_media_storage():
+    return media_storage
+
+
+media_storage = ContentAddressedStorage()
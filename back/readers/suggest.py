@@ -0,0 +1,151 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from django.conf import settings
+from django.db import connections
+
+NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return NON_ALNUM_RE.sub(' ', text.lower()).strip()
+
+
+class PrefixIndex:
+    """In-memory sorted prefix index over normalized titles and authors.
+
+    Every book contributes its full title, its author, and each later word
+    of the title ("great gatsby", "gatsby") as keys into one sorted list,
+    so a prefix lookup is two bisects plus a scan of the matching range.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._books = {}
+        self._lock = threading.RLock()
+        self.built_at = None
+
+    def _keys_for(self, title, author):
+        keys = set()
+        words = normalize(title).split()
+        for i in range(len(words)):
+            keys.add(' '.join(words[i:]))
+        author_key = normalize(author)
+        if author_key:
+            keys.add(author_key)
+            keys.update(author_key.split())
+        return keys
+
+    def build(self, rows):
+        """``rows`` yields ``(id, title, author, score)`` tuples."""
+        keys = []
+        books = {}
+        for book_id, title, author, score in rows:
+            entry_keys = self._keys_for(title, author)
+            books[book_id] = {'title': title, 'author': author, 'score': score or 0, 'keys': entry_keys}
+            keys.extend((key, book_id) for key in entry_keys)
+        keys.sort()
+
+        with self._lock:
+            self._keys = keys
+            self._books = books
+            self.built_at = time.monotonic()
+
+    def upsert(self, book_id, title, author, score=0):
+        with self._lock:
+            self._remove_keys(book_id)
+            entry_keys = self._keys_for(title, author)
+            self._books[book_id] = {'title': title, 'author': author, 'score': score or 0, 'keys': entry_keys}
+            for key in entry_keys:
+                bisect.insort(self._keys, (key, book_id))
+
+    def remove(self, book_id):
+        with self._lock:
+            self._remove_keys(book_id)
+            self._books.pop(book_id, None)
+
+    def set_score(self, book_id, score):
+        with self._lock:
+            if book_id in self._books:
+                self._books[book_id]['score'] = score or 0
+
+    def _remove_keys(self, book_id):
+        entry = self._books.get(book_id)
+        if entry is None:
+            return
+        for key in entry['keys']:
+            i = bisect.bisect_left(self._keys, (key, book_id))
+            if i < len(self._keys) and self._keys[i] == (key, book_id):
+                del self._keys[i]
+
+    def suggest(self, prefix, limit=8):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            keys = self._keys
+            books = self._books
+            # normalized keys only hold [0-9a-z ], all below '~', so this ends the prefix range
+            start = bisect.bisect_left(keys, (prefix,))
+            end = bisect.bisect_left(keys, (prefix + '~',), start)
+            matched = {book_id for _, book_id in keys[start:end]}
+
+            top = heapq.nsmallest(
+                limit,
+                matched,
+                key=lambda book_id: (-books[book_id]['score'], books[book_id]['title'].lower()),
+            )
+            return [
+                {'id': book_id, 'title': books[book_id]['title'], 'author': books[book_id]['author']}
+                for book_id in top
+            ]
+
+    def is_stale(self, max_age):
+        return self.built_at is None or (max_age and time.monotonic() - self.built_at > max_age)
+
+
+suggest_index = PrefixIndex()
+
+
+def book_rows():
+    from .models import Book
+
+    return Book.objects.exclude(title='').values_list('id', 'title', 'author', 'popularity').iterator()
+
+
+_rebuild_lock = threading.Lock()
+
+
+def _rebuild_in_background():
+    try:
+        if suggest_index.is_stale(getattr(settings, 'SUGGEST_INDEX_MAX_AGE', 300)):
+            suggest_index.build(book_rows())
+    except Exception as e:
+        print(f"Rebuilding the suggest index failed: {e}")
+    finally:
+        connections.close_all()
+        _rebuild_lock.release()
+
+
+def get_suggest_index():
+    """Build on first use, and rebuild after ``SUGGEST_INDEX_MAX_AGE`` seconds so other
+    worker processes pick up writes they did not see through signals.
+
+    Only the first build blocks (one request builds, the others wait for it);
+    later rebuilds run on a background thread, one at a time, while the
+    current index keeps serving.
+    """
+    max_age = getattr(settings, 'SUGGEST_INDEX_MAX_AGE', 300)
+    if suggest_index.built_at is None:
+        with _rebuild_lock:
+            if suggest_index.built_at is None:
+                suggest_index.build(book_rows())
+    elif suggest_index.is_stale(max_age) and _rebuild_lock.acquire(blocking=False):
+        threading.Thread(target=_rebuild_in_background, name='SuggestIndexRebuild', daemon=True).start()
+    return suggest_index
@@ -1,3 +1,1174 @@
-from django.test import TestCase
+import asyncio
+import io
+import logging
+import os
+import pathlib
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+import httpx
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.checks import check_replica_pin_cache
+from purchasers.authentication import TierTokenObtainPairSerializer, user_cache
+from .async_views import AsyncAllChaptersView, AsyncBookDetailView, AsyncBookListView, AsyncChapterDetailView
+from .image_cache import ImageCache
+from .models import Book, Chapter, ChapterViewDaily, ReadingProgress
+from .popularity import ViewCounter, refresh_popularity, view_counter
+from . import search, suggest
+from .benchmarks import percentile
+from .progress import ProgressBuffer, progress_buffer
+from .response_cache import cache_key, get_or_compute
+from .semantic import HashingEmbedder, semantic_documents, semantic_index
+from .serializers import BookSerializer
+from .similar import CSRMatrix, SimilarBooksIndex, similar_index
+from .suggest import PrefixIndex, get_suggest_index
+from .seeding import seed_catalog
+from .suggest import suggest_index
 
-# Create your tests here.
+# Catalog size and timing knobs. The defaults keep the suite fast; budgets don't depend on them.
+#   QUERY_BUDGET_BOOKS / _CHAPTERS / _USERS  catalog seeded per QueryBudgetTestCase class
+#   QUERY_BUDGET_RUNS                         timed runs per GET (the first is the one counted)
+#   QUERY_BUDGET_REPORT                       file the p50/p95 latency table is appended to
+# A full-scale run, thousands of books with tens of chapters each:
+#   QUERY_BUDGET_BOOKS=2000 QUERY_BUDGET_CHAPTERS=20 QUERY_BUDGET_USERS=25 QUERY_BUDGET_RUNS=5 \
+#   QUERY_BUDGET_REPORT=query-budget.txt python manage.py test readers purchasers
+# Latencies are recorded, never asserted on.
+CATALOG_BOOKS = int(os.environ.get('QUERY_BUDGET_BOOKS', 40))
+CHAPTERS_PER_BOOK = int(os.environ.get('QUERY_BUDGET_CHAPTERS', 6))
+USERS_PER_TIER = int(os.environ.get('QUERY_BUDGET_USERS', 5))
+TIMING_RUNS = int(os.environ.get('QUERY_BUDGET_RUNS', 1))
+TIMING_REPORT = os.environ.get('QUERY_BUDGET_REPORT')
+
+logger = logging.getLogger(__name__)
+
+TEST_PASSWORD = 'budget-pass-123'
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class CatalogTestCase(TestCase):
+    """Seeds a small synthetic catalog once per class: a free and a premium
+    reader, a staff user, and ``catalog_books`` books of ``catalog_chapters``
+    chapters, every fourth one free.
+    """
+    catalog_books = 8
+    catalog_chapters = 6
+    catalog_users = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(cls.catalog_books, cls.catalog_chapters, cls.catalog_users, media=False, password=TEST_PASSWORD)
+
+        cls.free_user = User.objects.get(username='free_reader_0')
+        cls.premium_user = User.objects.get(username='premium_reader_0')
+        cls.staff_user = User.objects.create_user('budget_staff', password=TEST_PASSWORD, is_staff=True)
+
+        cls.free_book = Book.objects.filter(accessibility='free').order_by('id').first()
+        cls.premium_book = Book.objects.filter(accessibility='premium').order_by('id').first()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # buffered writes are flushed by the tests themselves, never by a background thread
+        cls.flush_intervals = (progress_buffer.interval, view_counter.interval, similar_index.interval)
+        progress_buffer.interval = view_counter.interval = similar_index.interval = 0
+
+    @classmethod
+    def tearDownClass(cls):
+        progress_buffer.interval, view_counter.interval, similar_index.interval = cls.flush_intervals
+        super().tearDownClass()
+
+    def setUp(self):
+        self.reset_caches()
+
+    def reset_caches(self):
+        cache.clear()
+        user_cache.clear()
+        suggest_index.built_at = None
+        view_counter.drain()
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.credentials(HTTP_AUTHORIZATION=self.auth_header(user))
+        return client
+
+    def auth_header(self, user):
+        return f"Bearer {TierTokenObtainPairSerializer.get_token(user).access_token}"
+
+    def commit(self):
+        """Runs the on_commit hooks (search index, cache generations) of writes made inside it."""
+        return self.captureOnCommitCallbacks(execute=True)
+
+
+class QueryBudgetTestCase(CatalogTestCase):
+    """Seeds the catalog at ``QUERY_BUDGET_*`` scale and checks routes against query budgets.
+
+    ``assertBudget`` resets every in-process cache before the request unless
+    ``warm=True`` (which sends the request once first), so the counted
+    queries are the cold path. Each request's latency is recorded per route,
+    and the p50/p95 table is logged (and appended to ``QUERY_BUDGET_REPORT``)
+    when the class finishes.
+    """
+    catalog_books = CATALOG_BOOKS
+    catalog_chapters = CHAPTERS_PER_BOOK
+    catalog_users = 2 * USERS_PER_TIER
+    timings = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.timings = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.report_timings()
+        super().tearDownClass()
+
+    @classmethod
+    def report_timings(cls):
+        if not cls.timings:
+            return
+        lines = [f"{cls.__name__} latency (ms, {CATALOG_BOOKS} books x {CHAPTERS_PER_BOOK} chapters)"]
+        for label, samples in sorted(cls.timings.items()):
+            lines.append(
+                f"  {label:<60} n {len(samples):3}  p50 {percentile(samples, 50):7.2f}  "
+                f"p95 {percentile(samples, 95):7.2f}  max {max(samples):7.2f}"
+            )
+        logger.info('\n'.join(lines))
+        if TIMING_REPORT:
+            with open(TIMING_REPORT, 'a') as report:
+                report.write('\n'.join(lines) + '\n')
+
+    def assertBudget(self, path, max_queries, method='get', client=None, status=200, warm=False, **kwargs):
+        client = client or self.client_for()
+        label = f"{method.upper()} {path}" + (" (warm)" if warm else "")
+
+        if warm:
+            getattr(client, method)(path, **kwargs)
+        else:
+            self.reset_caches()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.timed(label, client, method, path, **kwargs)
+
+        self.assertEqual(response.status_code, status, f"{label}: {getattr(response, 'data', '')}")
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f"{label} ran {len(queries)} queries, budget is {max_queries}:\n"
+            + '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+
+        # extra samples for the percentiles; writes aren't repeated
+        if method == 'get':
+            for _ in range(TIMING_RUNS - 1):
+                if not warm:
+                    self.reset_caches()
+                self.timed(label, client, method, path, **kwargs)
+        return response
+
+    def timed(self, label, client, method, path, **kwargs):
+        start = time.perf_counter()
+        response = getattr(client, method)(path, **kwargs)
+        if getattr(response, 'streaming', False):
+            response.streamed = b''.join(response.streaming_content)
+        self.timings.setdefault(label, []).append((time.perf_counter() - start) * 1000)
+        return response
+
+
+class CatalogQueryBudgetTests(QueryBudgetTestCase):
+    def test_book_list(self):
+        response = self.assertBudget('/books/', 2)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_book_list_next_page(self):
+        next_url = self.client_for().get('/books/').data['next']
+        self.assertBudget(next_url.replace('http://testserver', ''), 2)
+
+    def test_book_list_with_facets_filters_and_search(self):
+        self.assertBudget('/books/?facets=1', 3)
+        self.assertBudget('/books/?genre=fantasy,mystery&language=English', 2)
+        self.assertBudget('/books/?search=river', 2)
+
+    def test_book_list_sparse_and_expanded(self):
+        self.assertBudget('/books/?fields=id,title', 2)
+        response = self.assertBudget('/books/?expand=chapters', 3)
+        self.assertEqual(len(response.data['results'][0]['chapters']), CHAPTERS_PER_BOOK)
+
+    def test_book_list_warm_cache(self):
+        self.assertBudget('/books/', 0, warm=True)
+
+    def test_book_search(self):
+        response = self.assertBudget('/books/search/?q=river', 3)
+        self.assertTrue(response.data['results'])
+
+    def test_book_search_escapes_highlights(self):
+        with self.commit():
+            Book.objects.create(title="Quietly", description="<b>Zanzibar</b> & the spice road")
+
+        highlight = self.client_for().get('/books/search/?q=zanzibar').data['results'][0]['highlight']
+        self.assertIn("&lt;b&gt;<mark>Zanzibar</mark>&lt;/b&gt; &amp; the spice road", highlight)
+
+    def test_chapter_saves_reindex_the_book_once(self):
+        chapters = list(Chapter.objects.filter(book=self.free_book))
+        with mock.patch.object(search, 'index_book', wraps=search.index_book) as index_book:
+            with self.commit():
+                for chapter in chapters:
+                    chapter.title += " (revised)"
+                    chapter.save()
+
+        index_book.assert_called_once_with(self.free_book.pk)
+        response = self.client_for().get('/books/search/?q=revised')
+        self.assertEqual([book['id'] for book in response.data['results']], [self.free_book.pk])
+
+    def test_rolled_back_savepoint_keeps_later_reindex(self):
+        chapter = Chapter.objects.filter(book=self.free_book).first()
+        with mock.patch.object(search, 'index_book', wraps=search.index_book) as index_book:
+            with self.commit():
+                try:
+                    with transaction.atomic():
+                        chapter.save()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                chapter.title = "Marginalia"
+                chapter.save()
+
+        index_book.assert_called_once_with(self.free_book.pk)
+        response = self.client_for().get('/books/search/?q=marginalia')
+        self.assertEqual([book['id'] for book in response.data['results']], [self.free_book.pk])
+
+    def test_book_suggest(self):
+        self.assertBudget('/books/suggest/?q=the', 1)
+        self.assertBudget('/books/suggest/?q=the', 0, warm=True)
+
+    def test_stale_suggest_index_rebuilds_in_the_background(self):
+        index = get_suggest_index()
+        index.built_at -= 3600
+        keys = index._keys
+        with mock.patch('readers.suggest.threading.Thread') as thread:
+            self.assertIs(get_suggest_index(), index)
+            self.assertIs(get_suggest_index(), index)
+
+        # one rebuild at a time, and the old index keeps serving meanwhile
+        thread.assert_called_once()
+        self.assertIs(index._keys, keys)
+        suggest._rebuild_lock.release()
+
+    def test_book_facets(self):
+        self.assertBudget('/books/facets/?genre=fantasy', 1)
+        self.assertBudget('/books/facets/?genre=fantasy', 0, warm=True)
+
+    def test_book_facets_follow_search(self):
+        title = Book.objects.values_list('title', flat=True).first()
+        matching = Book.objects.filter(title__icontains=title).count()
+        response = self.assertBudget(f"/books/facets/?search={title}", 1)
+        self.assertEqual(response.data['total'], matching)
+        self.assertLess(matching, Book.objects.count())
+        self.assertEqual(self.client_for().get(f"/books/?facets=1&search={title}").data['facets'], response.data)
+        self.assertEqual(self.client_for().get('/books/facets/').data['total'], Book.objects.count())
+
+    def test_book_detail(self):
+        path = f"/books/{self.premium_book.pk}/"
+        self.assertBudget(path, 1)
+        self.assertBudget(path, 0, warm=True)
+
+    def test_book_detail_not_modified(self):
+        path = f"/books/{self.premium_book.pk}/"
+        client = self.client_for()
+        etag = client.get(path)['ETag']
+        self.assertBudget(path, 0, client=client, status=304, warm=True, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified_on_a_cache_miss_skips_serialization(self):
+        paths = [f"/books/{self.premium_book.pk}/", '/books/', f"/api/book/{self.free_book.pk}/chapter/1/"]
+        for path in paths:
+            etag = self.client_for(self.premium_user).get(path)['ETag']
+            self.reset_caches()
+
+            with mock.patch('rest_framework.serializers.Serializer.to_representation') as to_representation:
+                response = self.client_for(self.premium_user).get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, path)
+            to_representation.assert_not_called()
+            self.assertEqual(self.client_for(self.premium_user).get(path).status_code, 200, path)
+
+    def test_book_detail_follows_writes(self):
+        path = f"/books/{self.premium_book.pk}/"
+        client = self.client_for()
+        etag = client.get(path)['ETag']
+
+        with self.commit():
+            book = Book.objects.get(pk=self.premium_book.pk)
+            book.title = "Renamed"
+            book.save()
+
+        response = client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], "Renamed")
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_expanded_chapters_follow_the_caller_tier(self):
+        preview = settings.PREVIEW_CHAPTER_LIMIT
+        paths = [f"/books/{self.premium_book.pk}/?expand=chapters", f"/books/?expand=chapters&accessibility=premium&page_size=100"]
+        expected = [
+            (self.premium_user, [False] * CHAPTERS_PER_BOOK),
+            (self.free_user, [number > preview for number in range(1, CHAPTERS_PER_BOOK + 1)]),
+            (None, [True] * CHAPTERS_PER_BOOK),
+        ]
+        for path in paths:
+            # the premium payload is cached first and must not leak to the other tiers
+            etags = set()
+            for user, locked in expected:
+                response = self.client_for(user).get(path)
+                data = response.data['results'][0] if 'results' in response.data else response.data
+                self.assertEqual([chapter['is_locked'] for chapter in data['chapters']], locked, (path, user))
+                etags.add(response['ETag'])
+            self.assertEqual(len(etags), len(expected), path)
+
+    def test_expanded_chapters_follow_chapter_writes(self):
+        for path in [f"/books/{self.premium_book.pk}/?expand=chapters", f"/books/?expand=chapters&accessibility=premium&page_size=100"]:
+            client = self.client_for(self.premium_user)
+            etag = client.get(path)['ETag']
+            title = f"Renamed for {path}"
+
+            with self.commit():
+                chapter = Chapter.objects.get(book=self.premium_book, chapter_number=1)
+                chapter.title = title
+                chapter.save()
+
+            response = client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, path)
+            books = response.data['results'] if 'results' in response.data else [response.data]
+            data = next(book for book in books if book['id'] == self.premium_book.pk)
+            self.assertEqual(data['chapters'][0]['title'], title)
+
+    def test_book_list_cursor_is_stable(self):
+        client = self.client_for()
+        ordered = list(Book.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        first = client.get('/books/?page_size=10').data
+
+        # a book added while paging shows up on top, not as a repeat on the next page
+        with self.commit():
+            Book.objects.create(title="Newest", file="readers/files/newest.pdf")
+        second = client.get(first['next']).data
+
+        self.assertEqual([book['id'] for book in first['results']], ordered[:10])
+        self.assertEqual([book['id'] for book in second['results']], ordered[10:20])
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def test_suggest_ranks_the_whole_prefix_range(self):
+        index = PrefixIndex()
+        rows = [(i, f"Aardvark {i}", '', 0) for i in range(6000)] + [(6000, "Azure Coast", '', 100)]
+        index.build(rows)
+        self.assertEqual(index.suggest('a', limit=1), [{'id': 6000, 'title': "Azure Coast", 'author': ''}])
+
+
+class ReplicaPinCacheCheckTests(SimpleTestCase):
+    def test_pin_cache_must_be_shared_with_a_replica(self):
+        self.assertEqual(check_replica_pin_cache(None), [])
+
+        with mock.patch('core.checks.replica_alias', return_value='replica'):
+            self.assertEqual([error.id for error in check_replica_pin_cache(None)], ['core.E001'])
+
+            with tempfile.TemporaryDirectory() as location, override_settings(
+                CACHES={'pins': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}},
+                REPLICA_PIN_CACHE='pins',
+            ):
+                self.assertEqual(check_replica_pin_cache(None), [])
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_cold_key_waiters_compute_after_the_lock_wait(self):
+        key = cache_key('test', (), 'busy')
+        cache.add(f"{key}:lock", 1, 60)  # a computation that never finishes
+        with override_settings(RESPONSE_CACHE_LOCK_WAIT=0):
+            self.assertEqual(get_or_compute(key, lambda: 'computed'), 'computed')
+
+
+class ChapterQueryBudgetTests(QueryBudgetTestCase):
+    def test_chapter_detail(self):
+        self.assertBudget(f"/api/book/{self.free_book.pk}/chapter/5/", 1)
+        self.assertBudget(f"/api/book/{self.premium_book.pk}/chapter/1/", 2, client=self.client_for(self.free_user))
+        self.assertBudget(
+            f"/api/book/{self.premium_book.pk}/chapter/{CHAPTERS_PER_BOOK}/", 2,
+            client=self.client_for(self.premium_user)
+        )
+
+    def test_chapter_access_per_tier(self):
+        preview = settings.PREVIEW_CHAPTER_LIMIT
+        path = f"/api/book/{self.premium_book.pk}/chapter/{{}}/"
+        cases = [
+            (None, 1, 401),
+            (self.free_user, preview, 200),
+            (self.free_user, preview + 1, 403),
+            (self.premium_user, CHAPTERS_PER_BOOK, 200),
+        ]
+        for user, chapter_number, status in cases:
+            response = self.client_for(user).get(path.format(chapter_number))
+            self.assertEqual(response.status_code, status, (user, chapter_number))
+
+        free_path = f"/api/book/{self.free_book.pk}/chapter/{CHAPTERS_PER_BOOK}/"
+        self.assertEqual(self.client_for().get(free_path).status_code, 200)
+
+        chapters = f"/api/book/{self.premium_book.pk}/chapters/"
+        locked = [chapter['is_locked'] for chapter in self.client_for(self.free_user).get(chapters).data['results']]
+        self.assertEqual(locked, [number > preview for number in range(1, CHAPTERS_PER_BOOK + 1)])
+        locked = [chapter['is_locked'] for chapter in self.client_for(self.premium_user).get(chapters).data['results']]
+        self.assertEqual(locked, [False] * CHAPTERS_PER_BOOK)
+
+    def test_chapter_detail_follows_writes(self):
+        client = self.client_for()
+        path = f"/api/book/{self.free_book.pk}/chapter/1/"
+        chapters = f"/api/book/{self.free_book.pk}/chapters/"
+        client.get(path)
+        self.client_for(self.free_user).get(chapters)
+
+        with self.commit():
+            chapter = Chapter.objects.get(book=self.free_book, chapter_number=1)
+            chapter.title = "Renamed"
+            chapter.save()
+
+        self.assertEqual(client.get(path).data['title'], "Renamed")
+        self.assertEqual(self.client_for(self.free_user).get(chapters).data['results'][0]['title'], "Renamed")
+
+    def test_chapter_detail_locked(self):
+        path = f"/api/book/{self.premium_book.pk}/chapter/{CHAPTERS_PER_BOOK}/"
+        self.assertBudget(path, 2, client=self.client_for(self.free_user), status=403)
+        self.assertBudget(path, 1, status=401)
+
+    def test_chapter_detail_warm_cache(self):
+        self.assertBudget(
+            f"/api/book/{self.premium_book.pk}/chapter/1/", 0,
+            client=self.client_for(self.premium_user), warm=True
+        )
+
+    def test_all_chapters(self):
+        path = f"/api/book/{self.premium_book.pk}/chapters/"
+        for user in (self.free_user, self.premium_user):
+            response = self.assertBudget(path, 3, client=self.client_for(user))
+            self.assertEqual(len(response.data['results']), CHAPTERS_PER_BOOK)
+        self.assertBudget(f"{path}?expand=book", 3, client=self.client_for(self.free_user))
+        self.assertBudget(path, 0, status=401)
+
+    def test_all_chapters_warm_cache(self):
+        self.assertBudget(
+            f"/api/book/{self.premium_book.pk}/chapters/", 0,
+            client=self.client_for(self.free_user), warm=True
+        )
+
+    def test_all_chapters_does_not_scale_with_chapter_count(self):
+        short_book = Book.objects.create(title="Short", file="readers/files/short.pdf", accessibility='premium')
+        Chapter.objects.create(book=short_book, chapter_number=1, title="Only chapter")
+        client = self.client_for(self.free_user)
+
+        counts = []
+        for book in (short_book, self.premium_book):
+            self.reset_caches()
+            with CaptureQueriesContext(connection) as queries:
+                client.get(f"/api/book/{book.pk}/chapters/")
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1], "AllChaptersView issues queries per chapter")
+
+    def test_manifest(self):
+        path = f"/api/book/{self.premium_book.pk}/manifest/"
+        response = self.assertBudget(path, 2)
+        self.assertEqual(len(response.data['chapters']), CHAPTERS_PER_BOOK)
+        self.assertBudget(path, 3, client=self.client_for(self.free_user))
+        self.assertBudget(path, 0, warm=True)
+
+
+class BookFileQueryBudgetTests(QueryBudgetTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        path = os.path.join(self.media_root, self.free_book.file.name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fh:
+            fh.write(b'%PDF-1.4 ' + b'0' * 4096)
+
+    def test_download_free_book(self):
+        self.assertBudget(f"/api/book/{self.free_book.pk}/file/", 1)
+
+    def test_download_premium_book(self):
+        path = f"/api/book/{self.premium_book.pk}/file/"
+        self.assertBudget(path, 2, client=self.client_for(self.free_user), status=403)
+
+    def test_public_media_route_is_blocked(self):
+        self.assertBudget(f"/media/{self.free_book.file.name}", 0, status=404)
+
+    def test_ranges(self):
+        path = f"/api/book/{self.free_book.pk}/file/"
+        client = self.client_for()
+        etag = client.get(path)['ETag']
+
+        response = client.get(path, HTTP_RANGE='bytes=0-7')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4')
+        self.assertEqual(response['Content-Range'], 'bytes 0-7/4105')
+
+        response = client.get(path, HTTP_RANGE='bytes=-4', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'0000')
+
+        response = client.get(path, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */4105')
+
+        # the file changed since the client's copy: send it whole
+        response = client.get(path, HTTP_RANGE='bytes=0-7', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content)), 4105)
+
+    def test_awkward_file_names(self):
+        name = 'readers/files/a "quoted" ñame #1.pdf'
+        os.makedirs(os.path.join(self.media_root, 'readers/files'), exist_ok=True)
+        with open(os.path.join(self.media_root, name), 'wb') as fh:
+            fh.write(b'%PDF-1.4')
+        Book.objects.filter(pk=self.free_book.pk).update(file=name)
+        path = f"/api/book/{self.free_book.pk}/file/"
+
+        response = self.client_for().get(path)
+        self.assertEqual(response['Content-Disposition'], "attachment; filename*=utf-8''a%20%22quoted%22%20%C3%B1ame%20%231.pdf")
+
+        with override_settings(BOOK_FILE_SENDFILE_BACKEND='nginx', BOOK_FILE_ACCEL_PREFIX='/protected-media/'):
+            response = self.client_for().get(path)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/readers/files/a%20%22quoted%22%20%C3%B1ame%20%231.pdf')
+
+
+class MediaCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Book.objects.create(title="Imageless", cover_image=None)
+
+    def test_dedupe_media_skips_books_without_images(self):
+        out = io.StringIO()
+        call_command('dedupe_media', '--dry-run', stdout=out)
+        self.assertNotIn("Missing file", out.getvalue())
+        self.assertIn("Migrated 0 file(s)", out.getvalue())
+
+    def test_backfill_placeholders_skips_books_without_images(self):
+        out = io.StringIO()
+        call_command('backfill_placeholders', '--force', stdout=out)
+        self.assertIn("Book: 0 placeholder(s) computed, 0 failed", out.getvalue())
+
+
+class ImageCacheTests(SimpleTestCase):
+    def test_image_cache_scans_only_when_over_its_limit(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            image_cache = ImageCache(cache_dir, max_bytes=1000)
+            with mock.patch.object(ImageCache, 'evict', autospec=True, side_effect=ImageCache.evict) as evict:
+                for number in range(12):
+                    image_cache.set(ImageCache.make_key(str(number), 'turbo', 1, 1, 0), b'x' * 100)
+            # the first write scans, then the eleventh passes the limit and trims to 900 bytes
+            self.assertEqual(evict.call_count, 2)
+            self.assertEqual(sum(path.stat().st_size for path in pathlib.Path(cache_dir).glob('*/*.img')), 1000)
+
+    def test_image_cache_overwrites_count_once(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            image_cache = ImageCache(cache_dir, max_bytes=1000)
+            key = ImageCache.make_key('cover', 'turbo', 1, 1, 0)
+            for _ in range(20):
+                image_cache.set(key, b'x' * 100)
+            self.assertEqual(image_cache._total, 100)
+            self.assertEqual(image_cache.get(key), b'x' * 100)
+
+
+class AdminQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = self.client_for(self.staff_user)
+
+    def test_book_create_without_file(self):
+        self.assertBudget('/api/books/create/', 1, method='post', client=self.staff, status=400, data={})
+
+    def test_book_edit(self):
+        self.assertBudget(f"/api/books/{self.premium_book.pk}/edit/", 2, client=self.staff)
+
+    def test_chapter_create(self):
+        path = f"/api/books/{self.premium_book.pk}/chapters/create/"
+        data = {'chapter_number': CHAPTERS_PER_BOOK + 1, 'title': "Epilogue"}
+        self.assertBudget(path, 12, method='post', client=self.staff, status=201, data=data, format='json')
+
+    def test_chapter_edit(self):
+        self.assertBudget(f"/api/books/{self.premium_book.pk}/chapters/1/edit/", 3, client=self.staff)
+
+    def test_admin_index(self):
+        client = APIClient()
+        client.force_login(self.staff_user)
+        self.assertBudget('/admin/', 5, client=client)
+
+
+class ProgressQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        progress_buffer.flush()
+        self.reader = self.client_for(self.free_user)
+
+    def tearDown(self):
+        progress_buffer.flush()
+        super().tearDown()
+
+    def ping(self, book, chapter_number, position, status=202):
+        data = {'book': book.pk, 'chapter_number': chapter_number, 'position': position}
+        return self.assertBudget('/api/progress/', 1, method='post', client=self.reader, status=status,
+                                 warm=True, data=data, format='json')
+
+    def test_progress_ping(self):
+        # the first ping looks the book up; later ones only load the user for authentication
+        self.ping(self.free_book, 1, 0.1)
+        with CaptureQueriesContext(connection) as queries:
+            for step in range(2, 10):
+                data = {'book': self.free_book.pk, 'chapter_number': 2, 'position': step / 10}
+                self.assertEqual(self.reader.post('/api/progress/', data, format='json').status_code, 202)
+        self.assertEqual(len(queries), 8)
+        self.assertTrue(all('auth_user' in query['sql'] for query in queries.captured_queries))
+        self.assertFalse(ReadingProgress.objects.exists())
+
+    def test_progress_rejects_unknown_book_and_chapter(self):
+        self.ping(Book(pk=999999), 1, 0.5, status=400)
+        self.ping(self.free_book, CHAPTERS_PER_BOOK + 1, 0.5, status=400)
+
+    def test_continue_reading_reads_through_buffer(self):
+        self.ping(self.free_book, 2, 0.5)
+        progress_buffer.flush()
+        self.ping(self.premium_book, 1, 0.75)
+        self.ping(self.free_book, 3, 0.1)
+
+        response = self.assertBudget('/api/continue-reading/', 3, client=self.reader)
+        results = response.json()['results']
+        self.assertEqual(
+            [(entry['book']['id'], entry['chapter_number']) for entry in results],
+            [(self.free_book.pk, 3), (self.premium_book.pk, 1)]
+        )
+
+    def test_continue_reading_requires_login(self):
+        self.assertBudget('/api/continue-reading/', 0, status=401)
+
+
+class ProgressBufferTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader')
+        cls.books = [Book.objects.create(title=f"Book {n}") for n in range(2)]
+
+    def setUp(self):
+        self.buffer = ProgressBuffer(interval=0)
+
+    def test_flush_coalesces_to_latest_position(self):
+        first, second = self.books
+        for step in range(1, 6):
+            self.buffer.record(self.user.pk, first.pk, step, step / 10)
+        self.buffer.record(self.user.pk, second.pk, 3, 0.25)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertLessEqual(len(queries), 6)
+
+        progress = ReadingProgress.objects.get(user=self.user, book=first)
+        self.assertEqual((progress.chapter_number, progress.position), (5, 0.5))
+
+    def test_flush_never_moves_progress_back(self):
+        book = self.books[0]
+        self.buffer.record(self.user.pk, book.pk, 2, 0.5)
+        stale = self.buffer.pending_for(self.user.pk)
+        self.buffer.record(self.user.pk, book.pk, 4, 0.1)
+        self.buffer.flush()
+
+        # an older update arriving from another worker's buffer is ignored
+        self.buffer._pending = {self.user.pk: stale}
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(ReadingProgress.objects.get(user=self.user).chapter_number, 4)
+
+
+def add_views(book, views, days_ago=0, chapter_number=1):
+    day = timezone.now().date() - timedelta(days=days_ago)
+    ChapterViewDaily.objects.create(book=book, chapter_number=chapter_number, day=day, views=views)
+
+
+class PopularityQueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_book = Book.objects.filter(accessibility='free').exclude(genre=self.free_book.genre).first()
+
+    def test_chapter_views_are_counted_in_memory(self):
+        path = f"/api/book/{self.free_book.pk}/chapter/1/"
+        self.assertBudget(path, 0, client=self.client_for(self.premium_user), warm=True)
+        self.assertEqual(view_counter.drain(), {(self.free_book.pk, 1): 2})
+
+        locked = f"/api/book/{self.premium_book.pk}/chapter/5/"
+        self.assertBudget(locked, 2, client=self.client_for(self.free_user), status=403)
+        self.assertEqual(view_counter.drain(), {})
+
+    def test_revalidations_are_not_counted(self):
+        path = f"/api/book/{self.free_book.pk}/chapter/1/"
+        client = self.client_for(self.premium_user)
+        etag = client.get(path)['ETag']
+        self.assertEqual(view_counter.drain(), {(self.free_book.pk, 1): 1})
+
+        self.assertBudget(path, 0, client=client, status=304, warm=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(view_counter.drain(), {})
+
+    def test_popular_books(self):
+        add_views(self.free_book, 10)
+        add_views(self.other_book, 30, days_ago=7)
+        refresh_popularity()
+
+        response = self.assertBudget('/books/popular/', 2)
+        self.assertEqual([book['id'] for book in response.json()['results']], [self.other_book.pk, self.free_book.pk])
+
+        response = self.assertBudget('/books/popular/?window=week', 2)
+        self.assertEqual(response.json()['results'][0]['views'], 10)
+
+        response = self.assertBudget(f"/books/popular/?window=month&genre={self.free_book.genre}", 2)
+        self.assertEqual([book['id'] for book in response.json()['results']], [self.free_book.pk])
+
+        self.assertBudget('/books/popular/', 0, warm=True)
+        self.assertBudget('/books/popular/?window=year', 0, status=400)
+
+
+class PopularityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.books = [Book.objects.create(title=f"Book {n}") for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        suggest_index.built_at = None
+
+    def test_flush_folds_counts_into_daily_rows(self):
+        book = self.books[0]
+        counter = ViewCounter(interval=0)
+        for chapter_number in (1, 1, 1, 2):
+            counter.incr(book.pk, chapter_number)
+        counter.flush()
+
+        counter.incr(book.pk, 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(counter.flush(), 1)
+        self.assertLessEqual(len(queries), 6)
+
+        rows = dict(ChapterViewDaily.objects.filter(book=book).values_list('chapter_number', 'views'))
+        self.assertEqual(rows, {1: 4, 2: 1})
+
+    def test_refresh_decays_older_views(self):
+        today, last_week, old = self.books
+        add_views(today, 10)
+        add_views(last_week, 30, days_ago=7)
+        add_views(old, 1000, days_ago=60)
+
+        self.assertEqual(refresh_popularity(), 2)
+        self.assertEqual(Book.objects.get(pk=today.pk).popularity, 10)
+        self.assertEqual(Book.objects.get(pk=last_week.pk).popularity, 15)
+        self.assertEqual(Book.objects.get(pk=old.pk).popularity, 0)
+        self.assertEqual(get_suggest_index()._books[last_week.pk]['score'], 15)
+
+
+class PlotBooksMixin:
+    # the seeded catalog repeats the same few words in every book, so these carry the distinctive terms
+    PLOTS = {
+        'mystery': [
+            "A teen detective reopens a cold case in a quiet port town",
+            "The detective and her teen sidekick chase a cold case across the port",
+        ],
+        'fantasy': [
+            "A young dragon rider guards the mountain kingdom",
+            "The last dragon rider returns to the mountain kingdom",
+            "A young queen guards the river kingdom",
+        ],
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.plot_books = {
+            genre: [
+                Book.objects.create(title=f"{genre.title()} {n}", genre=genre, description=description)
+                for n, description in enumerate(descriptions)
+            ]
+            for genre, descriptions in cls.PLOTS.items()
+        }
+
+
+class SimilarIndexMixin(PlotBooksMixin):
+    """Builds the similar-books index once per class into a temporary file."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index_dir = tempfile.mkdtemp()
+        cls.index_override = override_settings(SIMILAR_BOOKS_PATH=os.path.join(cls.index_dir, 'similar.npz'))
+        cls.index_override.enable()
+        # edits are flushed by the tests themselves, never by a background thread
+        cls.index_interval, similar_index.interval = similar_index.interval, 0
+        super().setUpClass()
+        similar_index.rebuild()
+        shutil.copy(similar_index.path, os.path.join(cls.index_dir, 'built.npz'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        similar_index.interval = cls.index_interval
+        similar_index._reset()
+        cls.index_override.disable()
+        shutil.rmtree(cls.index_dir, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        # every test starts from the full build, loaded back from disk
+        shutil.copy(os.path.join(self.index_dir, 'built.npz'), similar_index.path)
+        similar_index._reset()
+        similar_index._dirty.clear()  # edits made by other test classes
+        cache.clear()
+
+    def copy_book(self, book):
+        with self.captureOnCommitCallbacks(execute=True):
+            twin = Book.objects.create(title='Twin', genre=book.genre, description=book.description)
+        return twin
+
+
+class SimilarBooksQueryBudgetTests(SimilarIndexMixin, QueryBudgetTestCase):
+    def test_similar_books(self):
+        detective, other_detective = self.plot_books['mystery']
+        path = f"/books/{detective.pk}/similar/"
+        response = self.assertBudget(path, 1)
+        results = response.json()['results']
+        scores = [book['similarity'] for book in results]
+        # only books sharing a term score above zero: the other detective and the rest of the genre
+        self.assertEqual(len(results), Book.objects.filter(genre='mystery').count() - 1)
+        self.assertEqual(results[0]['id'], other_detective.pk)
+        self.assertNotIn(detective.pk, [book['id'] for book in results])
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertGreater(scores[0], scores[1])
+
+        self.assertBudget(path, 0, warm=True)
+        response = self.assertBudget(f"{path}?limit=3", 1)
+        self.assertEqual([book['id'] for book in response.json()['results']], [book['id'] for book in results[:3]])
+        self.assertBudget('/books/999999/similar/', 1, status=404)
+
+    def test_missing_index_is_built_in_the_background(self):
+        os.remove(similar_index.path)
+        similar_index._reset()
+        rider = self.plot_books['fantasy'][0]
+
+        with mock.patch('readers.similar.threading.Thread') as thread:
+            self.assertBudget(f"/books/{rider.pk}/similar/", 0, status=503)
+            self.assertBudget(f"/books/{rider.pk}/similar/", 0, status=503)
+        thread.assert_called_once()
+
+        # what the background thread runs
+        similar_index.rebuild()
+        similar_index._building.release()
+        self.assertBudget(f"/books/{rider.pk}/similar/", 1)
+
+
+class SimilarBooksIndexTests(SimilarIndexMixin, TestCase):
+    def test_added_book_is_folded_in(self):
+        rider = self.plot_books['fantasy'][0]
+        twin = self.copy_book(rider)
+        self.assertEqual(similar_index.similar(twin.pk), None)
+        self.assertEqual(similar_index.flush(), 1)
+
+        self.assertEqual(similar_index.similar(twin.pk, 1)[0][0], rider.pk)
+        self.assertAlmostEqual(similar_index.similar(twin.pk, 1)[0][1], 1, places=4)
+        self.assertEqual(similar_index.similar(rider.pk, 1)[0][0], twin.pk)
+
+        self.assertIsInstance(similar_index.matrix, CSRMatrix)
+        response = self.client.get(f"/books/{rider.pk}/similar/")
+        self.assertEqual(response.json()['results'][0]['id'], twin.pk)
+
+        # the update was written to disk, so other workers load the same lists
+        reloaded = SimilarBooksIndex(k=similar_index.k, interval=0)
+        self.assertEqual(reloaded.similar(rider.pk), similar_index.similar(rider.pk))
+
+    def test_deleted_book_is_dropped(self):
+        rider, *other_fantasy = self.plot_books['fantasy']
+        before = similar_index.similar(rider.pk, similar_index.k)
+        twin = self.copy_book(rider)
+        similar_index.flush()
+
+        twin_id = twin.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            twin.delete()
+        similar_index.flush()
+
+        neighbours = similar_index.similar(rider.pk, similar_index.k)
+        self.assertIn(neighbours[0][0], [book.pk for book in other_fantasy])
+        self.assertNotIn(twin_id, [book_id for book_id, _ in neighbours])
+        self.assertEqual(neighbours, before)
+        self.assertEqual(self.client.get(f"/books/{twin_id}/similar/").status_code, 404)
+
+
+class CSRMatrixTests(SimpleTestCase):
+    def test_sparse_products_match_dense(self):
+        rng = np.random.default_rng(0)
+        dense = rng.random((50, 30), dtype=np.float32) * (rng.random((50, 30)) < 0.2)
+        dense[7] = 0  # an empty row
+        rows, cols = np.nonzero(dense)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=50))])
+        matrix = CSRMatrix(indptr, cols, dense[rows, cols], 30)
+        matrix.max_chunk = 64  # several chunks of nonzeros
+
+        other = rng.random((30, 4), dtype=np.float32)
+        np.testing.assert_allclose(matrix.dot(other), dense @ other, rtol=1e-5)
+        np.testing.assert_array_equal(matrix.dense([7, 3, 3]), dense[[7, 3, 3]])
+        np.testing.assert_array_equal(matrix.take([9, 7]).vstack(matrix.take([1])).dense([0, 1, 2]), dense[[9, 7, 1]])
+
+
+class CountingEmbedder(HashingEmbedder):
+    embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+
+class SemanticIndexMixin(PlotBooksMixin):
+    """Builds the semantic index once per class into a temporary directory."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.keeper = cls.plot_books['mystery'][1]
+        Chapter.objects.create(book=cls.keeper, chapter_number=1, summary="The lighthouse keeper counts the ships")
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index_dir = tempfile.mkdtemp()
+        cls.index_override = override_settings(SEMANTIC_INDEX_DIR=cls.index_dir)
+        cls.index_override.enable()
+        super().setUpClass()
+        semantic_index.build()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.index_override.disable()
+        shutil.rmtree(cls.index_dir, ignore_errors=True)
+
+
+@override_settings(SEMANTIC_EMBEDDER='hashing', SEMANTIC_IVF_THRESHOLD=10 ** 6)
+class SemanticSearchQueryBudgetTests(SemanticIndexMixin, QueryBudgetTestCase):
+    def test_semantic_search(self):
+        detectives = {book.pk for book in self.plot_books['mystery']}
+        path = '/books/semantic-search/?q=teen+detective+cold+case'
+        response = self.assertBudget(path, 1)
+        results = response.json()['results']
+        self.assertEqual({book['id'] for book in results}, detectives)
+        self.assertEqual([book['chapter'] for book in results], [None, None])
+
+        self.assertBudget(path, 0, warm=True)
+        self.assertEqual(len(self.assertBudget(f"{path}&limit=1", 1).json()['results']), 1)
+        response = self.assertBudget('/books/semantic-search/?q=river+shadow+garden', 1)
+        self.assertEqual(len({book['id'] for book in response.json()['results']}), 10)
+        self.assertEqual(self.assertBudget('/books/semantic-search/?q=', 0).json()['results'], [])
+
+    def test_chapter_summary_match(self):
+        response = self.assertBudget('/books/semantic-search/?q=lighthouse+keeper', 1)
+        self.assertEqual(response.json()['results'][0]['id'], self.keeper.pk)
+        self.assertEqual(response.json()['results'][0]['chapter'], 1)
+
+    def test_embedder_errors(self):
+        path = '/books/semantic-search/?q=detective'
+        with mock.patch.object(HashingEmbedder, 'embed', side_effect=httpx.ConnectError("refused")):
+            response = self.assertBudget(path, 0, status=503)
+        self.assertEqual(response.json()['error'], "Semantic search is temporarily unavailable")
+
+        # anything else is a bug, not an outage
+        with mock.patch.object(HashingEmbedder, 'embed', side_effect=ValueError("bad shape")):
+            with self.assertRaises(ValueError):
+                self.client_for().get(path)
+
+    def test_unavailable(self):
+        # the build was made with the hashing embedder, so this fails before calling Ollama
+        with override_settings(SEMANTIC_EMBEDDER='ollama'):
+            response = self.assertBudget('/books/semantic-search/?q=detective', 0, status=503)
+        self.assertIn('rebuild', response.json()['error'])
+
+
+@override_settings(SEMANTIC_EMBEDDER='hashing', SEMANTIC_IVF_THRESHOLD=10 ** 6)
+class SemanticIndexTests(SemanticIndexMixin, TestCase):
+    def test_rebuild_embeds_only_changed_texts(self):
+        embedder = CountingEmbedder()
+        with tempfile.TemporaryDirectory() as index_dir, override_settings(SEMANTIC_INDEX_DIR=index_dir):
+            rows, embedded = semantic_index.build(embedder)
+            self.assertEqual(embedded, rows)
+            self.assertEqual(semantic_index.build(embedder), (rows, 0))
+
+            Book.objects.filter(pk=self.keeper.pk).update(description="A lighthouse mystery on a stormy coast")
+            self.assertEqual(semantic_index.build(embedder), (rows, 1))
+            self.assertEqual(embedder.embedded, rows + 1)
+            self.assertEqual(semantic_index.search('stormy coast lighthouse', 1)[0][:1], (self.keeper.pk,))
+            # the previous build's vectors stay for workers that read the old index.npz
+            self.assertEqual(len(list(pathlib.Path(index_dir).glob('vectors-*.npy'))), 2)
+
+    def test_load_retries_when_the_vectors_were_replaced(self):
+        read = semantic_index._read
+        calls = []
+
+        def racing_read(path, mtime):
+            calls.append(mtime)
+            if len(calls) == 1:
+                raise FileNotFoundError("vectors-old.npy")  # replaced by two builds since index.npz was read
+            return read(path, mtime)
+
+        semantic_index._build = None
+        with mock.patch.object(semantic_index, '_read', side_effect=racing_read):
+            self.assertEqual(len(semantic_index.load()['keys']), len(list(semantic_documents())))
+        self.assertEqual(len(calls), 2)
+
+    def test_ivf_index(self):
+        rider = self.plot_books['fantasy'][0]
+        with tempfile.TemporaryDirectory() as index_dir, \
+                override_settings(SEMANTIC_INDEX_DIR=index_dir, SEMANTIC_IVF_THRESHOLD=4):
+            rows, _ = semantic_index.build()
+            build = semantic_index.load()
+            self.assertEqual(len(build['centroids']), int(rows ** 0.5))
+            self.assertEqual(build['offsets'][-1], rows)
+
+            # a text's own cluster is always the first one probed
+            book_id, score, chapter = semantic_index.search(f"{rider.title}. {rider.description}", 1)[0]
+            self.assertEqual((book_id, chapter), (rider.pk, None))
+            self.assertAlmostEqual(score, 1, places=4)
+
+
+class AsyncReadViewTests(CatalogTestCase):
+    """The async read views answer exactly like the DRF views they replace under ASGI."""
+
+    def async_get(self, view, path, user=None, **kwargs):
+        headers = {'authorization': self.auth_header(user)} if user else {}
+        headers.update(kwargs.pop('headers', {}))
+        request = AsyncRequestFactory().get(path, headers=headers)
+        return async_to_sync(view.as_view())(request, **kwargs)
+
+    def assertSameAsSync(self, view, path, user=None, status=200, headers=None, reset=True, **kwargs):
+        self.reset_caches()
+        async_response = self.async_get(view, path, user, headers=headers or {}, **kwargs)
+        if reset:
+            self.reset_caches()
+        sync_response = self.client_for(user).get(path, headers=headers)
+
+        self.assertEqual(async_response.status_code, status, async_response.content)
+        self.assertEqual(sync_response.status_code, status)
+        self.assertEqual(async_response.content, sync_response.content)
+        for header in ('Content-Type', 'ETag', 'Last-Modified', 'WWW-Authenticate'):
+            self.assertEqual(async_response.get(header), sync_response.get(header), header)
+        return async_response
+
+    def test_book_list(self):
+        self.assertSameAsSync(AsyncBookListView, '/books/')
+
+        # cached pages are served without DRF
+        self.client_for().get('/books/?genre=fiction')
+        response = self.async_get(AsyncBookListView, '/books/?genre=fiction')
+        self.assertEqual(response.content, self.client_for().get('/books/?genre=fiction').content)
+
+    def test_fallback_uses_its_own_sync_view(self):
+        sync_views = [
+            mock.Mock(return_value=mock.Mock(**{'render.return_value': HttpResponse(name)}))
+            for name in ('first', 'second')
+        ]
+        with mock.patch.object(AsyncBookListView, 'sync_view') as sync_view:
+            sync_view.as_view.side_effect = sync_views
+            first = AsyncBookListView.as_view()
+            AsyncBookListView.as_view()
+
+        response = async_to_sync(first)(AsyncRequestFactory().get('/books/?expand=chapters'))
+        self.assertEqual(response.content, b'first')
+
+    def test_book_detail(self):
+        pk = self.premium_book.pk
+        self.assertSameAsSync(AsyncBookDetailView, f"/books/{pk}/", pk=pk)
+        self.assertSameAsSync(AsyncBookDetailView, f"/books/{pk}/?fields=id,title", pk=pk)
+        # the expanded ETag includes the chapters generation, which a cache reset would reseed
+        self.assertSameAsSync(AsyncBookDetailView, f"/books/{pk}/?expand=chapters", reset=False, pk=pk)
+        self.assertSameAsSync(AsyncBookDetailView, '/books/999999/', status=404, pk=999999)
+        self.assertSameAsSync(
+            AsyncBookDetailView, f"/books/{pk}/", status=200, pk=pk, headers={'accept': 'application/msgpack'}
+        )
+
+    def test_serializer_runs_off_the_event_loop(self):
+        on_loop = []
+
+        def to_representation(instance):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return {'id': instance.pk}
+
+        pk = self.free_book.pk
+        with mock.patch.object(BookSerializer, 'to_representation', side_effect=to_representation):
+            self.async_get(AsyncBookDetailView, f"/books/{pk}/", pk=pk)
+        self.assertEqual(on_loop, [False])
+
+    def test_book_detail_not_modified(self):
+        pk = self.free_book.pk
+        etag = self.async_get(AsyncBookDetailView, f"/books/{pk}/", pk=pk)['ETag']
+        response = self.async_get(AsyncBookDetailView, f"/books/{pk}/", pk=pk, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_chapter_revalidations_are_not_counted(self):
+        book_id = self.free_book.pk
+        path = f"/api/book/{book_id}/chapter/1/"
+        etag = self.async_get(AsyncChapterDetailView, path, self.premium_user, book_id=book_id, chapter_id=1)['ETag']
+        self.assertEqual(view_counter.drain(), {(book_id, 1): 1})
+
+        response = self.async_get(
+            AsyncChapterDetailView, path, self.premium_user, book_id=book_id, chapter_id=1,
+            headers={'if-none-match': etag}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(view_counter.drain(), {})
+
+    def test_chapter_detail(self):
+        book_id = self.premium_book.pk
+        path = f"/api/book/{book_id}/chapter/{{}}/"
+        self.assertSameAsSync(AsyncChapterDetailView, path.format(1), self.free_user, book_id=book_id, chapter_id=1)
+        self.assertSameAsSync(AsyncChapterDetailView, path.format(5), self.premium_user, book_id=book_id, chapter_id=5)
+        self.assertSameAsSync(
+            AsyncChapterDetailView, path.format(5), self.free_user, status=403, book_id=book_id, chapter_id=5
+        )
+        self.assertSameAsSync(AsyncChapterDetailView, path.format(1), status=401, book_id=book_id, chapter_id=1)
+        self.assertSameAsSync(
+            AsyncChapterDetailView, path.format(999), self.premium_user, status=404, book_id=book_id, chapter_id=999
+        )
+
+    def test_all_chapters(self):
+        book_id = self.premium_book.pk
+        path = f"/api/book/{book_id}/chapters/"
+        self.assertSameAsSync(AsyncAllChaptersView, path, status=401, book_id=book_id)
+
+        for user in (self.free_user, self.premium_user):
+            self.client_for(user).get(path)
+            response = self.async_get(AsyncAllChaptersView, path, user, book_id=book_id)
+            self.assertEqual(response.content, self.client_for(user).get(path).content)
@@ -1,10 +1,32 @@
+import httpx
 from django.shortcuts import render
+from asgiref.sync import async_to_sync
 from .serializers import *
 from .models import Book, Chapter
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.filters import SearchFilter, OrderingFilter
-from .permissions import CanAccessChapter
+from .permissions import CanAccessChapter, CanDownloadBook
 from rest_framework.exceptions import NotFound
+from .file_delivery import serve_book_file
+from .pagination import BookCursorPagination, ChapterCursorPagination, SearchPagination
+from .search import SearchResults
+from .suggest import get_suggest_index
+from .filters import BookFacetFilter, request_facets
+from .conditional import ConditionalGetMixin, queryset_fingerprint
+from .response_cache import cache_key, generations, get_or_compute
+from .fieldsets import SparseFieldsMixin
+from .progress import progress_buffer
+from .popularity import POPULARITY_WINDOWS, TRENDING, ranked_books, view_counter
+from .similar import SimilarBooksUnavailable, similar_index
+from .semantic import SemanticSearchUnavailable, semantic_index
+from .models import ReadingProgress
+from core.db import serialized_write
+from django.db.models import Max, Prefetch
+from rest_framework.views import APIView
+from purchasers.utils import ChapterAccessResolver
+from purchasers.authentication import ClaimsJWTAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from django.http import Http404
 from .ollama_extractor import OllamaExtractor
 from .pollinations_generator import PollinationsGenerator
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -12,6 +34,7 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
 # Create your views here.
 class BookCreateView(generics.CreateAPIView):
@@ -59,16 +82,18 @@ class BookCreateView(generics.CreateAPIView):
                 book.description = result['description']
                 book.language = result['language']
                 book.is_processed = True
-                book.save()
                 
+                # metadata and every chapter land in one short write transaction
                 chapter_summaries = result.get('chapter_summaries', {})
-                for idx, chapter_title in enumerate(result['chapters'], start=1):
-                    Chapter.objects.create(
-                        book=book,
-                        title=chapter_title,
-                        chapter_number=idx,
-                        summary=chapter_summaries.get(idx, '')
-                    )
+                with serialized_write():
+                    book.save()
+                    for idx, chapter_title in enumerate(result['chapters'], start=1):
+                        Chapter.objects.create(
+                            book=book,
+                            title=chapter_title,
+                            chapter_number=idx,
+                            summary=chapter_summaries.get(idx, '')
+                        )
                 
                 print(f"Metadata extracted: '{result['title']}' by {result['author']}")
                 
@@ -120,46 +145,49 @@ class BookCreateView(generics.CreateAPIView):
         """Generate cover and chapter images"""
         image_gen = PollinationsGenerator()
         
-        cover_file, cover_prompt = image_gen.generate_book_cover({
-            'title': metadata['title'],
-            'author': metadata['author'],
-            'genre': metadata['genre'],
-            'description': metadata['description']
-        })
+        max_images = getattr(settings, 'MAX_CHAPTER_IMAGES', 10)
+        chapters = list(book.chapters.all()[:max_images])
         
-        if cover_file:
-            book.cover_image.save(f"cover_{book.id}.jpg", cover_file, save=False)
-            book.cover_prompt = cover_prompt
+        # the cover and every illustration are requested concurrently on one event loop
+        (cover, cover_prompt), illustrations = async_to_sync(image_gen.agenerate_images)(
+            {
+                'title': metadata['title'],
+                'author': metadata['author'],
+                'genre': metadata['genre'],
+                'description': metadata['description']
+            },
+            [
+                {'chapter_number': chapter.chapter_number, 'title': chapter.title, 'summary': chapter.summary}
+                for chapter in chapters
+            ]
+        )
         
-        max_images = getattr(settings, 'MAX_CHAPTER_IMAGES', 10)
-        chapters = book.chapters.all()[:max_images]
+        if cover:
+            book.cover_image.save(f"cover_{book.id}.jpg", cover.file, save=False)
+            book.cover_prompt = cover_prompt
+            book.cover_lqip = cover.lqip
+            book.cover_color = cover.color
         
-        generated_count = 0
-        for chapter in chapters:
-            illustration_file, illustration_prompt = image_gen.generate_chapter_illustration(
-                {
-                    'chapter_number': chapter.chapter_number,
-                    'title': chapter.title,
-                    'summary': chapter.summary
-                },
-                {
-                    'title': metadata['title'],
-                    'genre': metadata['genre']
-                }
-            )
-            
-            if illustration_file:
+        generated = []
+        for chapter, (illustration, illustration_prompt) in zip(chapters, illustrations):
+            if illustration:
                 chapter.illustration.save(
                     f"chapter_{book.id}_{chapter.chapter_number}.jpg",
-                    illustration_file,
+                    illustration.file,
                     save=False
                 )
                 chapter.illustration_prompt = illustration_prompt
-                chapter.save()
-                generated_count += 1
+                chapter.illustration_lqip = illustration.lqip
+                chapter.illustration_color = illustration.color
+                generated.append(chapter)
         
-        book.images_generated = True
-        book.save()
+        # images are generated first (slow, network-bound); the rows are written together
+        with serialized_write():
+            for chapter in generated:
+                chapter.save()
+            book.images_generated = True
+            book.save()
+        generated_count = len(generated)
         
         print(f"Generated cover and {generated_count} chapter illustrations")
     
@@ -240,42 +268,416 @@ class ChapterUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
         
         return chapter
 
-class BookListView(generics.ListAPIView):
-    queryset = Book.objects.all()
+class BookListView(SparseFieldsMixin, ConditionalGetMixin, generics.ListAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     serializer_class = BookSerializer
-    filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = ['title', 'author__name', 'genre__name', 'accessibility']
+    pagination_class = BookCursorPagination
+    filter_backends = [BookFacetFilter, SearchFilter, OrderingFilter]
+    search_fields = ['title', 'author', 'genre', 'accessibility']
+    ordering_fields = ['created_at']
+    required_columns = ['created_at']
     
-class BookDetailView(generics.RetrieveAPIView):
-    queryset = Book.objects.all()
+    def get_queryset(self):
+        return self.trim_queryset(Book.objects.all())
+    
+    def list(self, request, *args, **kwargs):
+        gens = generations('books')
+        expansion = self.expansion_parts()
+        key = cache_key('books', gens, request.get_full_path(), *expansion)
+        return self.cached_response(
+            key, gens, self._load_validators, lambda _: self._serialize(request, *args, **kwargs), *expansion
+        )
+    
+    def _load_validators(self):
+        fingerprint = queryset_fingerprint(self.filter_queryset(self.get_queryset()))
+        return {'validators': (fingerprint['latest'], fingerprint['max_id'], fingerprint['count'])}, None
+    
+    def _serialize(self, request, *args, **kwargs):
+        data = super().list(request, *args, **kwargs).data
+        if request.query_params.get('facets') in ('1', 'true'):
+            data['facets'] = request_facets(request, self)
+        return data
+
+class BookFacetsView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    search_fields = BookListView.search_fields
+
+    def get(self, request, *args, **kwargs):
+        return Response(request_facets(request, self))
+    
+class BookSearchView(generics.ListAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    serializer_class = BookSearchResultSerializer
+    pagination_class = SearchPagination
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '').strip()
+        if not query:
+            return []
+        return SearchResults(query)
+    
+class BookSemanticSearchView(APIView):
+    """Books whose description or a chapter summary is closest in meaning to ``q``."""
+    authentication_classes = [ClaimsJWTAuthentication]
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        query = ' '.join(request.query_params.get('q', '').split())
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.max_limit)
+        except ValueError:
+            limit = 10
+        limit = max(limit, 1)
+
+        if not query:
+            return Response({'query': query, 'results': []})
+
+        gens = generations('semantic', 'books')
+        key = cache_key('semantic', gens, query.lower(), limit)
+        try:
+            return Response(get_or_compute(key, lambda: self._build(request, query, limit), gens=gens))
+        except SemanticSearchUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except httpx.HTTPError as e:
+            print(f"Semantic search failed: {e}")
+            return Response(
+                {'error': "Semantic search is temporarily unavailable"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+    def _build(self, request, query, limit):
+        ranking = semantic_index.search(query, limit)
+        books = Book.objects.order_by().only(*BookSerializer().only_columns()).in_bulk(
+            [book_id for book_id, _, _ in ranking]
+        )
+
+        results = []
+        for book_id, score, chapter_number in ranking:
+            book = books.get(book_id)
+            if book is not None:
+                results.append({
+                    **BookSerializer(book, context={'request': request}).data,
+                    'score': round(score, 4),
+                    'chapter': chapter_number
+                })
+
+        return {'query': query, 'results': results}
+    
+class BookSuggestView(APIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    max_limit = 20
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', 8)), self.max_limit)
+        except ValueError:
+            limit = 8
+
+        return Response({
+            'query': query,
+            'results': get_suggest_index().suggest(query, limit=max(limit, 1))
+        })
+    
+class BookPopularView(APIView):
+    """Most read books, from the precomputed popularity score (``trending``) or the daily view totals."""
+    authentication_classes = [ClaimsJWTAuthentication]
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        window = request.query_params.get('window', TRENDING)
+        genre = request.query_params.get('genre') or None
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.max_limit)
+        except ValueError:
+            limit = 20
+        limit = max(limit, 1)
+
+        windows = [TRENDING, *POPULARITY_WINDOWS]
+        if window not in windows:
+            return Response(
+                {'error': f"window must be one of: {', '.join(windows)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if genre and genre not in dict(Book.GENRE_CHOICES):
+            return Response({'error': f"Unknown genre '{genre}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # windows roll over at midnight even when no refresh has bumped the generation
+        gens = generations('popularity', 'books')
+        key = cache_key('popular', gens, window, genre, limit, timezone.now().date())
+        return Response(get_or_compute(key, lambda: self._build(request, window, genre, limit), gens=gens))
+
+    def _build(self, request, window, genre, limit):
+        ranking = ranked_books(window, genre, limit)
+        books = Book.objects.order_by().only(*BookSerializer().only_columns()).in_bulk(
+            [book_id for book_id, _ in ranking]
+        )
+
+        score_field = 'popularity' if window == TRENDING else 'views'
+        results = []
+        for book_id, score in ranking:
+            book = books.get(book_id)
+            if book is not None:
+                results.append({**BookSerializer(book, context={'request': request}).data, score_field: score})
+
+        return {'window': window, 'genre': genre, 'results': results}
+    
+class BookSimilarView(APIView):
+    """Books most like this one, from the neighbour lists precomputed by ``similar_index``."""
+    authentication_classes = [ClaimsJWTAuthentication]
+
+    def get(self, request, pk, *args, **kwargs):
+        max_limit = similar_index.k
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), max_limit)
+        except ValueError:
+            limit = 10
+        limit = max(limit, 1)
+
+        gens = generations('similar', 'books')
+        key = cache_key('similar', gens, pk, limit)
+        try:
+            return Response(get_or_compute(key, lambda: self._build(request, pk, limit), gens=gens))
+        except SimilarBooksUnavailable as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def _build(self, request, pk, limit):
+        ranking = similar_index.similar(pk, limit)
+        if ranking is None:
+            if not Book.objects.filter(pk=pk).exists():
+                raise NotFound("Book not found.")
+            ranking = []  # added since the last index update
+
+        books = Book.objects.order_by().only(*BookSerializer().only_columns()).in_bulk(
+            [book_id for book_id, _ in ranking]
+        )
+        results = []
+        for book_id, score in ranking:
+            book = books.get(book_id)
+            if book is not None:
+                results.append({
+                    **BookSerializer(book, context={'request': request}).data,
+                    'similarity': round(score, 4)
+                })
+
+        return {'book': pk, 'results': results}
+
+
+class BookDetailView(SparseFieldsMixin, ConditionalGetMixin, generics.RetrieveAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     serializer_class = BookSerializer
+    required_columns = ['updated_at']
+    
+    def get_queryset(self):
+        return self.trim_queryset(Book.objects.all())
+    
+    def retrieve(self, request, *args, **kwargs):
+        gens = generations(f"book:{kwargs['pk']}")
+        expansion = self.expansion_parts(kwargs['pk'])
+        key = cache_key('book', gens, request.get_full_path(), *expansion)
+        # a chapter edit doesn't touch the book's updated_at, so expanded payloads only get an ETag
+        return self.cached_response(
+            key, gens, self._load_validators, lambda book: self.get_serializer(book).data, *expansion,
+            use_last_modified=not expansion
+        )
+    
+    def _load_validators(self):
+        book = self.get_object()
+        return {'validators': (book.pk, book.updated_at), 'last_modified': book.updated_at}, book
 
-class ChapterDetailView(generics.RetrieveAPIView):
+class ChapterDetailView(SparseFieldsMixin, ConditionalGetMixin, generics.RetrieveAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     serializer_class = ChapterSerializer
     permission_classes = [CanAccessChapter]
+    required_columns = ['chapter_number', 'updated_at', 'book__accessibility', 'book__updated_at']
+    
+    def retrieve(self, request, *args, **kwargs):
+        book_id = kwargs['book_id']
+        gens = generations(f"book:{book_id}", f"book:{book_id}:chapters")
+        key = cache_key('chapter', gens, request.get_full_path())
+        response = self.cached_response(key, gens, self._load_validators, lambda chapter: self.get_serializer(chapter).data)
+        if response.status_code == status.HTTP_200_OK:
+            # a 304 revalidation isn't a view
+            view_counter.incr(int(book_id), int(kwargs['chapter_id']))
+        return response
+    
+    def entry_loaded(self, entry):
+        # the payload is shared across tiers; access is still checked per request
+        self.check_object_permissions(self.request, Chapter(
+            chapter_number=entry['chapter_number'],
+            book=Book(accessibility=entry['book_accessibility'])
+        ))
+    
+    def _load_validators(self):
+        chapter = self.get_chapter()
+        return {
+            'chapter_number': chapter.chapter_number,
+            'book_accessibility': chapter.book.accessibility,
+            'validators': (chapter.pk, chapter.updated_at, chapter.book.updated_at),
+            'last_modified': max(chapter.updated_at, chapter.book.updated_at)
+        }, chapter
     
     def get_object(self):
+        chapter = self.get_chapter()
+        self.check_object_permissions(self.request, chapter)
+        return chapter
+    
+    def get_chapter(self):
         book_id = self.kwargs['book_id']
         chapter_number = self.kwargs['chapter_id']
 
         try:
-            chapter = Chapter.objects.select_related('book').get(
+            chapter = self.trim_queryset(Chapter.objects.all()).get(
                 chapter_number=chapter_number,
                 book_id=book_id
             )
         except Chapter.DoesNotExist:
             raise NotFound("Chapter not found in this book.")
         
-        self.check_object_permissions(self.request, chapter)
-        
         return chapter
     
-class AllChaptersView(generics.ListAPIView):
+class AllChaptersView(SparseFieldsMixin, ConditionalGetMixin, generics.ListAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
     serializer_class = ChapterSerializer
-    permission_classes = [IsAuthenticated, CanAccessChapter]
+    permission_classes = [IsAuthenticated]
+    pagination_class = ChapterCursorPagination
+    required_columns = ['chapter_number']
 
     def get_queryset(self):
         book_id = self.kwargs['book_id']
-        queryset = Chapter.objects.filter(book_id=book_id).select_related('book')
+        queryset = self.trim_queryset(Chapter.objects.filter(book_id=book_id))
         
-        return self.filter_queryset(queryset)
\ No newline at end of file
+        # locked chapters are flagged in SQL instead of a permission check per row
+        queryset = ChapterAccessResolver(self.request.user).annotate(queryset)
+        
+        return self.filter_queryset(queryset)
+    
+    def list(self, request, *args, **kwargs):
+        book_id = kwargs['book_id']
+        # is_locked depends on the caller's tier, so the tier is part of the key and validator
+        tier = ChapterAccessResolver(request.user).tier
+        gens = generations(f"book:{book_id}", f"book:{book_id}:chapters")
+        key = cache_key('chapters', gens, request.get_full_path(), tier)
+        return self.cached_response(
+            key, gens, self._load_validators, lambda _: self._serialize(request, *args, **kwargs), tier
+        )
+    
+    def _load_validators(self):
+        fingerprint = queryset_fingerprint(
+            Chapter.objects.filter(book_id=self.kwargs['book_id']),
+            book_updated=Max('book__updated_at')
+        )
+        return {
+            'validators': (fingerprint['latest'], fingerprint['max_id'], fingerprint['count'], fingerprint['book_updated'])
+        }, None
+    
+    def _serialize(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs).data
+
+class ReadingProgressView(APIView):
+    """Reading position pings. Buffered and written in batches, so a ping never writes a row."""
+    # a write: the user is loaded from the database rather than trusted from token claims
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = ReadingProgressUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        updated_at = progress_buffer.record(request.user.pk, data['book'], data['chapter_number'], data['position'])
+        return Response({**data, 'updated_at': updated_at}, status=status.HTTP_202_ACCEPTED)
+
+class ContinueReadingView(APIView):
+    """The reader's books, most recently read first, including updates that haven't been flushed yet."""
+    authentication_classes = [ClaimsJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    max_limit = 50
+    book_columns = ['book__id', 'book__title', 'book__author', 'book__cover_image', 'book__cover_lqip',
+                    'book__cover_color', 'book__accessibility']
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.max_limit)
+        except ValueError:
+            limit = 10
+        limit = max(limit, 1)
+
+        rows = (
+            ReadingProgress.objects.filter(user_id=request.user.pk)
+            .select_related('book')
+            .only('book_id', 'chapter_number', 'position', 'updated_at', *self.book_columns)
+            .order_by('-updated_at')[:limit]
+        )
+        entries = {row.book_id: row for row in rows}
+
+        pending = progress_buffer.pending_for(request.user.pk)
+        missing = [book_id for book_id in pending if book_id not in entries]
+        books = {}
+        if missing:
+            columns = [column[len('book__'):] for column in self.book_columns]
+            books = Book.objects.order_by().only(*columns).in_bulk(missing)
+
+        for book_id, (chapter_number, position, updated_at) in pending.items():
+            current = entries.get(book_id)
+            if current is not None and current.updated_at >= updated_at:
+                continue
+            book = current.book if current is not None else books.get(book_id)
+            if book is None:
+                continue
+            entries[book_id] = ReadingProgress(
+                user_id=request.user.pk,
+                book=book,
+                chapter_number=chapter_number,
+                position=position,
+                updated_at=updated_at
+            )
+
+        results = sorted(entries.values(), key=lambda entry: entry.updated_at, reverse=True)[:limit]
+        return Response({
+            'results': ReadingProgressSerializer(results, many=True, context={'request': request}).data
+        })
+
+class BookManifestView(ConditionalGetMixin, generics.RetrieveAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    serializer_class = BookManifestSerializer
+    lookup_url_kwarg = 'book_id'
+
+    def get_queryset(self):
+        chapters = Chapter.objects.only('id', 'book_id', 'chapter_number', 'title', 'illustration', 'updated_at')
+        chapters = ChapterAccessResolver(self.request.user).annotate(chapters)
+        return Book.objects.prefetch_related(Prefetch('chapters', queryset=chapters))
+
+    def retrieve(self, request, *args, **kwargs):
+        book_id = kwargs['book_id']
+        tier = ChapterAccessResolver(request.user).tier
+        gens = generations(f"book:{book_id}", f"book:{book_id}:chapters")
+        key = cache_key('manifest', gens, request.get_full_path(), tier)
+        return self.cached_response(key, gens, self._load_validators, lambda book: self.get_serializer(book).data, tier)
+    
+    def _load_validators(self):
+        book = self.get_object()
+        chapters = book.chapters.all()
+        last_modified = max([book.updated_at] + [chapter.updated_at for chapter in chapters])
+        return {'validators': (book.pk, last_modified, len(chapters)), 'last_modified': last_modified}, book
+
+class BookFileDownloadView(generics.RetrieveAPIView):
+    authentication_classes = [ClaimsJWTAuthentication]
+    queryset = Book.objects.only('id', 'file', 'accessibility')
+    permission_classes = [CanDownloadBook]
+    lookup_url_kwarg = 'book_id'
+
+    def retrieve(self, request, *args, **kwargs):
+        book = self.get_object()
+
+        if not book.file:
+            raise NotFound("This book has no file attached.")
+
+        try:
+            return serve_book_file(request, book)
+        except FileNotFoundError:
+            raise NotFound("Book file is missing from storage.")
+
+
+def protected_book_file(request, *args, **kwargs):
+    raise Http404("Book files are only served through the download endpoint.")